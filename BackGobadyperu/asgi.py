@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'BackGobadyperu.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from whitenoise import WhiteNoise
+
+# Los estáticos se sirven con WhiteNoise fuera de la cadena de middleware
+# (ver SERVIDOR en settings); el resto va directo a Django.
+estaticos = WsgiToAsgi(WhiteNoise(get_wsgi_application(), root=settings.STATIC_ROOT, prefix=settings.STATIC_URL))
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"].startswith(settings.STATIC_URL):
+        return await estaticos(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -2,6 +2,7 @@
 from pathlib import Path
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers
 import cloudinary
 import cloudinary.uploader
 from dotenv import load_dotenv
@@ -20,6 +21,9 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# Idempotency-Key en POST /api/pedidos/ (apiApp.idempotencia)
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+CORS_EXPOSE_HEADERS = ["Idempotent-Replayed", "Retry-After"]
 
 cloudinary.config(
     cloud_name=os.getenv("CLOUD_NAME"),
@@ -41,9 +45,15 @@ INSTALLED_APPS = [
     'django_redis',  # Para caching
 ]
 
+# wsgi | asgi; debe coincidir con el modo de gunicorn.conf.py. En asgi se
+# montan las vistas async de apiApp/views_async.py.
+SERVIDOR = os.getenv("SERVIDOR", "wsgi")
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    "apiApp.consultas.PresupuestoConsultasMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "apiApp.metricas.MetricasMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -53,12 +63,29 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if SERVIDOR == "asgi":
+    # WhiteNoiseMiddleware solo es síncrono y haría correr toda la cadena en
+    # un hilo; bajo ASGI los estáticos los sirve BackGobadyperu/asgi.py.
+    MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
+
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
-    ]
+    ],
+    # Throttles con alcance (ScopedRateThrottle) por IP de cliente.
+    'DEFAULT_THROTTLE_RATES': {
+        'reservas': os.getenv("RESERVAS_RITMO", "60/min"),
+        'reservas_carritos': os.getenv("RESERVAS_CARRITOS_RITMO", "10/hour"),
+    },
 }
 
+# Búsqueda de productos: por defecto según el motor (postgresql | sqlite | icontains)
+BUSQUEDA_BACKEND = os.getenv("BUSQUEDA_BACKEND")
+
+# Paginación por keyset de pedidos y productos (apiApp.pagination)
+PAGINACION_TAMANO = int(os.getenv("PAGINACION_TAMANO", 24))
+PAGINACION_MAXIMO = int(os.getenv("PAGINACION_MAXIMO", 100))
+
 ROOT_URLCONF = 'BackGobadyperu.urls'
 
 TEMPLATES = [
@@ -86,9 +113,31 @@ if os.getenv("DJANGO_ENV") == "development":
         }
     }
 else:
+    # Conexiones persistentes (DB_CONN_MAX_AGE segundos, con health check
+    # antes de reusarlas) o, con DB_POOL=True, el pool de Django 5.x sobre
+    # psycopg_pool (psycopg[binary,pool] en requirements.txt). El pool no se
+    # combina con conexiones persistentes. Bajo ASGI las conexiones
+    # persistentes no se reusan entre peticiones: ahí conviene el pool.
+    DB_POOL = os.getenv("DB_POOL", "False") == "True"
+    DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", 0 if SERVIDOR == "asgi" else 600))
     DATABASES = {
-        'default': dj_database_url.parse(os.getenv("DATABASE_URL"))
+        'default': dj_database_url.parse(
+            os.getenv("DATABASE_URL"),
+            conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+            conn_health_checks=not DB_POOL,
+        )
     }
+    if DB_POOL:
+        from psycopg_pool import ConnectionPool
+
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            "min_size": int(os.getenv("DB_POOL_MIN", 2)),
+            # Por proceso: con WEB_CONCURRENCY workers abre hasta workers × max_size
+            "max_size": int(os.getenv("DB_POOL_MAX", 10)),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 600)),
+            "check": ConnectionPool.check_connection,
+        }
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -119,6 +168,26 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
 
+# Códigos de pedido: la clave debe mantenerse estable, cambiarla permitiría
+# repetir códigos ya emitidos. Fuera de desarrollo es obligatoria y no se
+# toma de SECRET_KEY, para que rotarla no cambie la permutación (lo
+# verifica apiApp.codigos.verificar_clave al arrancar).
+PEDIDO_CODIGO_ALFABETO = os.getenv("PEDIDO_CODIGO_ALFABETO", "0123456789ABCDEFGHJKMNPQRSTVWXYZ")
+PEDIDO_CODIGO_LONGITUD = int(os.getenv("PEDIDO_CODIGO_LONGITUD", 8))  # máximo 12
+PEDIDO_CODIGO_CLAVE = os.getenv("PEDIDO_CODIGO_CLAVE") or (
+    SECRET_KEY if os.getenv("DJANGO_ENV") == "development" else None
+)
+
+# Bandeja de salida de correos (python manage.py despachar_correos)
+EMAIL_TRANSPORTE = os.getenv("EMAIL_TRANSPORTE", "resend")  # "resend" | "fake"
+CORREOS_ENCOLAR = os.getenv("CORREOS_ENCOLAR", "True") == "True"  # False: no se encola nada (benchmarks)
+CORREOS_HILOS = int(os.getenv("CORREOS_HILOS", 4))
+CORREOS_LOTE = int(os.getenv("CORREOS_LOTE", 20))
+CORREOS_MAX_INTENTOS = int(os.getenv("CORREOS_MAX_INTENTOS", 6))
+CORREOS_BACKOFF_BASE = int(os.getenv("CORREOS_BACKOFF_BASE", 30))  # segundos
+CORREOS_BACKOFF_MAX = int(os.getenv("CORREOS_BACKOFF_MAX", 60 * 60))
+CORREOS_PLAZO_ENVIO = int(os.getenv("CORREOS_PLAZO_ENVIO", 120))  # segundos antes de reclamar un envío colgado
+
 if not DEBUG:
     CACHES = {
         'default': {
@@ -128,4 +197,59 @@ if not DEBUG:
                 'CLIENT_CLASS': 'django_redis.client.DefaultClient',
             }
         }
-    }
\ No newline at end of file
+    }
+
+# Presupuesto de consultas por vista (apiApp.consultas). "advertir" deja un
+# warning en el log, "fallar" lanza PresupuestoExcedido (así falla un test
+# con un N+1; es el modo de settings_test) y "apagado" no revisa. DEFECTO
+# aplica a las vistas sin presupuesto.
+PRESUPUESTO_CONSULTAS_MODO = os.getenv("PRESUPUESTO_CONSULTAS_MODO", "advertir")
+PRESUPUESTO_CONSULTAS_DEFECTO = int(os.getenv("PRESUPUESTO_CONSULTAS_DEFECTO", 0)) or None
+
+# Métricas (apiApp.metricas): /metrics pide "Authorization: Bearer
+# METRICAS_TOKEN"; sin token solo responde con DEBUG. Con Redis cada worker
+# vuelca las suyas cada METRICAS_INTERVALO segundos y /metrics las suma.
+# Server-Timing expone tiempos internos: por defecto solo con DEBUG.
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")
+METRICAS_INTERVALO = int(os.getenv("METRICAS_INTERVALO", 10))
+METRICAS_SERVER_TIMING = os.getenv("METRICAS_SERVER_TIMING", str(DEBUG)) == "True"
+
+# Cache del catálogo (ProductoViewSet list/retrieve)
+CATALOGO_CACHE_TTL = int(os.getenv("CATALOGO_CACHE_TTL", 60 * 60))
+TARIFAS_CACHE_TTL = int(os.getenv("TARIFAS_CACHE_TTL", 60 * 60))
+
+# Cache-Control del catálogo (RespuestaCondicionalMixin). max_age=0 hace que
+# el navegador revalide con el ETag (304 casi gratis); una CDN puede guardar
+# s_maxage segundos y servir la copia anterior mientras revalida.
+CATALOGO_S_MAXAGE = int(os.getenv("CATALOGO_S_MAXAGE", 60))
+CATALOGO_STALE = int(os.getenv("CATALOGO_STALE_WHILE_REVALIDATE", 300))
+CACHE_CONTROL = {
+    "productos": {"public": True, "max_age": 0, "s_maxage": CATALOGO_S_MAXAGE,
+                  "stale_while_revalidate": CATALOGO_STALE},
+    "tarifas": {"public": True, "max_age": 0, "s_maxage": CATALOGO_S_MAXAGE,
+                "stale_while_revalidate": CATALOGO_STALE},
+    "categorias": {"public": True, "max_age": 0, "s_maxage": 10 * CATALOGO_S_MAXAGE,
+                   "stale_while_revalidate": 12 * CATALOGO_STALE},
+    "metodos-pago": {"public": True, "max_age": 0, "s_maxage": 10 * CATALOGO_S_MAXAGE,
+                     "stale_while_revalidate": 12 * CATALOGO_STALE},
+}
+
+# Idempotency-Key: cuánto se recuerda la respuesta de un pedido y cuánto
+# bloquea la clave la primera petición (si el worker muere, se libera sola).
+IDEMPOTENCIA_TTL = int(os.getenv("IDEMPOTENCIA_TTL", 60 * 60 * 24))
+IDEMPOTENCIA_BLOQUEO_TTL = int(os.getenv("IDEMPOTENCIA_BLOQUEO_TTL", 60))
+
+# Servir list/retrieve de productos desde ProductoSnapshot (apiApp.snapshot).
+# Activar después de correr rebuild_catalog_snapshot.
+CATALOGO_SNAPSHOT = os.getenv("CATALOGO_SNAPSHOT", "False") == "True"
+
+# Espejo de stock en Redis para /api/productos/stock/ (apiApp.stock)
+STOCK_ESPEJO_TTL = int(os.getenv("STOCK_ESPEJO_TTL", 60 * 15))
+
+# Reservas de stock por carrito (apiApp.reservas): cuánto dura una reserva sin
+# renovarse, cuántos carritos vencidos suelta liberar_reservas por vuelta y
+# cuántas unidades de un producto puede retener un carrito. Los carritos
+# nuevos por cliente se limitan con el throttle "reservas_carritos".
+RESERVAS_TTL = int(os.getenv("RESERVAS_TTL", 60 * 15))
+RESERVAS_LOTE = int(os.getenv("RESERVAS_LOTE", 500))
+RESERVAS_MAX_UNIDADES = int(os.getenv("RESERVAS_MAX_UNIDADES", 20))
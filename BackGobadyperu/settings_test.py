@@ -0,0 +1,8 @@
+# BackGobadyperu/settings_test.py
+# Settings de la suite de tests:
+#   python manage.py test --settings=BackGobadyperu.settings_test
+# o DJANGO_SETTINGS_MODULE=BackGobadyperu.settings_test con pytest-django.
+from .settings import *  # noqa: F401,F403
+
+# Una vista que se pasa de su presupuesto de consultas hace fallar el test.
+PRESUPUESTO_CONSULTAS_MODO = "fallar"
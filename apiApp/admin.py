@@ -1,8 +1,26 @@
-from django.contrib import admin
+from functools import partial
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from .models import (
     Producto, ImagenProducto, VideoProducto, Tarifa, Categoria,
-    Pedido, PedidoItem, MetodoPago
+    Pedido, PedidoItem, MetodoPago, CorreoSaliente
 )
+from .consultas import presupuesto_consultas
+from .pagination import ConteoEstimadoPaginator
+from .productos_io import FORMATOS, exportar_productos, importar_productos
+from .streaming import respuesta_streaming
+from .tarifas import validar_tramos
+from .ventas import DIMENSIONES, rango_fechas, ranking_ventas, recalcular_dias, resumen_ventas
 
 # ---------------------------- INLINES ----------------------------
 class ImagenProductoInline(admin.TabularInline):
@@ -13,15 +31,90 @@ class VideoProductoInline(admin.TabularInline):
     model = VideoProducto
     extra = 1
 
+class TarifaInlineFormSet(BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        tramos = [
+            (form.cleaned_data['minimo'], form.cleaned_data.get('maximo'))
+            for form in self.forms
+            if form.cleaned_data and not form.cleaned_data.get('DELETE') and 'minimo' in form.cleaned_data
+        ]
+        errores = validar_tramos(tramos)
+        if errores:
+            raise ValidationError(errores)
+
 class TarifaInline(admin.TabularInline):
     model = Tarifa
+    formset = TarifaInlineFormSet
     extra = 1
 
 # ---------------------------- PRODUCTO ----------------------------
+class ImportarProductosForm(forms.Form):
+    archivo = forms.FileField()
+    formato = forms.ChoiceField(choices=[(formato, formato.upper()) for formato in FORMATOS])
+
+class ProductoChangeList(ChangeList):
+    # El listado solo muestra list_display: no se trae la descripción.
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).only('id', 'nombre', 'fecha_ingreso', 'cantidad')
+
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'fecha_ingreso', 'cantidad')
+    # Sin COUNT(*) extra del total y con el total estimado en tablas grandes
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
     inlines = [ImagenProductoInline, VideoProductoInline, TarifaInline]
     filter_horizontal = ('categorias',)
+    actions = ["exportar_csv", "exportar_jsonl"]
+    change_list_template = "admin/apiApp/producto/change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return ProductoChangeList
+
+    @presupuesto_consultas(4)
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        return [
+            path("importar/", self.admin_site.admin_view(self.importar), name="apiApp_producto_importar"),
+        ] + super().get_urls()
+
+    def importar(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+        form = ImportarProductosForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            resultado = importar_productos(form.cleaned_data["archivo"], form.cleaned_data["formato"])
+            self.message_user(
+                request,
+                f"{resultado.creados} creados, {resultado.actualizados} actualizados, "
+                f"{len(resultado.errores)} filas con error.",
+                messages.WARNING if resultado.errores else messages.SUCCESS,
+            )
+            if not resultado.errores:
+                return redirect("admin:apiApp_producto_changelist")
+        else:
+            resultado = None
+        return TemplateResponse(request, "admin/apiApp/producto/importar.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Importar productos",
+            "form": form,
+            "errores": resultado.errores[:500] if resultado else [],
+            "total_errores": len(resultado.errores) if resultado else 0,
+        })
+
+    def _exportar(self, queryset, formato, content_type):
+        return respuesta_streaming(exportar_productos(formato, queryset), content_type, f"productos.{formato}")
+
+    @admin.action(description="Exportar seleccionados a CSV")
+    def exportar_csv(self, request, queryset):
+        return self._exportar(queryset, "csv", "text/csv; charset=utf-8")
+
+    @admin.action(description="Exportar seleccionados a JSONL")
+    def exportar_jsonl(self, request, queryset):
+        return self._exportar(queryset, "jsonl", "application/x-ndjson")
 
 admin.site.register(Producto, ProductoAdmin)
 
@@ -31,6 +124,8 @@ class PedidoItemInline(admin.TabularInline):
     extra = 0
     fields = ("producto", "cantidad", "precio_unitario", "subtotal")
     readonly_fields = ("subtotal",)
+    # Un <select> con todo el catálogo por cada ítem no escala.
+    raw_id_fields = ("producto",)
 
     def subtotal(self, obj):
         if obj.id:  # si ya existe en BD
@@ -47,13 +142,89 @@ class PedidoAdmin(admin.ModelAdmin):
     )
     list_filter = ("envio_provincia", "metodo_pago", "fecha")
     search_fields = ("codigo", "nombre", "apellido", "correo", "telefono")
-    ordering = ("-fecha",)
+    # Ya es un orden total: el admin no agrega -pk y coincide con pedido_keyset_idx.
+    ordering = ("-fecha", "id")
     inlines = [PedidoItemInline]
+    change_list_template = "admin/apiApp/pedido/change_list.html"
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Lo que usan las columnas: metodo_pago y, para resumen_items, los
+        # ítems con el nombre de su producto (dos consultas por página).
+        return super().get_queryset(request).select_related("metodo_pago").prefetch_related(
+            Prefetch("items", queryset=PedidoItem.objects.select_related("producto").only(
+                "id", "pedido_id", "cantidad", "producto__id", "producto__nombre"
+            ))
+        )
+
+    def get_urls(self):
+        return [
+            path("ventas/", self.admin_site.admin_view(self.ventas), name="apiApp_pedido_ventas"),
+        ] + super().get_urls()
+
+    @presupuesto_consultas(6)
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
+
+    @presupuesto_consultas(10)
+    def ventas(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            desde, hasta = rango_fechas(request.GET)
+        except ValueError as error:
+            self.message_user(request, str(error), messages.ERROR)
+            desde, hasta = rango_fechas({})
+        resumen = resumen_ventas(desde, hasta)
+        maximo = max((dia["ingresos"] for dia in resumen["serie"]), default=0) or 1
+        for dia in resumen["serie"]:
+            dia["porcentaje"] = round(100 * dia["ingresos"] / maximo)
+        return TemplateResponse(request, "admin/apiApp/pedido/ventas.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Ventas",
+            "resumen": resumen,
+            "rankings": [
+                (dimension.replace("-", " ").capitalize(), ranking_ventas(dimension, desde, hasta, limite=10))
+                for dimension in DIMENSIONES
+            ],
+        })
+
+    # Los rollups de ventas se suman en el checkout; lo que se cambie a mano
+    # aquí recalcula el día del pedido.
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        transaction.on_commit(partial(recalcular_dias, [timezone.localdate(form.instance.fecha)]))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(partial(recalcular_dias, [timezone.localdate(obj.fecha)]))
+
+    def delete_queryset(self, request, queryset):
+        dias = [timezone.localdate(fecha) for fecha in queryset.values_list("fecha", flat=True)]
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(partial(recalcular_dias, dias))
 
     def resumen_items(self, obj):
         return ", ".join([f"{item.cantidad}x {item.producto.nombre}" for item in obj.items.all()])
     resumen_items.short_description = "Productos"
 
+# ---------------------------- CORREOS ----------------------------
+@admin.register(CorreoSaliente)
+class CorreoSalienteAdmin(admin.ModelAdmin):
+    list_display = ("asunto", "destinatario", "estado", "intentos", "proximo_intento", "creado", "enviado")
+    list_filter = ("estado",)
+    search_fields = ("destinatario", "pedido__codigo")
+    readonly_fields = ("pedido", "intentos", "reclamo", "ultimo_error", "creado", "enviado")
+    actions = ["reintentar"]
+
+    @admin.action(description="Reintentar envío")
+    def reintentar(self, request, queryset):
+        queryset.exclude(estado=CorreoSaliente.ENVIADO).update(
+            estado=CorreoSaliente.PENDIENTE, intentos=0, proximo_intento=timezone.now()
+        )
+
 # ---------------------------- OTROS ----------------------------
 admin.site.register(Categoria)
 admin.site.register(MetodoPago)
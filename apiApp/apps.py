@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ApiappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apiApp'
+
+    def ready(self):
+        from .codigos import verificar_clave
+        verificar_clave()
+        from . import signals  # noqa: F401
+        from . import consultas  # noqa: F401  (contador en cada conexión nueva)
+        from .metricas import instrumentar_cloudinary
+        instrumentar_cloudinary()
+        from .correos import precompilar_plantillas
+        precompilar_plantillas()
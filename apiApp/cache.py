@@ -0,0 +1,239 @@
+# apiApp/cache.py
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .metricas import registrar_cache
+
+CATALOGO_VERSION_KEY = "catalogo:version"
+CATALOGO_HITS_KEY = "catalogo:stats:hits"
+CATALOGO_MISSES_KEY = "catalogo:stats:misses"
+CATALOGO_TTL = getattr(settings, "CATALOGO_CACHE_TTL", 60 * 60)
+TARIFAS_VERSION_KEY = "tarifas:version"
+
+
+def _incrementar(key):
+    """
+    Incrementa un contador del cache creándolo si no existe.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def version_catalogo():
+    return _version(CATALOGO_VERSION_KEY)
+
+
+def invalidar_catalogo():
+    """
+    Sube la versión del catálogo; las entradas anteriores quedan huérfanas
+    y expiran solas por TTL.
+    """
+    return _incrementar(CATALOGO_VERSION_KEY)
+
+
+def version_tarifas():
+    # Arranca en el reloj, como los cambios de los ETags: las tablas de
+    # apiApp.tarifas también viven en memoria de cada proceso y no se vacían
+    # con el cache, así que una versión no puede repetirse.
+    version = cache.get(TARIFAS_VERSION_KEY)
+    if version is None:
+        _iniciar_cambios(TARIFAS_VERSION_KEY)
+        version = cache.get(TARIFAS_VERSION_KEY)
+    return version
+
+
+def invalidar_tarifas():
+    try:
+        return cache.incr(TARIFAS_VERSION_KEY)
+    except ValueError:
+        _iniciar_cambios(TARIFAS_VERSION_KEY)
+        return cache.incr(TARIFAS_VERSION_KEY)
+
+
+def _clave_cambios(modelo):
+    return f"cambios:{modelo._meta.label_lower}"
+
+
+def _iniciar_cambios(key):
+    # Arranca en el reloj y no en 1 para que, si se vacía el cache, no se
+    # repitan versiones (y ETags) ya entregadas.
+    cache.add(key, time.time_ns() // 1_000_000, timeout=None)
+
+
+def registrar_cambio(modelo):
+    """
+    Sube la versión de cambios de un modelo; con ella se calculan los ETags.
+    """
+    key = _clave_cambios(modelo)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        _iniciar_cambios(key)
+        return cache.incr(key)
+
+
+def versiones_modelos(modelos):
+    claves = [_clave_cambios(modelo) for modelo in modelos]
+    valores = cache.get_many(claves)
+    for key in claves:
+        if key not in valores:
+            _iniciar_cambios(key)
+            valores[key] = cache.get(key)
+    return [valores[key] for key in claves]
+
+
+def clave_catalogo(tipo, identificador, version=None):
+    if version is None:
+        version = version_catalogo()
+    return f"catalogo:v{version}:{tipo}:{identificador}"
+
+
+def leer_catalogo(key):
+    data = cache.get(key)
+    _incrementar(CATALOGO_MISSES_KEY if data is None else CATALOGO_HITS_KEY)
+    registrar_cache("catalogo", hits=int(data is not None), misses=int(data is None))
+    return data
+
+
+def guardar_catalogo(key, data):
+    cache.set(key, data, timeout=CATALOGO_TTL)
+
+
+def usa_redis():
+    return settings.CACHES["default"]["BACKEND"] == "django_redis.cache.RedisCache"
+
+
+def _en_memoria():
+    # LocMem no hace I/O: llamarlo directo evita pasar por un hilo.
+    return settings.CACHES["default"]["BACKEND"] == "django.core.cache.backends.locmem.LocMemCache"
+
+
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+def redis_async():
+    """
+    Cliente redis.asyncio por event loop, contra el mismo servidor que el
+    cache de Django.
+    """
+    import redis.asyncio
+
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None:
+        cliente = _clientes_async[loop] = redis.asyncio.Redis.from_url(settings.CACHES["default"]["LOCATION"])
+    return cliente
+
+
+async def _aget(key):
+    if _en_memoria():
+        return cache.get(key)
+    if not usa_redis():
+        return await cache.aget(key)
+    # Mismas claves y codificación que django-redis para compartir entradas.
+    valor = await redis_async().get(cache.make_key(key))
+    return None if valor is None else cache.client.decode(valor)
+
+
+async def _aget_many(claves):
+    if _en_memoria():
+        return cache.get_many(claves)
+    if not usa_redis():
+        return await cache.aget_many(claves)
+    valores = await redis_async().mget([cache.make_key(key) for key in claves])
+    return {key: cache.client.decode(valor) for key, valor in zip(claves, valores) if valor is not None}
+
+
+async def _aincrementar(key):
+    if _en_memoria():
+        return _incrementar(key)
+    if not usa_redis():
+        return await sync_to_async(_incrementar)(key)
+    return await redis_async().incr(cache.make_key(key))
+
+
+async def aclave_catalogo(tipo, identificador):
+    version = await _aget(CATALOGO_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(version_catalogo)()
+    return clave_catalogo(tipo, identificador, version)
+
+
+async def aversiones_modelos(modelos):
+    claves = [_clave_cambios(modelo) for modelo in modelos]
+    valores = await _aget_many(claves)
+    if len(valores) < len(claves):
+        return await sync_to_async(versiones_modelos)(modelos)
+    return [valores[key] for key in claves]
+
+
+async def aleer_catalogo(key):
+    """
+    Versión async de leer_catalogo. Solo cuenta los hits: un miss lo
+    resuelve la vista síncrona, que lo cuenta al volver a leer.
+    """
+    data = await _aget(key)
+    if data is not None:
+        await _aincrementar(CATALOGO_HITS_KEY)
+        registrar_cache("catalogo", hits=1)
+    return data
+
+
+def estadisticas_catalogo():
+    valores = cache.get_many([CATALOGO_HITS_KEY, CATALOGO_MISSES_KEY])
+    hits = valores.get(CATALOGO_HITS_KEY, 0)
+    misses = valores.get(CATALOGO_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "version": version_catalogo(),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
+
+
+class CacheLRU:
+    """
+    LRU en memoria del proceso, acotado y seguro entre hilos.
+    """
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is not None:
+                self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            if len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
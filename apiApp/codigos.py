@@ -0,0 +1,133 @@
+# apiApp/codigos.py
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+SECUENCIA_PEDIDOS = "apiapp_pedido_codigo_seq"
+
+
+class PermutacionFeistel:
+    """
+    Biyección con clave sobre [0, dominio). Red de Feistel balanceada sobre
+    la potencia de 2 par inmediata y cycle-walking para caer dentro del
+    dominio (menos de 4 vueltas en promedio).
+    """
+
+    def __init__(self, dominio, clave, rondas=4):
+        self.dominio = dominio
+        self.rondas = rondas
+        self._hmac = hmac.new(clave, digestmod=hashlib.sha256)
+        bits = max((dominio - 1).bit_length(), 2)
+        self.medio = (bits + 1) // 2
+        self.mascara = (1 << self.medio) - 1
+
+    def _f(self, ronda, valor):
+        h = self._hmac.copy()
+        h.update(f"{ronda}:{valor}".encode())
+        return int.from_bytes(h.digest()[:8], "big") & self.mascara
+
+    def _cifrar(self, valor):
+        izquierda, derecha = valor >> self.medio, valor & self.mascara
+        for ronda in range(self.rondas):
+            izquierda, derecha = derecha, izquierda ^ self._f(ronda, derecha)
+        return (izquierda << self.medio) | derecha
+
+    def permutar(self, valor):
+        if not 0 <= valor < self.dominio:
+            raise ValueError("Valor fuera del dominio de la permutación.")
+        valor = self._cifrar(valor)
+        while valor >= self.dominio:
+            valor = self._cifrar(valor)
+        return valor
+
+
+def codificar(numero, alfabeto, longitud):
+    base = len(alfabeto)
+    caracteres = []
+    for _ in range(longitud):
+        numero, resto = divmod(numero, base)
+        caracteres.append(alfabeto[resto])
+    return "".join(reversed(caracteres))
+
+
+class AsignadorCodigos:
+    """
+    Convierte un número de secuencia en un código de pedido: cada número
+    produce un código distinto, sin consultar la tabla ni reintentar.
+    """
+
+    def __init__(self, alfabeto, longitud, clave):
+        if len(set(alfabeto)) != len(alfabeto):
+            raise ValueError("El alfabeto de códigos tiene caracteres repetidos.")
+        self.alfabeto = alfabeto
+        self.longitud = longitud
+        self.capacidad = len(alfabeto) ** longitud
+        self.permutacion = PermutacionFeistel(self.capacidad, clave)
+
+    def codigo(self, numero):
+        if numero >= self.capacidad:
+            raise OverflowError(
+                "Se agotó el espacio de códigos de pedido; aumenta PEDIDO_CODIGO_LONGITUD."
+            )
+        return codificar(self.permutacion.permutar(numero), self.alfabeto, self.longitud)
+
+
+def siguiente_numero():
+    """
+    Siguiente valor de la secuencia de pedidos: una sequence nativa en
+    Postgres y una tabla autoincremental en el resto de motores.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s)", [SECUENCIA_PEDIDOS])
+            return cursor.fetchone()[0]
+
+    from .models import SecuenciaPedido
+    return SecuenciaPedido.objects.create().pk
+
+
+def siguientes_numeros(cantidad):
+    """
+    ``cantidad`` valores de la secuencia en una sola ida a la base, para
+    cargas masivas de pedidos.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [SECUENCIA_PEDIDOS, cantidad])
+            return [fila[0] for fila in cursor.fetchall()]
+
+    from .models import SecuenciaPedido
+    return [fila.pk for fila in SecuenciaPedido.objects.bulk_create([SecuenciaPedido() for _ in range(cantidad)])]
+
+
+_asignador = None
+
+
+def verificar_clave():
+    """
+    Falla al arrancar si no hay PEDIDO_CODIGO_CLAVE (obligatoria fuera de
+    desarrollo): sin ella la permutación dependería de SECRET_KEY.
+    """
+    if not settings.PEDIDO_CODIGO_CLAVE:
+        raise ImproperlyConfigured(
+            "Falta PEDIDO_CODIGO_CLAVE. Si ya hay códigos emitidos con la clave "
+            "anterior, usa el valor actual de SECRET_KEY para conservarlos."
+        )
+
+
+def asignador():
+    global _asignador
+    if _asignador is None:
+        _asignador = AsignadorCodigos(
+            settings.PEDIDO_CODIGO_ALFABETO,
+            settings.PEDIDO_CODIGO_LONGITUD,
+            settings.PEDIDO_CODIGO_CLAVE.encode(),
+        )
+    return _asignador
+
+
+def nuevo_codigo_pedido():
+    return asignador().codigo(siguiente_numero())
@@ -0,0 +1,140 @@
+# apiApp/consultas.py
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Contador de la petición en curso. Es un ContextVar y no un
+# connection.execute_wrapper() por petición porque bajo ASGI las consultas
+# corren en el hilo de sync_to_async, con otra conexión pero el mismo contexto.
+_contador = ContextVar("contador_consultas", default=None)
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+class ContadorConsultas:
+    __slots__ = ("consultas", "segundos")
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+
+@receiver(connection_created)
+def instalar_contador(sender, connection, **kwargs):
+    # connection_created llega en cada reconexión del mismo DatabaseWrapper
+    # (conn_max_age=0, pool): el wrapper se instala una sola vez.
+    if _medir not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir)
+
+
+def _medir(execute, sql, params, many, context):
+    contador = _contador.get()
+    if contador is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        contador.consultas += 1
+        contador.segundos += time.perf_counter() - inicio
+
+
+def contar_consultas():
+    """
+    Empieza a contar en el contexto actual; devuelve el contador y el token
+    para restaurar el anterior con ``_contador.reset``.
+    """
+    contador = ContadorConsultas()
+    return contador, _contador.set(contador)
+
+
+def contador_actual():
+    return _contador.get()
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declara el máximo de consultas de una vista de función o de una vista
+    del admin; en las vistas DRF se usa el atributo de clase
+    ``presupuesto_consultas`` (un entero o {acción: máximo}).
+    """
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+def presupuesto_de(vista, metodo):
+    cls = getattr(vista, "cls", None)
+    if cls is None:
+        return getattr(vista, "presupuesto_consultas", None)
+    presupuesto = getattr(cls, "presupuesto_consultas", None)
+    if isinstance(presupuesto, dict):
+        accion = (getattr(vista, "actions", None) or {}).get(metodo.lower())
+        return presupuesto.get(accion)
+    return presupuesto
+
+
+class PresupuestoConsultasMiddleware:
+    """
+    Cuenta las consultas y el tiempo en la base de cada petición y lo compara
+    con el presupuesto de la vista (o PRESUPUESTO_CONSULTAS_DEFECTO). Según
+    PRESUPUESTO_CONSULTAS_MODO registra un warning ("advertir") o lanza
+    PresupuestoExcedido ("fallar", el modo de settings_test).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.modo = settings.PRESUPUESTO_CONSULTAS_MODO
+        self.defecto = settings.PRESUPUESTO_CONSULTAS_DEFECTO
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        contador, token = contar_consultas()
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _contador.reset(token)
+        self.revisar(request, contador)
+        return respuesta
+
+    async def __acall__(self, request):
+        contador, token = contar_consultas()
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _contador.reset(token)
+        self.revisar(request, contador)
+        return respuesta
+
+    def process_view(self, request, vista, args, kwargs):
+        request.presupuesto_consultas = presupuesto_de(vista, request.method)
+        request.nombre_vista = getattr(vista, "__qualname__", repr(vista))
+
+    def revisar(self, request, contador):
+        presupuesto = getattr(request, "presupuesto_consultas", None)
+        if presupuesto is None:
+            presupuesto = self.defecto
+        if self.modo == "apagado" or presupuesto is None or contador.consultas <= presupuesto:
+            return
+        mensaje = (
+            f"{request.method} {request.path} ({getattr(request, 'nombre_vista', '?')}): {contador.consultas} consultas "
+            f"en {contador.segundos * 1000:.1f} ms, presupuesto {presupuesto}."
+        )
+        if self.modo == "fallar":
+            raise PresupuestoExcedido(mensaje)
+        logger.warning(mensaje)
@@ -0,0 +1,78 @@
+# apiApp/correos.py
+from functools import cache
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .cache import CacheLRU
+from .media import url_recurso
+
+IMAGEN_PLACEHOLDER = "https://via.placeholder.com/50"
+
+PLANTILLAS = ("correos/confirmacion_pedido.html", "correos/celda_producto.html")
+
+
+@cache
+def _plantilla(nombre):
+    """
+    Compila cada plantilla una sola vez por proceso.
+    """
+    return get_template(nombre)
+
+
+def precompilar_plantillas():
+    for nombre in PLANTILLAS:
+        _plantilla(nombre)
+
+
+# Celdas de producto ya renderizadas, por lo único que las cambia: producto,
+# nombre e imagen principal. Los pedidos no las invalidan.
+fragmentos = CacheLRU(getattr(settings, "CORREOS_FRAGMENTOS_MAX", 2048))
+
+
+def _imagen_principal(producto):
+    imagenes = producto.imagenes.all()
+    return imagenes[0].imagen if imagenes and imagenes[0].imagen else None
+
+
+def imagen_principal_url(producto):
+    imagen = _imagen_principal(producto)
+    return url_recurso(imagen) if imagen else IMAGEN_PLACEHOLDER
+
+
+def celda_producto(producto):
+    imagen = _imagen_principal(producto)
+    # La versión cambia al volver a subir una imagen con el mismo public_id.
+    clave = (producto.pk, producto.nombre, str(imagen) if imagen else None, getattr(imagen, "version", None))
+    celda = fragmentos.obtener(clave)
+    if celda is None:
+        celda = mark_safe(_plantilla("correos/celda_producto.html").render({
+            "imagen_url": url_recurso(imagen) if imagen else IMAGEN_PLACEHOLDER,
+            "nombre": producto.nombre,
+        }))
+        fragmentos.guardar(clave, celda)
+    return celda
+
+
+def render_confirmacion_pedido(pedido, lineas, envio):
+    """
+    Arma el HTML del correo de confirmación. ``lineas`` son las que deja
+    PedidoSerializer.create (producto, cantidad, precio_unitario, subtotal).
+    """
+    # La celda ya viene renderizada (y escapada) desde el cache de fragmentos.
+    filas = [
+        {
+            "celda": celda_producto(linea["producto"]),
+            "cantidad": int(linea["cantidad"]),
+            "precio_unitario": f"{linea['precio_unitario']:.2f}",
+            "subtotal": f"{linea['subtotal']:.2f}",
+        }
+        for linea in lineas
+    ]
+    return _plantilla("correos/confirmacion_pedido.html").render({
+        "pedido": pedido,
+        "filas": filas,
+        "envio": f"{envio:.2f}" if envio else None,
+        "total": f"{pedido.total:.2f}",
+    })
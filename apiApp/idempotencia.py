@@ -0,0 +1,72 @@
+# apiApp/idempotencia.py
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# Registro por Idempotency-Key en el cache compartido (Redis en producción):
+# {"estado", "huella"} mientras la primera petición corre y, al terminar,
+# también el status y el cuerpo para repetirlos.
+CABECERA = "Idempotency-Key"
+EN_CURSO = "en_curso"
+COMPLETA = "completa"
+LONGITUD_MAXIMA = 255
+
+
+def clave_idempotencia(ambito, valor):
+    """
+    Clave del cache para una Idempotency-Key; ValueError si no es válida.
+    """
+    if not valor or len(valor) > LONGITUD_MAXIMA or not valor.isascii() or not valor.isprintable():
+        raise ValueError(f"{CABECERA} debe tener entre 1 y {LONGITUD_MAXIMA} caracteres ASCII imprimibles.")
+    return f"idempotencia:{ambito}:{hashlib.sha256(valor.encode()).hexdigest()}"
+
+
+def huella_peticion(datos):
+    # Sobre los datos ya parseados: el orden de las claves y los espacios
+    # del JSON no cambian la huella.
+    texto = json.dumps(datos, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def reservar(clave, huella):
+    """
+    Toma la clave con cache.add (atómico en Redis y LocMem). None si se
+    tomó; si no, el registro de quien la tiene.
+    """
+    registro = {"estado": EN_CURSO, "huella": huella}
+    for _ in range(2):
+        if cache.add(clave, registro, timeout=settings.IDEMPOTENCIA_BLOQUEO_TTL):
+            return None
+        existente = cache.get(clave)
+        if existente is not None:
+            return existente
+    # Expiró entre el add y el get dos veces seguidas: se trata como ocupada.
+    return registro
+
+
+def completar(clave, huella, respuesta):
+    registro = {
+        "estado": COMPLETA,
+        "huella": huella,
+        "status": respuesta.status_code,
+        "data": respuesta.data,
+        "headers": {nombre: respuesta[nombre] for nombre in ("Location",) if respuesta.has_header(nombre)},
+    }
+    try:
+        cache.set(clave, registro, timeout=settings.IDEMPOTENCIA_TTL)
+    except Exception:
+        # La escritura ya se confirmó: mejor una respuesta sin registro que un 500.
+        logger.exception("No se pudo guardar la respuesta de la clave de idempotencia %s", clave)
+
+
+def liberar(clave):
+    try:
+        cache.delete(clave)
+    except Exception:
+        logger.exception("No se pudo liberar la clave de idempotencia %s", clave)
@@ -0,0 +1,315 @@
+import json
+import math
+import os
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from apiApp.models import MetodoPago, Pedido, Producto
+
+from .generar_datos_sinteticos import verificar_base_sintetica
+
+ESCENARIOS = [
+    "catalogo", "busqueda", "detalle", "stock",
+    "checkout_1", "checkout_10", "checkout_50", "pedido_codigo",
+]
+CHECKOUTS = {"checkout_1", "checkout_10", "checkout_50"}
+# Consultas de la petición, del header Server-Timing de apiApp.metricas.
+CONSULTAS = re.compile(r'db;[^,]*desc="(\d+) consultas"')
+
+
+def percentil(valores, p):
+    # Nearest-rank: siempre devuelve una medición real.
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def rss_mb(pid):
+    """
+    Memoria residente de un proceso en MiB (Linux); None si /proc no está.
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as archivo:
+            return int(archivo.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return None
+
+
+def hijos(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as archivo:
+            return [int(hijo) for hijo in archivo.read().split()]
+    except OSError:
+        return []
+
+
+class ClienteDjango:
+    """
+    Test client en el mismo proceso: mide la pila de Django sin red ni
+    servidor; el RSS es el de este proceso.
+    """
+
+    def __init__(self):
+        # Un host permitido; "testserver" solo lo acepta el runner de tests.
+        host = settings.ALLOWED_HOSTS[0].lstrip(".").replace("*", "localhost") if settings.ALLOWED_HOSTS else "localhost"
+        self.cliente = Client(HTTP_HOST=host, HTTP_ACCEPT="application/json")
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        if metodo == "POST":
+            respuesta = self.cliente.post(ruta, cuerpo, content_type="application/json")
+        else:
+            respuesta = self.cliente.get(ruta)
+        if respuesta.streaming:
+            b"".join(respuesta.streaming_content)
+        return respuesta.status_code, respuesta.headers.get("Server-Timing", "")
+
+    def rss(self):
+        return rss_mb(os.getpid())
+
+    def cerrar(self):
+        pass
+
+
+class ClienteHttp:
+    """
+    Servidor real: el gunicorn que levanta el comando o uno ya corriendo
+    (--url). El RSS es el del worker si el servidor es local.
+    """
+
+    def __init__(self, url, servidor=None):
+        self.url = url.rstrip("/")
+        self.servidor = servidor
+        self.sesion = requests.Session()
+        self.sesion.headers["Accept"] = "application/json"
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        respuesta = self.sesion.request(metodo, self.url + ruta, json=cuerpo, timeout=60)
+        return respuesta.status_code, respuesta.headers.get("Server-Timing", "")
+
+    def rss(self):
+        if self.servidor is None:
+            return None
+        workers = hijos(self.servidor.pid) or [self.servidor.pid]
+        medidas = [rss_mb(pid) for pid in workers]
+        return max((m for m in medidas if m is not None), default=None)
+
+    def cerrar(self):
+        if self.servidor is not None:
+            self.servidor.terminate()
+            self.servidor.wait(timeout=10)
+
+
+def levantar_gunicorn(modo, puerto):
+    entorno = dict(
+        os.environ, SERVIDOR=modo, WEB_CONCURRENCY="1", CORREOS_ENCOLAR="False", METRICAS_SERVER_TIMING="True"
+    )
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "--bind", f"127.0.0.1:{puerto}", "--log-level", "warning"],
+        cwd=settings.BASE_DIR, env=entorno,
+    )
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            requests.get(f"http://127.0.0.1:{puerto}/api/", timeout=1)
+            return servidor
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    servidor.terminate()
+    raise CommandError(f"gunicorn en modo {modo} no respondió.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de la API con escenarios fijos (catálogo, búsqueda, detalle, "
+        "stock, checkout de 1/10/50 líneas, pedido por código) contra el test "
+        "client o un gunicorn real. Reporta p50/p95/p99, consultas por petición "
+        "y RSS, y compara con una línea base en JSON. Usa los datos de la base: "
+        "cargarlos antes con generar_datos_sinteticos. Los checkouts crean "
+        "pedidos reales y descuentan stock: solo corre con DEBUG o sobre datos "
+        "sintéticos, y no encola los correos de confirmación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--objetivo", choices=["cliente", "gunicorn"], default="cliente")
+        parser.add_argument("--modo", choices=["wsgi", "asgi"], default="wsgi", help="Modo de gunicorn.")
+        parser.add_argument("--url", help="Servidor ya levantado (con --objetivo gunicorn).")
+        parser.add_argument("--puerto", type=int, default=8766)
+        parser.add_argument("--escenarios", nargs="*", choices=ESCENARIOS, default=ESCENARIOS)
+        parser.add_argument("--repeticiones", type=int, default=200)
+        parser.add_argument("--calentamiento", type=int, default=10)
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--guardar", help="Escribe el resultado en este JSON (p. ej. la nueva línea base).")
+        parser.add_argument("--comparar", help="Línea base JSON con la que comparar.")
+        parser.add_argument("--tolerancia", type=float, default=10.0,
+                            help="%% de empeoramiento del p95 aceptado frente a la línea base.")
+
+    def handle(self, *args, **options):
+        if options["url"] and CHECKOUTS & set(options["escenarios"]):
+            # En un servidor ajeno no se puede evitar que encole los correos.
+            raise CommandError(
+                "Con --url solo se permiten escenarios de lectura; los checkouts crean pedidos en ese servidor."
+            )
+        verificar_base_sintetica("bench_api")
+        self.preparar_datos(options["semilla"])
+        # Server-Timing trae las consultas por petición aunque DEBUG esté apagado.
+        with override_settings(CORREOS_ENCOLAR=False, METRICAS_SERVER_TIMING=True):
+            self.ejecutar(options)
+
+    def ejecutar(self, options):
+        if options["objetivo"] == "cliente":
+            cliente = ClienteDjango()
+        elif options["url"]:
+            cliente = ClienteHttp(options["url"])
+        else:
+            servidor = levantar_gunicorn(options["modo"], options["puerto"])
+            cliente = ClienteHttp(f"http://127.0.0.1:{options['puerto']}", servidor)
+
+        resultado = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "objetivo": options["objetivo"] if options["objetivo"] == "cliente" else f"gunicorn-{options['modo']}",
+            "motor": connection.vendor,
+            "productos": len(self.productos),
+            "pedidos": Pedido.objects.count(),
+            "repeticiones": options["repeticiones"],
+            "escenarios": {},
+        }
+        self.stdout.write(
+            f"{resultado['objetivo']} sobre {resultado['motor']}: {resultado['productos']} productos, "
+            f"{resultado['pedidos']} pedidos, {options['repeticiones']} peticiones por escenario"
+        )
+        self.stdout.write(
+            f"{'escenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'consultas':>10} {'RSS MiB':>8} {'errores':>8}"
+        )
+        try:
+            for nombre in options["escenarios"]:
+                medicion = self.medir(cliente, nombre, options["repeticiones"], options["calentamiento"])
+                resultado["escenarios"][nombre] = medicion
+                self.stdout.write(
+                    f"{nombre:<14} {medicion['p50_ms']:>8.2f} {medicion['p95_ms']:>8.2f} {medicion['p99_ms']:>8.2f} "
+                    f"{_texto(medicion['consultas']):>10} {_texto(medicion['rss_mb']):>8} {medicion['errores']:>8}"
+                )
+        finally:
+            cliente.cerrar()
+
+        if options["guardar"]:
+            with open(options["guardar"], "w") as archivo:
+                json.dump(resultado, archivo, indent=2)
+            self.stdout.write(f"Resultado guardado en {options['guardar']}.")
+        if options["comparar"]:
+            self.comparar(resultado, options["comparar"], options["tolerancia"])
+
+    def preparar_datos(self, semilla):
+        self.azar = random.Random(semilla)
+        self.productos = list(Producto.objects.order_by("id").values_list("id", "nombre"))
+        self.codigos = list(Pedido.objects.order_by("id").values_list("codigo", flat=True)[:1000])
+        metodo = MetodoPago.objects.order_by("id").values_list("id", flat=True).first()
+        if len(self.productos) < 50 or not self.codigos or metodo is None:
+            raise CommandError(
+                "Hacen falta al menos 50 productos, un pedido y un método de pago: "
+                "ejecuta antes generar_datos_sinteticos."
+            )
+        self.metodo_pago = metodo
+        self.terminos = sorted({nombre.split()[0].lower() for _, nombre in self.productos[:500]})
+
+    def peticion(self, nombre):
+        """
+        (método, ruta, cuerpo) de una petición del escenario. Los ids y
+        términos salen de self.azar, así cada corrida repite la secuencia.
+        """
+        azar = self.azar
+        if nombre == "catalogo":
+            return "GET", "/api/productos/", None
+        if nombre == "busqueda":
+            return "GET", f"/api/productos/?search={azar.choice(self.terminos)}", None
+        if nombre == "detalle":
+            return "GET", f"/api/productos/{azar.choice(self.productos)[0]}/", None
+        if nombre == "stock":
+            ids = ",".join(str(pid) for pid, _ in azar.sample(self.productos, 20))
+            return "GET", f"/api/productos/stock/?ids={ids}", None
+        if nombre == "pedido_codigo":
+            return "GET", f"/api/pedidos/codigo/{azar.choice(self.codigos)}/", None
+        lineas = int(nombre.split("_")[1])
+        return "POST", "/api/pedidos/", {
+            "nombre": "Bench", "apellido": "Api", "dni": "12345678", "telefono": "999999999",
+            "correo": "bench@example.com", "metodo_pago_id": self.metodo_pago,
+            "items": [
+                {"producto_id": pid, "cantidad": azar.randint(1, 3)}
+                for pid, _ in azar.sample(self.productos, lineas)
+            ],
+        }
+
+    def medir(self, cliente, nombre, repeticiones, calentamiento):
+        for _ in range(calentamiento):
+            cliente.pedir(*self.peticion(nombre))
+        tiempos, consultas, errores = [], [], 0
+        for _ in range(repeticiones):
+            peticion = self.peticion(nombre)
+            inicio = time.perf_counter()
+            estado, server_timing = cliente.pedir(*peticion)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            errores += estado >= 400
+            coincidencia = CONSULTAS.search(server_timing)
+            if coincidencia:
+                consultas.append(int(coincidencia.group(1)))
+        rss = cliente.rss()
+        return {
+            "p50_ms": round(statistics.median(tiempos), 3),
+            "p95_ms": round(percentil(tiempos, 95), 3),
+            "p99_ms": round(percentil(tiempos, 99), 3),
+            "consultas": round(statistics.mean(consultas), 2) if consultas else None,
+            "rss_mb": round(rss, 1) if rss is not None else None,
+            "errores": errores,
+        }
+
+    def comparar(self, resultado, ruta, tolerancia):
+        """
+        Diferencias contra la línea base. Falla si algún escenario empeora el
+        p95 más de ``tolerancia`` % o hace más consultas que antes.
+        """
+        try:
+            with open(ruta) as archivo:
+                base = json.load(archivo)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"No se pudo leer la línea base {ruta}: {error}")
+        self.stdout.write(f"\nContra {ruta} ({base.get('objetivo')}, {base.get('fecha')}):")
+        regresiones = []
+        for nombre, actual in resultado["escenarios"].items():
+            anterior = base.get("escenarios", {}).get(nombre)
+            if anterior is None:
+                self.stdout.write(f"{nombre:<14} sin línea base")
+                continue
+            cambio = (actual["p95_ms"] / anterior["p95_ms"] - 1) * 100 if anterior["p95_ms"] else 0
+            linea = (
+                f"{nombre:<14} p50 {_cambio(anterior['p50_ms'], actual['p50_ms'])}  "
+                f"p95 {_cambio(anterior['p95_ms'], actual['p95_ms'])}  "
+                f"consultas {_texto(anterior['consultas'])} -> {_texto(actual['consultas'])}"
+            )
+            if cambio > tolerancia:
+                regresiones.append(f"{nombre}: p95 {cambio:+.1f} %")
+            if (actual["consultas"] or 0) > (anterior["consultas"] or 0):
+                regresiones.append(f"{nombre}: {anterior['consultas']} -> {actual['consultas']} consultas")
+            self.stdout.write(linea)
+        if regresiones:
+            raise CommandError("Regresiones frente a la línea base: " + "; ".join(regresiones))
+        self.stdout.write(self.style.SUCCESS("Sin regresiones frente a la línea base."))
+
+
+def _texto(valor):
+    return "-" if valor is None else str(valor)
+
+
+def _cambio(anterior, actual):
+    porcentaje = (actual / anterior - 1) * 100 if anterior else 0
+    return f"{anterior:.2f} -> {actual:.2f} ms ({porcentaje:+.1f} %)"
@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apiApp.models import Producto
+from apiApp.search import IcontainsBusqueda, obtener_backend
+
+PALABRAS = [
+    "zapato", "cuero", "polo", "algodón", "casaca", "jean", "mochila", "gorra",
+    "camisa", "vestido", "deportivo", "elegante", "niño", "mujer", "hombre",
+    "verano", "invierno", "lana", "seda", "reloj", "cartera", "correa", "bufanda",
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compara la búsqueda icontains (SearchFilter anterior) con el índice de texto del motor."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--generar", type=int, default=0,
+                            help="Crea N productos sintéticos solo durante la medición (se revierte).")
+        parser.add_argument("--repeticiones", type=int, default=20)
+        parser.add_argument("--terminos", nargs="*", default=["zapato", "algodon cuero", "dep", "bufandas"])
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["generar"]:
+                    self.generar(options["generar"])
+                self.medir(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generar(self, cantidad):
+        # Vocabulario amplio para que cada término sea selectivo como en un catálogo real.
+        silabas = ["ma", "pe", "ro", "ta", "ce", "lu", "ni", "so", "gra", "tri", "mon", "ver", "cal"]
+        vocabulario = PALABRAS + ["".join(random.choices(silabas, k=3)) for _ in range(5000)]
+        lote = []
+        for i in range(cantidad):
+            nombre = " ".join(random.choices(vocabulario, k=3))
+            descripcion = " ".join(random.choices(vocabulario, k=40))
+            lote.append(Producto(nombre=f"{nombre} {i}", descripcion=descripcion, cantidad=10))
+            if len(lote) == 5000:
+                Producto.objects.bulk_create(lote)
+                lote = []
+        Producto.objects.bulk_create(lote)
+
+    def medir(self, options):
+        backend = obtener_backend()
+        total = Producto.objects.count()
+        self.stdout.write(f"Productos: {total}  backend: {type(backend).__name__}")
+        for termino in options["terminos"]:
+            for nombre, implementacion in (("icontains", IcontainsBusqueda()), ("índice", backend)):
+                tiempos = []
+                for _ in range(options["repeticiones"]):
+                    inicio = time.perf_counter()
+                    resultados = list(
+                        implementacion.buscar(Producto.objects.all(), termino)
+                        .order_by("-rango", "id").values_list("id", flat=True)[:24]
+                    )
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                self.stdout.write(
+                    f"{termino!r:<18} {nombre:<10} p50 {statistics.median(tiempos):8.2f} ms  "
+                    f"max {max(tiempos):8.2f} ms  ({len(resultados)} resultados)"
+                )
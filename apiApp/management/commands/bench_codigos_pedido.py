@@ -0,0 +1,53 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from apiApp.codigos import AsignadorCodigos
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el costo de asignar códigos de pedido con el bucle aleatorio "
+        "anterior y con la permutación, a distintos niveles de ocupación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--longitud", type=int, default=5)
+        parser.add_argument("--muestras", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        longitud = options["longitud"]
+        capacidad = 10 ** longitud
+        asignador = AsignadorCodigos(string.digits, longitud, b"benchmark")
+
+        self.stdout.write(f"Espacio de códigos: {capacidad}")
+        self.stdout.write(f"{'ocupación':>10} {'aleatorio: consultas/código':>28} {'µs/código':>10} {'permutación: µs/código':>24}  (la permutación no consulta la BD)")
+        for ocupacion in (0.10, 0.50, 0.90, 0.99):
+            usados = int(capacidad * ocupacion)
+            # El set hace de tabla Pedido: cada comprobación sería un exists() en la BD.
+            existentes = {asignador.codigo(n) for n in range(usados)}
+            consultas, tiempo_aleatorio = self.medir_aleatorio(existentes, longitud, options["muestras"])
+            tiempo_permutacion = self.medir_permutacion(asignador, usados, options["muestras"])
+            self.stdout.write(
+                f"{ocupacion:>10.0%} {consultas:>28.2f} {tiempo_aleatorio:>10.2f} {tiempo_permutacion:>24.2f}"
+            )
+
+    def medir_aleatorio(self, existentes, longitud, muestras):
+        consultas = 0
+        inicio = time.perf_counter()
+        for _ in range(muestras):
+            while True:
+                consultas += 1
+                codigo = "".join(random.choices(string.digits, k=longitud))
+                if codigo not in existentes:
+                    break
+        return consultas / muestras, (time.perf_counter() - inicio) / muestras * 1e6
+
+    def medir_permutacion(self, asignador, desde, muestras):
+        hasta = min(desde + muestras, asignador.capacidad)
+        inicio = time.perf_counter()
+        for numero in range(desde, hasta):
+            asignador.codigo(numero)
+        return (time.perf_counter() - inicio) / max(hasta - desde, 1) * 1e6
@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+from decimal import Decimal
+
+from cloudinary import CloudinaryResource
+from django.core.management.base import BaseCommand
+
+from apiApp.correos import fragmentos, imagen_principal_url, render_confirmacion_pedido
+from apiApp.models import ImagenProducto, Pedido, Producto
+
+
+def render_fstring(pedido, lineas, envio):
+    """
+    Reproducción del armado anterior (f-strings concatenados por línea),
+    solo como referencia para el benchmark.
+    """
+    items_html = ""
+    for linea in lineas:
+        producto = linea["producto"]
+        imagen_url = imagen_principal_url(producto)
+        items_html += f"""
+            <tr>
+                <td style="padding:8px; border:1px solid #ddd; display:flex; align-items:center; gap:8px;">
+                    <img src="{imagen_url}" alt="{producto.nombre}" width="50" height="50" style="object-fit:cover; border-radius:4px;">
+                    <span>{producto.nombre}</span>
+                </td>
+                <td style="padding:8px; border:1px solid #ddd; text-align:center;">{linea["cantidad"]}</td>
+                <td style="padding:8px; border:1px solid #ddd; text-align:right;">S/. {linea["precio_unitario"]:.2f}</td>
+                <td style="padding:8px; border:1px solid #ddd; text-align:right;">S/. {linea["subtotal"]:.2f}</td>
+            </tr>
+            """
+    return f"""
+        <div style="font-family: Arial, sans-serif; max-width:600px; margin:auto;">
+            <h2>¡Gracias por tu pedido, {pedido.nombre}!</h2>
+            <p>Tu código de pedido es: <b>{pedido.codigo}</b></p>
+            <table><tbody>{items_html}</tbody></table>
+            <h3>Total: S/. {pedido.total:.2f}</h3>
+        </div>
+        """
+
+
+class Command(BaseCommand):
+    help = "Mide el render del correo de confirmación para un pedido sintético."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=50)
+        parser.add_argument("--repeticiones", type=int, default=200)
+
+    def handle(self, *args, **options):
+        lineas = []
+        for i in range(1, options["items"] + 1):
+            producto = Producto(pk=i, nombre=f"Producto <{i}> & Cía", descripcion="", cantidad=100)
+            imagen = ImagenProducto(pk=i, producto=producto, imagen=CloudinaryResource(f"productos/muestra_{i}", format="jpg"))
+            producto._prefetched_objects_cache = {"imagenes": [imagen]}
+            precio = Decimal("12.50")
+            lineas.append({"producto": producto, "cantidad": i, "precio_unitario": precio, "subtotal": precio * i})
+        pedido = Pedido(nombre="Ana", codigo="00000", total=sum(l["subtotal"] for l in lineas))
+
+        self.medir("f-string (anterior)", render_fstring, pedido, lineas, options["repeticiones"])
+        fragmentos.limpiar()
+        self.medir("plantilla (primer render)", render_confirmacion_pedido, pedido, lineas, 1)
+        self.medir("plantilla (fragmentos en cache)", render_confirmacion_pedido, pedido, lineas, options["repeticiones"])
+
+    def medir(self, nombre, funcion, pedido, lineas, repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion(pedido, lineas, 0)
+        por_render = (time.perf_counter() - inicio) / repeticiones * 1000
+
+        tracemalloc.start()
+        funcion(pedido, lineas, 0)
+        instantanea = tracemalloc.take_snapshot()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        bloques = sum(stat.count for stat in instantanea.statistics("filename"))
+
+        self.stdout.write(
+            f"{nombre:<34} {por_render:8.3f} ms/pedido  pico {pico / 1024:8.1f} KiB  bloques vivos {bloques}"
+        )
@@ -0,0 +1,100 @@
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apiApp.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta gunicorn con un worker en modo wsgi y en modo asgi y compara "
+        "el throughput con peticiones concurrentes a los endpoints de lectura."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modos", nargs="*", default=["wsgi", "asgi"])
+        parser.add_argument("--rutas", nargs="*",
+                            help="Rutas a medir; por defecto lista, detalle y cantidad de un producto.")
+        parser.add_argument("--concurrencia", type=int, default=32)
+        parser.add_argument("--peticiones", type=int, default=2000)
+        parser.add_argument("--puerto", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        rutas = options["rutas"] or self.rutas_por_defecto()
+        self.stdout.write(
+            f"1 worker, concurrencia {options['concurrencia']}, {options['peticiones']} peticiones por ruta"
+        )
+        self.stdout.write(f"{'modo':<6} {'ruta':<32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errores':>8}")
+        for modo in options["modos"]:
+            servidor = self.levantar(modo, options["puerto"])
+            try:
+                for ruta in rutas:
+                    url = f"http://127.0.0.1:{options['puerto']}{ruta}"
+                    # Calienta el cache del catálogo antes de medir.
+                    requests.get(url, timeout=10)
+                    rps, tiempos, errores = self.cargar(url, options["concurrencia"], options["peticiones"])
+                    p95 = statistics.quantiles(tiempos, n=20)[-1] if len(tiempos) > 1 else 0
+                    self.stdout.write(
+                        f"{modo:<6} {ruta:<32} {rps:>9.1f} {statistics.median(tiempos):>9.2f} {p95:>9.2f} {errores:>8}"
+                    )
+            finally:
+                servidor.terminate()
+                servidor.wait(timeout=10)
+
+    def rutas_por_defecto(self):
+        producto = Producto.objects.order_by("id").first()
+        if producto is None:
+            raise CommandError("No hay productos; crea alguno o indica --rutas.")
+        return [
+            "/api/productos/",
+            f"/api/productos/{producto.id}/",
+            f"/api/productos/{producto.id}/cantidad/",
+        ]
+
+    def levantar(self, modo, puerto):
+        entorno = dict(os.environ, SERVIDOR=modo, WEB_CONCURRENCY="1")
+        servidor = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+             "--bind", f"127.0.0.1:{puerto}", "--log-level", "warning"],
+            cwd=settings.BASE_DIR, env=entorno,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            try:
+                requests.get(f"http://127.0.0.1:{puerto}/api/", timeout=1)
+                return servidor
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        servidor.terminate()
+        raise CommandError(f"gunicorn en modo {modo} no respondió.")
+
+    def cargar(self, url, concurrencia, peticiones):
+        sesiones = threading.local()
+        cabeceras = {"Accept": "application/json"}
+
+        def pedir(_):
+            sesion = getattr(sesiones, "sesion", None)
+            if sesion is None:
+                sesion = sesiones.sesion = requests.Session()
+            inicio = time.perf_counter()
+            try:
+                ok = sesion.get(url, headers=cabeceras, timeout=30).status_code < 500
+            except requests.RequestException:
+                ok = False
+            return (time.perf_counter() - inicio) * 1000, ok
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(concurrencia) as executor:
+            resultados = list(executor.map(pedir, range(peticiones)))
+        duracion = time.perf_counter() - inicio
+        tiempos = [t for t, _ in resultados]
+        errores = sum(1 for _, ok in resultados if not ok)
+        return peticiones / duracion, tiempos, errores
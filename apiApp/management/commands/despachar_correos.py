@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apiApp.metricas import agrega_en_redis, registro
+from apiApp.outbox import crear_executor, despachar_lote
+
+
+class Command(BaseCommand):
+    help = "Despacha la bandeja de salida de correos (worker en segundo plano)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=settings.CORREOS_HILOS)
+        parser.add_argument("--lote", type=int, default=settings.CORREOS_LOTE)
+        parser.add_argument("--intervalo", type=float, default=2.0,
+                            help="Segundos de espera cuando no hay correos pendientes.")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Procesa lo pendiente y termina.")
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._detener)
+        signal.signal(signal.SIGINT, self._detener)
+        # Los tiempos de Resend se suman en Redis como los de los workers web.
+        registro.asegurar_volcado()
+
+        total = 0
+        with crear_executor(options["hilos"]) as executor:
+            while not self.detener:
+                close_old_connections()
+                procesados = despachar_lote(executor, options["lote"])
+                total += procesados
+                if procesados:
+                    continue
+                if options["una_vez"]:
+                    break
+                time.sleep(options["intervalo"])
+
+        if agrega_en_redis():
+            # Lo medido desde el último volcado del hilo no se pierde al salir.
+            registro.volcar()
+        self.stdout.write(self.style.SUCCESS(f"Correos procesados: {total}"))
+
+    def _detener(self, signum, frame):
+        self.detener = True
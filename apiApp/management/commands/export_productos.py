@@ -0,0 +1,21 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apiApp.productos_io import FORMATOS, exportar_productos
+
+
+class Command(BaseCommand):
+    help = "Exporta todos los productos (con categorías y tarifas) a CSV o JSONL, en el formato de import_productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=FORMATOS, default="csv")
+        parser.add_argument("--salida", help="Archivo de salida; por defecto stdout.")
+
+    def handle(self, *args, **options):
+        lineas = exportar_productos(options["formato"])
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8", newline="") as salida:
+                salida.writelines(lineas)
+        else:
+            sys.stdout.writelines(lineas)
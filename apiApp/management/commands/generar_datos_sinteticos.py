@@ -0,0 +1,192 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apiApp.cache import invalidar_catalogo, invalidar_tarifas, registrar_cambio
+from apiApp.codigos import asignador, siguientes_numeros
+from apiApp.models import (
+    Categoria, ImagenProducto, MetodoPago, Pedido, PedidoItem, Producto, Tarifa
+)
+from apiApp.snapshot import reconstruir_snapshots
+from apiApp.streaming import en_bloques
+from apiApp.ventas import reconstruir_ventas
+
+from .bench_busqueda import PALABRAS
+
+# Mínimos de los tramos de tarifa; cada tramo termina donde empieza el siguiente.
+MINIMOS_TARIFA = [1, 6, 12, 24, 50, 100, 250, 500]
+DEPARTAMENTOS = ["Lima", "Arequipa", "Cusco", "Piura", "La Libertad", "Junín", "Loreto"]
+STOCK_SINTETICO = 10 ** 6
+# Dominio reservado (RFC 2606) de los correos de los pedidos: no recibe
+# correo y marca la base como sintética para bench_api.
+DOMINIO_SINTETICO = "sintetico.invalid"
+
+
+def verificar_base_sintetica(comando, vacia=False):
+    """
+    CommandError salvo con DEBUG o en una base ya cargada con este comando
+    (tiene pedidos del dominio sintético). ``vacia`` acepta además una base
+    sin productos ni pedidos.
+    """
+    if settings.DEBUG or Pedido.objects.filter(correo__endswith=f"@{DOMINIO_SINTETICO}").exists():
+        return
+    if vacia and not Producto.objects.exists() and not Pedido.objects.exists():
+        return
+    raise CommandError(
+        f"{comando} escribe datos de prueba: solo corre con DEBUG o sobre una base "
+        f"{'vacía o ' if vacia else ''}cargada con generar_datos_sinteticos."
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga un catálogo y pedidos sintéticos con bulk inserts, para los "
+        "benchmarks (bench_api). Con la misma --semilla genera los mismos datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=1000)
+        parser.add_argument("--tarifas", type=int, default=3, help="Tramos por producto (máx. 8).")
+        parser.add_argument("--imagenes", type=int, default=2, help="Imágenes por producto.")
+        parser.add_argument("--categorias", type=int, default=20)
+        parser.add_argument("--pedidos", type=int, default=1000)
+        parser.add_argument("--items-por-pedido", type=int, default=5, help="Máximo de ítems por pedido.")
+        parser.add_argument("--dias", type=int, default=90, help="Los pedidos se reparten en los últimos N días.")
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--lote", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not 1 <= options["tarifas"] <= len(MINIMOS_TARIFA):
+            raise CommandError(f"--tarifas debe estar entre 1 y {len(MINIMOS_TARIFA)}.")
+        if options["dias"] < 1:
+            raise CommandError("--dias debe ser al menos 1.")
+        verificar_base_sintetica("generar_datos_sinteticos", vacia=True)
+        self.azar = random.Random(options["semilla"])
+        self.lote = options["lote"]
+        inicio = time.perf_counter()
+
+        with transaction.atomic():
+            categorias = self.generar_categorias(options["categorias"])
+            productos = self.generar_productos(options, categorias)
+            pedidos = self.generar_pedidos(options, productos)
+            transaction.on_commit(self.invalidar)
+        if pedidos:
+            hoy = timezone.localdate()
+            reconstruir_ventas(hoy - timedelta(days=options["dias"]), hoy)
+        if settings.CATALOGO_SNAPSHOT:
+            for ids in en_bloques((p.pk for p in productos), self.lote):
+                reconstruir_snapshots(ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(categorias)} categorías, {len(productos)} productos y {pedidos} pedidos "
+            f"en {time.perf_counter() - inicio:.1f} s."
+        ))
+
+    def invalidar(self):
+        invalidar_catalogo()
+        invalidar_tarifas()
+        for modelo in (Producto, Categoria, Tarifa, ImagenProducto):
+            registrar_cambio(modelo)
+
+    def generar_categorias(self, cantidad):
+        sufijo = Categoria.objects.count()
+        return Categoria.objects.bulk_create(
+            [Categoria(nombre=f"Categoría {sufijo + i}") for i in range(cantidad)]
+        )
+
+    def generar_productos(self, options, categorias):
+        vocabulario = PALABRAS + [f"{a}{b}" for a in PALABRAS[:12] for b in ("ito", "ón", "ero")]
+        minimos = MINIMOS_TARIFA[:options["tarifas"]]
+        ProductoCategoria = Producto.categorias.through
+        creados = []
+        for cantidad in _tamanos(options["productos"], self.lote):
+            productos = Producto.objects.bulk_create([
+                Producto(
+                    nombre=" ".join(self.azar.choices(vocabulario, k=3)).capitalize(),
+                    descripcion=" ".join(self.azar.choices(vocabulario, k=30)),
+                    cantidad=STOCK_SINTETICO,
+                )
+                for _ in range(cantidad)
+            ])
+            tarifas, imagenes, enlaces = [], [], []
+            for producto in productos:
+                precio = Decimal(self.azar.randrange(500, 20000)) / 100
+                for indice, minimo in enumerate(minimos):
+                    maximo = minimos[indice + 1] - 1 if indice + 1 < len(minimos) else None
+                    # Cada tramo 5 % más barato que el anterior.
+                    tarifas.append(Tarifa(
+                        producto=producto, minimo=minimo, maximo=maximo,
+                        precio_unitario=(precio * Decimal("0.95") ** indice).quantize(Decimal("0.01")),
+                    ))
+                imagenes.extend(
+                    ImagenProducto(producto=producto, imagen=f"productos/sintetico_{producto.pk}_{i}")
+                    for i in range(options["imagenes"])
+                )
+                if categorias:
+                    enlaces.extend(
+                        ProductoCategoria(producto_id=producto.pk, categoria_id=categoria.pk)
+                        for categoria in self.azar.sample(categorias, min(len(categorias), self.azar.randint(1, 3)))
+                    )
+            Tarifa.objects.bulk_create(tarifas, batch_size=self.lote)
+            ImagenProducto.objects.bulk_create(imagenes, batch_size=self.lote)
+            ProductoCategoria.objects.bulk_create(enlaces, batch_size=self.lote)
+            creados.extend(productos)
+        return creados
+
+    def generar_pedidos(self, options, productos):
+        if not options["pedidos"]:
+            return 0
+        if not productos:
+            raise CommandError("Sin productos no se pueden generar pedidos.")
+        metodos = list(MetodoPago.objects.all())
+        if not metodos:
+            metodos = [MetodoPago.objects.create(nombre="Sintético")]
+        precios = dict(Tarifa.objects.filter(
+            producto__in=productos, minimo=MINIMOS_TARIFA[0]
+        ).values_list("producto_id", "precio_unitario"))
+        ahora = timezone.now()
+        segundos = options["dias"] * 86400
+        for cantidad in _tamanos(options["pedidos"], self.lote):
+            codigos = [asignador().codigo(numero) for numero in siguientes_numeros(cantidad)]
+            pedidos, lineas = [], []
+            for codigo in codigos:
+                provincia = self.azar.random() < 0.3
+                departamento = self.azar.choice(DEPARTAMENTOS[1:]) if provincia else "Lima"
+                pedido = Pedido(
+                    codigo=codigo, nombre="Cliente", apellido=f"Sintético {codigo}",
+                    dni=f"{self.azar.randrange(10 ** 8):08d}", telefono=f"9{self.azar.randrange(10 ** 8):08d}",
+                    correo=f"{codigo.lower()}@{DOMINIO_SINTETICO}", envio_provincia=provincia,
+                    departamento=departamento, provincia=departamento, distrito="Centro",
+                    direccion="Av. Sintética 123", metodo_pago=self.azar.choice(metodos),
+                )
+                elegidos = self.azar.sample(productos, min(len(productos), self.azar.randint(1, options["items_por_pedido"])))
+                items = [
+                    PedidoItem(producto=producto, cantidad=self.azar.randint(1, 5), precio_unitario=precios[producto.pk])
+                    for producto in elegidos
+                ]
+                pedido.total = sum(item.cantidad * item.precio_unitario for item in items)
+                pedidos.append(pedido)
+                lineas.append(items)
+            Pedido.objects.bulk_create(pedidos)
+            # fecha es auto_now_add: se reparte después con bulk_update.
+            for pedido in pedidos:
+                pedido.fecha = ahora - timedelta(seconds=self.azar.randrange(segundos))
+            Pedido.objects.bulk_update(pedidos, ["fecha"], batch_size=self.lote)
+            items = []
+            for pedido, items_pedido in zip(pedidos, lineas):
+                for item in items_pedido:
+                    item.pedido = pedido
+                    items.append(item)
+            PedidoItem.objects.bulk_create(items, batch_size=self.lote)
+        return options["pedidos"]
+
+
+def _tamanos(total, lote):
+    # Tamaños de los lotes en que se parte ``total``.
+    return [min(lote, total - inicio) for inicio in range(0, total, lote)]
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apiApp.productos_io import FORMATOS, importar_productos
+from apiApp.streaming import lineas_csv
+
+
+def formato_de(ruta, formato):
+    if formato:
+        return formato
+    extension = os.path.splitext(ruta)[1].lstrip(".").lower()
+    if extension in ("ndjson", "json"):
+        extension = "jsonl"
+    if extension not in FORMATOS:
+        raise CommandError("No se reconoce el formato por la extensión; indica --formato.")
+    return extension
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos (con categorías y tarifas) desde un CSV o JSONL por "
+        "lotes transaccionales. Las filas con id actualizan ese producto; sin id se crean."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo, o - para leer de stdin.")
+        parser.add_argument("--formato", choices=FORMATOS)
+        parser.add_argument("--lote", type=int, default=1000)
+        parser.add_argument("--errores", help="Escribe aquí un CSV con linea,error de las filas rechazadas.")
+
+    def handle(self, *args, **options):
+        ruta = options["archivo"]
+        if ruta == "-":
+            if not options["formato"]:
+                raise CommandError("Con stdin indica --formato.")
+            archivo = sys.stdin.buffer
+        else:
+            try:
+                archivo = open(ruta, "rb")
+            except OSError as error:
+                raise CommandError(f"No se pudo abrir {ruta}: {error}")
+        formato = formato_de(ruta, options["formato"])
+
+        inicio = time.perf_counter()
+        with archivo:
+            resultado = importar_productos(archivo, formato, options["lote"])
+        duracion = time.perf_counter() - inicio
+
+        if options["errores"]:
+            with open(options["errores"], "w", encoding="utf-8", newline="") as salida:
+                salida.writelines(lineas_csv(["linea", "error"], resultado.errores))
+        else:
+            for linea, mensaje in resultado.errores[:20]:
+                self.stderr.write(f"  línea {linea}: {mensaje}")
+            if len(resultado.errores) > 20:
+                self.stderr.write(f"  … y {len(resultado.errores) - 20} más (usa --errores para el reporte completo).")
+
+        estilo = self.style.WARNING if resultado.errores else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{resultado.creados} creados, {resultado.actualizados} actualizados, "
+            f"{len(resultado.errores)} filas con error en {duracion:.1f} s."
+        ))
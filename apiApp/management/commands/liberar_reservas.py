@@ -0,0 +1,38 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apiApp.reservas import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = "Suelta las reservas de stock vencidas (worker en segundo plano)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=settings.RESERVAS_LOTE)
+        parser.add_argument("--intervalo", type=float, default=5.0,
+                            help="Segundos de espera cuando no hay reservas vencidas.")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Suelta lo vencido y termina.")
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._detener)
+        signal.signal(signal.SIGINT, self._detener)
+
+        total = 0
+        while not self.detener:
+            liberadas = liberar_vencidas(options["lote"])
+            total += liberadas
+            if liberadas:
+                continue
+            if options["una_vez"]:
+                break
+            time.sleep(options["intervalo"])
+
+        self.stdout.write(self.style.SUCCESS(f"Reservas liberadas: {total}"))
+
+    def _detener(self, signum, frame):
+        self.detener = True
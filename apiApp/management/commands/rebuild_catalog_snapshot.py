@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apiApp.cache import invalidar_catalogo
+from apiApp.models import Producto, ProductoSnapshot
+from apiApp.snapshot import reconstruir_snapshots
+
+
+class Command(BaseCommand):
+    help = "Reconstruye ProductoSnapshot por lotes (todos los productos o los indicados con --ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument("--ids", type=int, nargs="*")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = 0
+        if options["ids"]:
+            total = reconstruir_snapshots(options["ids"])
+        else:
+            ultimo = 0
+            while True:
+                ids = list(
+                    Producto.objects.filter(pk__gt=ultimo).order_by("pk")
+                    .values_list("pk", flat=True)[:options["lote"]]
+                )
+                if not ids:
+                    break
+                total += reconstruir_snapshots(ids)
+                ultimo = ids[-1]
+                self.stdout.write(f"  {total} productos…")
+            # Snapshots cuyo producto ya no existe (no debería haber: CASCADE).
+            ProductoSnapshot.objects.exclude(producto__in=Producto.objects.all()).delete()
+        invalidar_catalogo()
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} snapshots reconstruidos en {time.perf_counter() - inicio:.1f} s."
+        ))
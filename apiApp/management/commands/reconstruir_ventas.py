@@ -0,0 +1,63 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apiApp.models import Pedido
+from apiApp.ventas import dias_pendientes, recalcular_dias, reconstruir_ventas
+
+
+def fecha(texto):
+    valor = parse_date(texto)
+    if valor is None:
+        raise ValueError(texto)
+    return valor
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los rollups diarios de ventas desde Pedido/PedidoItem, por "
+        "tramos de días (por defecto todo el historial). Con --pendientes solo "
+        "los días con pedidos cuya acumulación en el checkout falló."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=fecha, help="AAAA-MM-DD; por defecto el primer pedido.")
+        parser.add_argument("--hasta", type=fecha, help="AAAA-MM-DD; por defecto hoy.")
+        parser.add_argument("--dias", type=int, default=31, help="Días por transacción.")
+        parser.add_argument("--pendientes", action="store_true",
+                            help="Solo los días con pedidos sin acumular.")
+
+    def handle(self, *args, **options):
+        if options["pendientes"]:
+            dias = sorted(dias_pendientes())
+            recalcular_dias(dias)
+            self.stdout.write(self.style.SUCCESS(
+                f"Días recalculados: {', '.join(map(str, dias))}" if dias else "No hay pedidos pendientes."
+            ))
+            return
+        hasta = options["hasta"] or timezone.localdate()
+        desde = options["desde"]
+        if desde is None:
+            primero = Pedido.objects.aggregate(primero=Min("fecha"))["primero"]
+            if primero is None:
+                self.stdout.write("No hay pedidos.")
+                return
+            desde = timezone.localdate(primero)
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        inicio = time.perf_counter()
+        total = 0
+        tramo = desde
+        while tramo <= hasta:
+            fin = min(tramo + timedelta(days=options["dias"] - 1), hasta)
+            total += reconstruir_ventas(tramo, fin)
+            self.stdout.write(f"  {tramo} – {fin}: {total} pedidos")
+            tramo = fin + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rollups de {desde} a {hasta} reconstruidos ({total} pedidos) en {time.perf_counter() - inicio:.1f} s."
+        ))
@@ -0,0 +1,57 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apiApp.models import Tarifa
+from apiApp.tarifas import validar_tramos
+
+
+class Command(BaseCommand):
+    help = (
+        "Lista los productos con tramos de tarifa solapados o inválidos. Con "
+        "solapes el precio es el del primer tramo que cubre la cantidad."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fallar", action="store_true",
+                            help="Termina con error si encuentra problemas (para el release o CI).")
+        parser.add_argument("--quitar-repetidos", action="store_true",
+                            help="Borra los tramos con el mismo producto y mínimo que otro más antiguo "
+                                 "(requisito de la migración 0010). Lista cada tarifa borrada.")
+
+    def handle(self, *args, **options):
+        if options["quitar_repetidos"]:
+            self.quitar_repetidos()
+
+        filas = Tarifa.objects.order_by("producto_id", "minimo").values_list(
+            "producto_id", "producto__nombre", "minimo", "maximo"
+        ).iterator(chunk_size=2000)
+        afectados = 0
+        for (producto_id, nombre), tramos in groupby(filas, key=lambda fila: fila[:2]):
+            errores = validar_tramos([(minimo, maximo) for _, _, minimo, maximo in tramos], permitir_huecos=True)
+            if errores:
+                afectados += 1
+                self.stdout.write(f"{producto_id} {nombre}: {' '.join(errores)}")
+
+        if afectados and options["fallar"]:
+            raise CommandError(f"{afectados} productos con tramos a corregir.")
+        estilo = self.style.WARNING if afectados else self.style.SUCCESS
+        self.stdout.write(estilo(f"Productos con tramos a corregir: {afectados}"))
+
+    @transaction.atomic
+    def quitar_repetidos(self):
+        # Se conserva el tramo más antiguo (menor id) de cada (producto, mínimo).
+        vistos = set()
+        borrar = []
+        for tarifa in Tarifa.objects.order_by("producto_id", "minimo", "id").iterator(chunk_size=2000):
+            clave = (tarifa.producto_id, tarifa.minimo)
+            if clave in vistos:
+                borrar.append(tarifa)
+                self.stdout.write(
+                    f"Borrada tarifa {tarifa.pk}: producto {tarifa.producto_id}, mínimo {tarifa.minimo}, "
+                    f"máximo {tarifa.maximo}, S/. {tarifa.precio_unitario}"
+                )
+            vistos.add(clave)
+        Tarifa.objects.filter(pk__in=[tarifa.pk for tarifa in borrar]).delete()
+        self.stdout.write(self.style.WARNING(f"Tramos repetidos borrados: {len(borrar)}"))
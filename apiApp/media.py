@@ -0,0 +1,45 @@
+# apiApp/media.py
+from django.conf import settings
+
+from .cache import CacheLRU
+
+# f_auto,q_auto: Cloudinary elige formato (webp/avif) y calidad según el navegador.
+OPTIMIZAR = {"fetch_format": "auto", "quality": "auto"}
+
+# Variantes con nombre que el frontend usa como srcset; los anchos van en px.
+VARIANTES = {
+    "thumbnail": {"width": 160, "height": 160, "crop": "fill", "gravity": "auto", **OPTIMIZAR},
+    "card": {"width": 480, "crop": "limit", **OPTIMIZAR},
+    "zoom": {"width": 1600, "crop": "limit", **OPTIMIZAR},
+}
+
+# URLs ya construidas por (recurso, transformación); acotado en memoria.
+urls = CacheLRU(getattr(settings, "MEDIA_URLS_MAX", 8192))
+
+
+def url_recurso(recurso, **transformacion):
+    """
+    URL de un CloudinaryResource memoizada por public_id y transformación.
+    None si el campo está vacío.
+    """
+    if not recurso:
+        return None
+    opciones = {**recurso.url_options, **transformacion}
+    clave = (
+        recurso.public_id, recurso.resource_type, recurso.type,
+        recurso.version, recurso.format, repr(sorted(opciones.items())),
+    )
+    url = urls.obtener(clave)
+    if url is None:
+        url = recurso.build_url(**opciones)
+        urls.guardar(clave, url)
+    return url
+
+
+def srcset(recurso):
+    """
+    {"thumbnail": url, "card": url, "zoom": url} de una imagen.
+    """
+    if not recurso:
+        return None
+    return {nombre: url_recurso(recurso, **opciones) for nombre, opciones in VARIANTES.items()}
@@ -0,0 +1,402 @@
+# apiApp/metricas.py
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .consultas import contador_actual
+
+# Métricas en el formato de texto de Prometheus. Cada worker las acumula en
+# memoria; con Redis cada METRICAS_INTERVALO segundos vuelca lo nuevo a un
+# hash por métrica (HINCRBY) y /metrics expone la suma de todos los workers.
+# Sin Redis (desarrollo) se exponen las del proceso.
+
+logger = logging.getLogger(__name__)
+
+METRICAS_PREFIJO = "metricas:"
+METRICAS_INTERVALO = getattr(settings, "METRICAS_INTERVALO", 10)
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100)
+INFINITO = 'le="+Inf"'
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=""):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores = {}
+        self._pendientes = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores, n=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + n
+            self._pendientes[valores] = self._pendientes.get(valores, 0) + n
+
+    def drenar(self):
+        # (campo, incremento) sumado desde el último volcado.
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        return [(json.dumps(etiquetas), n) for etiquetas, n in pendientes.items()]
+
+    def desde_hash(self, campos):
+        return {tuple(json.loads(campo)): int(valor) for campo, valor in campos.items()}
+
+    def lineas(self, valores=None):
+        if valores is None:
+            with self._lock:
+                valores = dict(self._valores)
+        for etiquetas, valor in sorted(valores.items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}"
+
+
+class Histograma:
+    """
+    Histograma acumulativo: por cada combinación de etiquetas guarda el
+    conteo de cada bucket, la suma y el total. observar() es O(log buckets).
+    """
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series = {}
+        self._pendientes = {}
+        self._lock = threading.Lock()
+
+    def _serie(self, series, valores):
+        serie = series.get(valores)
+        if serie is None:
+            serie = series[valores] = [[0] * (len(self.buckets) + 1), 0, 0]
+        return serie
+
+    def observar(self, valor, *valores):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            for serie in (self._serie(self._series, valores), self._serie(self._pendientes, valores)):
+                serie[0][indice] += 1
+                serie[1] += valor
+                serie[2] += 1
+
+    def drenar(self):
+        # Un campo por bucket, "suma" y "total": "<etiquetas>|<parte>".
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        campos = []
+        for etiquetas, (conteos, suma, total) in pendientes.items():
+            prefijo = json.dumps(etiquetas)
+            campos.extend((f"{prefijo}|{indice}", conteo) for indice, conteo in enumerate(conteos) if conteo)
+            campos.append((f"{prefijo}|suma", float(suma)))
+            campos.append((f"{prefijo}|total", total))
+        return campos
+
+    def desde_hash(self, campos):
+        series = {}
+        for campo, valor in campos.items():
+            prefijo, _, parte = campo.rpartition("|")
+            serie = self._serie(series, tuple(json.loads(prefijo)))
+            if parte == "suma":
+                serie[1] = float(valor)
+            elif parte == "total":
+                serie[2] = int(valor)
+            else:
+                serie[0][int(parte)] = int(valor)
+        return series
+
+    def lineas(self, series=None):
+        if series is None:
+            with self._lock:
+                series = {etiquetas: (list(conteos), suma, total)
+                          for etiquetas, (conteos, suma, total) in self._series.items()}
+        for etiquetas, (conteos, suma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                le = f'le="{_numero(float(limite))}"'
+                yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, le)} {acumulado}"
+            yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, INFINITO)} {total}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {_numero(float(suma))}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {total}"
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def _clave(nombre):
+    from django.core.cache import cache
+
+    return cache.make_key(f"{METRICAS_PREFIJO}{nombre}")
+
+
+def agrega_en_redis():
+    from .cache import usa_redis
+
+    return usa_redis()
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+        self._pid_volcador = None
+
+    def _registrar(self, metrica):
+        return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def volcar(self):
+        """
+        Suma en Redis lo acumulado por este worker desde el último volcado.
+        """
+        pipeline = _redis().pipeline(transaction=False)
+        for metrica in self._metricas.values():
+            clave = _clave(metrica.nombre)
+            for campo, incremento in metrica.drenar():
+                if isinstance(incremento, float):
+                    pipeline.hincrbyfloat(clave, campo, incremento)
+                else:
+                    pipeline.hincrby(clave, campo, incremento)
+        pipeline.execute()
+
+    def _volcar_siempre(self):
+        while True:
+            time.sleep(METRICAS_INTERVALO)
+            try:
+                self.volcar()
+            except Exception:
+                # Sin Redis se pierde ese tramo; el worker sigue atendiendo.
+                logger.warning("No se pudieron volcar las métricas a Redis.", exc_info=True)
+
+    def asegurar_volcado(self):
+        # Un hilo por proceso, creado después del fork de gunicorn.
+        if self._pid_volcador == os.getpid() or not agrega_en_redis():
+            return
+        with self._lock:
+            if self._pid_volcador != os.getpid():
+                self._pid_volcador = os.getpid()
+                threading.Thread(target=self._volcar_siempre, name="metricas", daemon=True).start()
+
+    def _datos(self):
+        # {nombre: valores} de todos los workers, o None para usar los locales.
+        if not agrega_en_redis():
+            return None
+        self.volcar()
+        pipeline = _redis().pipeline(transaction=False)
+        for nombre in self._metricas:
+            pipeline.hgetall(_clave(nombre))
+        return {
+            nombre: {campo.decode(): valor.decode() for campo, valor in campos.items()}
+            for nombre, campos in zip(self._metricas, pipeline.execute())
+        }
+
+    def exponer(self):
+        datos = self._datos()
+        lineas = []
+        for metrica in self._metricas.values():
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.lineas(None if datos is None else metrica.desde_hash(datos[metrica.nombre])))
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+solicitudes = registro.contador(
+    "http_solicitudes_total", "Peticiones atendidas.", ("metodo", "ruta", "estado"))
+duracion = registro.histograma(
+    "http_duracion_segundos", "Latencia de la vista y el middleware interno.", ("metodo", "ruta"))
+consultas_solicitud = registro.histograma(
+    "db_consultas_por_solicitud", "Consultas SQL por petición.", ("ruta",), BUCKETS_CONSULTAS)
+duracion_db = registro.histograma(
+    "db_duracion_segundos", "Tiempo en la base por petición.", ("ruta",))
+duracion_serializer = registro.histograma(
+    "serializer_duracion_segundos", "Tiempo de to_representation por petición.", ("ruta",))
+operaciones_cache = registro.contador(
+    "cache_operaciones_total", "Lecturas de cache por resultado.", ("cache", "resultado"))
+duracion_externa = registro.histograma(
+    "externo_duracion_segundos", "Llamadas a servicios externos.", ("servicio", "operacion"))
+errores_externos = registro.contador(
+    "externo_errores_total", "Llamadas a servicios externos que fallaron.", ("servicio", "operacion"))
+
+
+# ---------------------------- POR PETICIÓN ----------------------------
+class Tiempos:
+    __slots__ = ("serializer", "externo", "hits", "misses")
+
+    def __init__(self):
+        self.serializer = 0.0
+        self.externo = 0.0
+        self.hits = 0
+        self.misses = 0
+
+
+# Como el contador de consultas: un ContextVar llega también al hilo de
+# sync_to_async bajo ASGI.
+_tiempos = ContextVar("tiempos_solicitud", default=None)
+
+
+def sumar_serializacion(segundos):
+    tiempos = _tiempos.get()
+    if tiempos is not None:
+        tiempos.serializer += segundos
+
+
+def registrar_cache(nombre, hits=0, misses=0):
+    if hits:
+        operaciones_cache.inc(nombre, "hit", n=hits)
+    if misses:
+        operaciones_cache.inc(nombre, "miss", n=misses)
+    tiempos = _tiempos.get()
+    if tiempos is not None:
+        tiempos.hits += hits
+        tiempos.misses += misses
+
+
+@contextmanager
+def medir_externo(servicio, operacion):
+    """
+    Mide una llamada a un servicio externo (Resend, Cloudinary) y cuenta
+    los errores, que se vuelven a lanzar.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errores_externos.inc(servicio, operacion)
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        duracion_externa.observar(segundos, servicio, operacion)
+        tiempos = _tiempos.get()
+        if tiempos is not None:
+            tiempos.externo += segundos
+
+
+def instrumentar_cloudinary():
+    """
+    Envuelve cloudinary.uploader.call_api, por donde pasan las subidas y
+    borrados del SDK (también los de CloudinaryField). Idempotente.
+    """
+    from cloudinary import uploader
+
+    original = uploader.call_api
+    if getattr(original, "medido", False):
+        return
+
+    @wraps(original)
+    def call_api(action, *args, **kwargs):
+        with medir_externo("cloudinary", action):
+            return original(action, *args, **kwargs)
+
+    call_api.medido = True
+    uploader.call_api = call_api
+
+
+# ---------------------------- MIDDLEWARE ----------------------------
+def _ruta(request):
+    # view_name ("producto-list", "admin:apiApp_pedido_changelist") y no el
+    # path, para que las series no crezcan con cada id.
+    coincidencia = getattr(request, "resolver_match", None)
+    return coincidencia.view_name if coincidencia else "sin_ruta"
+
+
+class MetricasMiddleware:
+    """
+    Registra latencia, consultas, serialización y cache de cada petición y,
+    con METRICAS_SERVER_TIMING, los devuelve en el header Server-Timing. Va
+    después de PresupuestoConsultasMiddleware para leer su contador.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = settings.METRICAS_SERVER_TIMING
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tiempos, inicio = Tiempos(), time.perf_counter()
+        token = _tiempos.set(tiempos)
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _tiempos.reset(token)
+        return self.registrar(request, respuesta, tiempos, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        tiempos, inicio = Tiempos(), time.perf_counter()
+        token = _tiempos.set(tiempos)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _tiempos.reset(token)
+        return self.registrar(request, respuesta, tiempos, time.perf_counter() - inicio)
+
+    def registrar(self, request, respuesta, tiempos, segundos):
+        registro.asegurar_volcado()
+        ruta = _ruta(request)
+        solicitudes.inc(request.method, ruta, respuesta.status_code)
+        duracion.observar(segundos, request.method, ruta)
+        contador = contador_actual()
+        if contador is not None:
+            consultas_solicitud.observar(contador.consultas, ruta)
+            duracion_db.observar(contador.segundos, ruta)
+        if tiempos.serializer:
+            duracion_serializer.observar(tiempos.serializer, ruta)
+        if self.server_timing:
+            respuesta["Server-Timing"] = server_timing(tiempos, contador, segundos)
+        return respuesta
+
+
+def server_timing(tiempos, contador, segundos):
+    partes = []
+    if contador is not None:
+        partes.append(f'db;dur={contador.segundos * 1000:.1f};desc="{contador.consultas} consultas"')
+    if tiempos.serializer:
+        partes.append(f"ser;dur={tiempos.serializer * 1000:.1f}")
+    if tiempos.hits or tiempos.misses:
+        partes.append(f'cache;desc="{tiempos.hits} hit {tiempos.misses} miss"')
+    if tiempos.externo:
+        partes.append(f"ext;dur={tiempos.externo * 1000:.1f}")
+    partes.append(f"app;dur={segundos * 1000:.1f}")
+    return ", ".join(partes)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0004_alter_producto_cantidad_alter_producto_fecha_ingreso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('asunto', models.CharField(max_length=255)),
+                ('html', models.TextField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reclamo', models.UUIDField(blank=True, editable=False, null=True)),
+                ('ultimo_error', models.TextField(blank=True, null=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('enviado', models.DateTimeField(blank=True, null=True)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='correos', to='apiApp.pedido')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='apiApp_corr_estado_bfe1b9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+def crear_secuencia(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE SEQUENCE IF NOT EXISTS apiapp_pedido_codigo_seq')
+
+
+def borrar_secuencia(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS apiapp_pedido_codigo_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0005_correosaliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='codigo',
+            field=models.CharField(editable=False, max_length=12, unique=True),
+        ),
+        migrations.RunPython(crear_secuencia, borrar_secuencia),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0006_codigo_pedido_secuencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['-fecha', 'id'], name='pedido_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['fecha_ingreso', 'id'], name='producto_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Índices de texto completo para la búsqueda de productos (apiApp/search.py).
+# Se crean con SQL propio de cada motor; en otros motores no se hace nada y
+# la búsqueda usa icontains.
+
+from django.db import migrations
+
+POSTGRES_CREAR = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION public.es_unaccent (COPY = pg_catalog.spanish);
+            ALTER TEXT SEARCH CONFIGURATION public.es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$
+    """,
+    'ALTER TABLE "apiApp_producto" ADD COLUMN IF NOT EXISTS busqueda tsvector',
+    """
+    CREATE OR REPLACE FUNCTION apiapp_producto_busqueda_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.busqueda :=
+            setweight(to_tsvector('public.es_unaccent', coalesce(NEW.nombre, '')), 'A') ||
+            setweight(to_tsvector('public.es_unaccent', coalesce(NEW.descripcion, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER apiapp_producto_busqueda_tg
+        BEFORE INSERT OR UPDATE OF nombre, descripcion ON "apiApp_producto"
+        FOR EACH ROW EXECUTE FUNCTION apiapp_producto_busqueda_trigger()
+    """,
+    'UPDATE "apiApp_producto" SET nombre = nombre',
+    'CREATE INDEX IF NOT EXISTS apiapp_producto_busqueda_gin ON "apiApp_producto" USING GIN (busqueda)',
+]
+
+POSTGRES_BORRAR = [
+    'DROP TRIGGER IF EXISTS apiapp_producto_busqueda_tg ON "apiApp_producto"',
+    'DROP FUNCTION IF EXISTS apiapp_producto_busqueda_trigger()',
+    'DROP INDEX IF EXISTS apiapp_producto_busqueda_gin',
+    'ALTER TABLE "apiApp_producto" DROP COLUMN IF EXISTS busqueda',
+    'DROP TEXT SEARCH CONFIGURATION IF EXISTS public.es_unaccent',
+]
+
+SQLITE_CREAR = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS apiapp_producto_fts USING fts5(
+        nombre, descripcion,
+        content='apiApp_producto', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apiapp_producto_fts_ai AFTER INSERT ON "apiApp_producto" BEGIN
+        INSERT INTO apiapp_producto_fts(rowid, nombre, descripcion)
+        VALUES (new.id, new.nombre, new.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apiapp_producto_fts_ad AFTER DELETE ON "apiApp_producto" BEGIN
+        INSERT INTO apiapp_producto_fts(apiapp_producto_fts, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.descripcion);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS apiapp_producto_fts_au AFTER UPDATE OF nombre, descripcion ON "apiApp_producto" BEGIN
+        INSERT INTO apiapp_producto_fts(apiapp_producto_fts, rowid, nombre, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.descripcion);
+        INSERT INTO apiapp_producto_fts(rowid, nombre, descripcion)
+        VALUES (new.id, new.nombre, new.descripcion);
+    END
+    """,
+    "INSERT INTO apiapp_producto_fts(apiapp_producto_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BORRAR = [
+    'DROP TRIGGER IF EXISTS apiapp_producto_fts_ai',
+    'DROP TRIGGER IF EXISTS apiapp_producto_fts_ad',
+    'DROP TRIGGER IF EXISTS apiapp_producto_fts_au',
+    'DROP TABLE IF EXISTS apiapp_producto_fts',
+]
+
+SENTENCIAS = {
+    'postgresql': (POSTGRES_CREAR, POSTGRES_BORRAR),
+    'sqlite': (SQLITE_CREAR, SQLITE_BORRAR),
+}
+
+
+def crear_indices(apps, schema_editor):
+    crear, _ = SENTENCIAS.get(schema_editor.connection.vendor, ([], []))
+    for sql in crear:
+        schema_editor.execute(sql)
+
+
+def borrar_indices(apps, schema_editor):
+    _, borrar = SENTENCIAS.get(schema_editor.connection.vendor, ([], []))
+    for sql in borrar:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0007_indices_keyset'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
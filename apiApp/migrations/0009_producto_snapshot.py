@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0008_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoSnapshot',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='apiApp.producto')),
+                ('fecha_ingreso', models.DateField()),
+                ('documento', models.JSONField()),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha_ingreso', 'producto'], name='snapshot_keyset_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:23
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def exigir_tramos_unicos(apps, schema_editor):
+    # No se borra nada aquí: los repetidos se revisan y se quitan a mano con
+    # "manage.py revisar_tarifas --quitar-repetidos" antes de migrar.
+    Tarifa = apps.get_model('apiApp', 'Tarifa')
+    repetidos = list(
+        Tarifa.objects.values('producto', 'minimo').annotate(n=Count('id')).filter(n__gt=1)
+        .order_by('producto', 'minimo')
+    )
+    if repetidos:
+        lineas = []
+        for grupo in repetidos:
+            ids = list(Tarifa.objects.filter(producto=grupo['producto'], minimo=grupo['minimo'])
+                       .order_by('id').values_list('id', flat=True))
+            lineas.append(f"  producto {grupo['producto']}, mínimo {grupo['minimo']}: tarifas {ids}")
+        raise RuntimeError(
+            "Hay tramos de tarifa repetidos (mismo producto y mínimo):\n" + "\n".join(lineas)
+            + "\nRevísalos y ejecuta 'manage.py revisar_tarifas --quitar-repetidos' antes de migrar."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0009_producto_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(exigir_tramos_unicos, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tarifa',
+            constraint=models.UniqueConstraint(fields=('producto', 'minimo'), name='tarifa_producto_minimo_unica'),
+        ),
+    ]
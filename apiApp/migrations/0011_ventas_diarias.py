@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0010_tarifa_producto_minimo_unica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiariaRegion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('departamento', models.CharField(blank=True, max_length=100)),
+                ('provincia', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'departamento', 'provincia'), name='venta_region_dia_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apiApp.categoria')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'categoria'), name='venta_categoria_dia_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaMetodoPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('metodo_pago', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apiApp.metodopago')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'metodo_pago'), name='venta_metodo_pago_dia_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='apiApp.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='venta_producto_dia_unica')],
+            },
+        ),
+    ]
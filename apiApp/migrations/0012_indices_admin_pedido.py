@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0011_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['metodo_pago', '-fecha', 'id'], name='pedido_metodo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['envio_provincia', '-fecha', 'id'], name='pedido_envio_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+def marcar_acumulados(apps, schema_editor):
+    # Los pedidos existentes ya están en los rollups (checkout o reconstruir_ventas).
+    Pedido = apps.get_model('apiApp', 'Pedido')
+    Pedido.objects.update(acumulado=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0012_indices_admin_pedido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='acumulado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(marcar_acumulados, migrations.RunPython.noop),
+    ]
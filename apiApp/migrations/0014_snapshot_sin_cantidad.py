@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:40
+
+from django.db import migrations
+
+
+def quitar_cantidad(apps, schema_editor):
+    # El ProductoSerializer ya no publica el stock; los documentos guardados
+    # antes lo traían en null.
+    ProductoSnapshot = apps.get_model('apiApp', 'ProductoSnapshot')
+    lote = []
+    for snapshot in ProductoSnapshot.objects.only('documento').iterator(chunk_size=500):
+        if 'cantidad' in snapshot.documento:
+            del snapshot.documento['cantidad']
+            lote.append(snapshot)
+        if len(lote) == 500:
+            ProductoSnapshot.objects.bulk_update(lote, ['documento'])
+            lote = []
+    ProductoSnapshot.objects.bulk_update(lote, ['documento'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiApp', '0013_pedido_acumulado'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_cantidad, migrations.RunPython.noop),
+    ]
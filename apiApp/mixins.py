@@ -0,0 +1,174 @@
+# apiApp/mixins.py
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import clave_catalogo, leer_catalogo, guardar_catalogo, versiones_modelos
+from .idempotencia import (
+    CABECERA, COMPLETA, clave_idempotencia, completar, huella_peticion, liberar, reservar
+)
+from .models import ProductoSnapshot
+from .snapshot import documento_snapshot
+
+
+def parametros_cache(query_params):
+    return urlencode(sorted(query_params.lists()), doseq=True)
+
+
+class CatalogoCacheMixin:
+    """
+    Cachea el payload serializado de list/retrieve bajo la versión actual
+    del catálogo. Un hit responde sin tocar la base de datos. El stock no
+    va en el payload, así un pedido no invalida el catálogo.
+    """
+
+    def _cacheado(self, key, generar, request, *args, **kwargs):
+        data = leer_catalogo(key)
+        if data is None:
+            data = generar(request, *args, **kwargs).data
+            guardar_catalogo(key, data)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        key = clave_catalogo("lista", parametros_cache(request.query_params))
+        return self._cacheado(key, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        identificador = f"{kwargs[self.lookup_url_kwarg or self.lookup_field]}?{parametros_cache(request.query_params)}"
+        key = clave_catalogo("detalle", identificador)
+        return self._cacheado(key, super().retrieve, request, *args, **kwargs)
+
+
+def etag_catalogo(versiones, ruta, parametros, media_type):
+    base = f"{ruta}?{parametros}|{media_type}|{'.'.join(map(str, versiones))}"
+    return quote_etag(hashlib.blake2b(base.encode(), digest_size=12).hexdigest())
+
+
+def etag_coincide(request, etag):
+    return etag in parse_etags(request.headers.get("If-None-Match", ""))
+
+
+def validadores(response, etag, cache_control):
+    response["ETag"] = etag
+    patch_vary_headers(response, ["Accept"])
+    if cache_control:
+        patch_cache_control(response, **settings.CACHE_CONTROL.get(cache_control, {}))
+    return response
+
+
+class RespuestaCondicionalMixin:
+    """
+    ETag fuerte para list/retrieve calculado con las versiones de cambio de
+    ``modelos_etag``; un If-None-Match que coincide recibe 304 sin consultar
+    la base ni serializar. ``cache_control`` nombra una entrada de
+    settings.CACHE_CONTROL. Lo que cambia sin registrar un cambio de modelo
+    (el stock de productos) no va en la representación.
+    """
+    modelos_etag = ()
+    cache_control = None
+
+    def _condicional(self, request, generar, *args, **kwargs):
+        # Las versiones se leen antes que los datos: si algo cambia en medio,
+        # la próxima petición trae otro ETag y vuelve a descargar.
+        etag = etag_catalogo(
+            versiones_modelos(self.modelos_etag), request.path,
+            parametros_cache(request.query_params), request.accepted_media_type
+        )
+        if etag_coincide(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = generar(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            validadores(response, etag, self.cache_control)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._condicional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._condicional(request, super().retrieve, *args, **kwargs)
+
+
+class SnapshotCatalogoMixin:
+    """
+    Con settings.CATALOGO_SNAPSHOT, list/retrieve de productos salen de
+    ProductoSnapshot: una lectura por índice y documentos ya serializados.
+    Búsqueda y ?fields=/?omit= siguen por el camino normal.
+    """
+    parametros_sin_snapshot = ('search', 'fields', 'omit')
+
+    def _desde_snapshot(self, request):
+        return settings.CATALOGO_SNAPSHOT and not any(
+            parametro in request.query_params for parametro in self.parametros_sin_snapshot
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self._desde_snapshot(request):
+            return super().list(request, *args, **kwargs)
+        filas = self.paginator.paginate_queryset(ProductoSnapshot.objects.only('fecha_ingreso', 'documento'), request, view=self)
+        return self.paginator.get_paginated_response([fila.documento for fila in filas])
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        if self._desde_snapshot(request) and pk.isdigit():
+            documento = documento_snapshot(int(pk))
+            if documento is not None:
+                return Response(documento)
+        # Sin snapshot (aún no reconstruido) se sirve como siempre.
+        return super().retrieve(request, *args, **kwargs)
+
+
+class IdempotenciaMixin:
+    """
+    Idempotency-Key en create: la primera petición con una clave se ejecuta
+    y su respuesta se guarda IDEMPOTENCIA_TTL segundos; los reintentos con
+    el mismo cuerpo la reciben de nuevo sin volver a escribir. Un duplicado
+    concurrente recibe 409 y la misma clave con otro cuerpo, 422. Sin la
+    cabecera, create funciona como siempre.
+    """
+    idempotencia_ambito = None
+
+    def create(self, request, *args, **kwargs):
+        valor = request.headers.get(CABECERA)
+        if valor is None:
+            return super().create(request, *args, **kwargs)
+        try:
+            clave = clave_idempotencia(self.idempotencia_ambito or self.basename, valor)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        huella = huella_peticion(request.data)
+        registro = reservar(clave, huella)
+        if registro is not None:
+            return self.respuesta_registrada(registro, huella)
+        try:
+            response = super().create(request, *args, **kwargs)
+        except BaseException:
+            liberar(clave)
+            raise
+        # Solo se recuerdan los éxitos: un 4xx se puede corregir y reintentar.
+        if status.is_success(response.status_code):
+            completar(clave, huella, response)
+        else:
+            liberar(clave)
+        return response
+
+    def respuesta_registrada(self, registro, huella):
+        if registro["huella"] != huella:
+            return Response(
+                {"error": f"La {CABECERA} ya se usó con otra petición."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if registro["estado"] != COMPLETA:
+            return Response(
+                {"error": "Hay una petición con esta clave en curso; reintenta en unos segundos."},
+                status=status.HTTP_409_CONFLICT, headers={"Retry-After": "1"},
+            )
+        return Response(
+            registro["data"], status=registro["status"],
+            headers={**registro["headers"], "Idempotent-Replayed": "true"},
+        )
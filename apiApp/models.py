@@ -1,8 +1,8 @@
 # apiApp/models.py
 from django.db import models
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
-import random
-import string
+from .codigos import nuevo_codigo_pedido
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100)
@@ -17,6 +17,12 @@ class Producto(models.Model):
     cantidad = models.PositiveIntegerField(db_index=True)  # Índice
     categorias = models.ManyToManyField(Categoria, related_name='productos')
 
+    class Meta:
+        indexes = [
+            # Keyset de ProductoPagination
+            models.Index(fields=['fecha_ingreso', 'id'], name='producto_keyset_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -28,6 +34,10 @@ class Tarifa(models.Model):
 
     class Meta:
         ordering = ['minimo']
+        constraints = [
+            # Clave del upsert de tramos en import_productos
+            models.UniqueConstraint(fields=['producto', 'minimo'], name='tarifa_producto_minimo_unica'),
+        ]
 
     def __str__(self):
         return f"{self.producto.nombre} - {self.minimo}-{self.maximo or '∞'} unidades → S/{self.precio_unitario}"
@@ -40,6 +50,22 @@ class VideoProducto(models.Model):
     producto = models.ForeignKey(Producto, related_name='videos', on_delete=models.CASCADE)
     video = CloudinaryField("video", resource_type="video", null=True, blank=True)
 
+class ProductoSnapshot(models.Model):
+    """
+    Modelo de lectura del catálogo: el ProductoSerializer completo de cada
+    producto ya serializado. Lo mantiene apiApp.snapshot.
+    """
+    producto = models.OneToOneField(Producto, primary_key=True, related_name='snapshot', on_delete=models.CASCADE)
+    fecha_ingreso = models.DateField()
+    documento = models.JSONField()
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Mismo keyset que ProductoPagination
+            models.Index(fields=['fecha_ingreso', 'producto'], name='snapshot_keyset_idx'),
+        ]
+
 class MetodoPago(models.Model):
     nombre = models.CharField(max_length=50, unique=True)
     descripcion = models.TextField(blank=True, null=True)
@@ -50,7 +76,7 @@ class MetodoPago(models.Model):
         return self.nombre
 
 class Pedido(models.Model):
-    codigo = models.CharField(max_length=5, unique=True, editable=False)
+    codigo = models.CharField(max_length=12, unique=True, editable=False)
     fecha = models.DateTimeField(auto_now_add=True)
     nombre = models.CharField(max_length=100)
     apellido = models.CharField(max_length=100)
@@ -64,6 +90,17 @@ class Pedido(models.Model):
     direccion = models.TextField(blank=True, null=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     metodo_pago = models.ForeignKey(MetodoPago, on_delete=models.PROTECT)
+    # Ya sumado a los rollups de ventas (apiApp.ventas).
+    acumulado = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset de PedidoPagination
+            models.Index(fields=['-fecha', 'id'], name='pedido_keyset_idx'),
+            # Filtros del admin con el mismo orden del listado
+            models.Index(fields=['metodo_pago', '-fecha', 'id'], name='pedido_metodo_fecha_idx'),
+            models.Index(fields=['envio_provincia', '-fecha', 'id'], name='pedido_envio_fecha_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.codigo:
@@ -71,14 +108,20 @@ class Pedido(models.Model):
         super().save(*args, **kwargs)
 
     def generar_codigo_unico(self):
-        while True:
-            codigo = ''.join(random.choices(string.digits, k=5))
-            if not Pedido.objects.filter(codigo=codigo).exists():
-                return codigo
+        # Biyección sobre la secuencia de pedidos: no puede repetirse, así que
+        # no se consulta antes; la restricción unique queda como garantía.
+        return nuevo_codigo_pedido()
 
     def __str__(self):
         return f"Pedido {self.codigo}"
 
+class SecuenciaPedido(models.Model):
+    """
+    Secuencia de números de pedido para motores sin sequences nativas
+    (en Postgres se usa apiapp_pedido_codigo_seq).
+    """
+    pass
+
 class PedidoItem(models.Model):
     pedido = models.ForeignKey(Pedido, related_name='items', on_delete=models.CASCADE)
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
@@ -86,4 +129,88 @@ class PedidoItem(models.Model):
     precio_unitario = models.DecimalField(max_digits=8, decimal_places=2)
 
     def subtotal(self):
-        return self.cantidad * self.precio_unitario
\ No newline at end of file
+        return self.cantidad * self.precio_unitario
+
+class CorreoSaliente(models.Model):
+    """
+    Bandeja de salida de correos. Se escribe en la misma transacción que el
+    pedido y la despacha el comando despachar_correos.
+    """
+    PENDIENTE = 'pendiente'
+    ENVIANDO = 'enviando'
+    ENVIADO = 'enviado'
+    FALLIDO = 'fallido'  # Dead-letter: agotó los reintentos
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (ENVIANDO, 'Enviando'),
+        (ENVIADO, 'Enviado'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    pedido = models.ForeignKey(Pedido, related_name='correos', on_delete=models.SET_NULL, null=True, blank=True)
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    html = models.TextField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    reclamo = models.UUIDField(null=True, blank=True, editable=False)
+    ultimo_error = models.TextField(blank=True, null=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['estado', 'proximo_intento'])]
+
+    def __str__(self):
+        return f"{self.asunto} → {self.destinatario} ({self.estado})"
+
+class VentaDiaria(models.Model):
+    """
+    Rollup diario de ventas (día local). Lo mantiene apiApp.ventas: se suma
+    al confirmar cada pedido y se recalcula con reconstruir_ventas.
+    """
+    fecha = models.DateField()
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    pedidos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+class VentaDiariaProducto(VentaDiaria):
+    # ingresos = subtotal de los ítems del producto
+    producto = models.ForeignKey(Producto, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='venta_producto_dia_unica'),
+        ]
+
+class VentaDiariaCategoria(VentaDiaria):
+    # Un producto con varias categorías suma en cada una
+    categoria = models.ForeignKey(Categoria, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'categoria'], name='venta_categoria_dia_unica'),
+        ]
+
+class VentaDiariaMetodoPago(VentaDiaria):
+    # ingresos = total cobrado (con envío); cada pedido cuenta una sola vez
+    metodo_pago = models.ForeignKey(MetodoPago, related_name='+', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'metodo_pago'], name='venta_metodo_pago_dia_unica'),
+        ]
+
+class VentaDiariaRegion(VentaDiaria):
+    # ingresos = total cobrado; sin envío a provincia quedan en blanco
+    departamento = models.CharField(max_length=100, blank=True)
+    provincia = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'departamento', 'provincia'], name='venta_region_dia_unica'),
+        ]
@@ -0,0 +1,99 @@
+# apiApp/outbox.py
+import logging
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from utils.email_service import obtener_transporte
+from .models import CorreoSaliente
+
+logger = logging.getLogger(__name__)
+
+
+def calcular_espera(intentos):
+    """
+    Backoff exponencial con jitter: base * 2^(intentos-1), acotado al máximo.
+    """
+    espera = min(settings.CORREOS_BACKOFF_BASE * 2 ** max(intentos - 1, 0), settings.CORREOS_BACKOFF_MAX)
+    return timedelta(seconds=espera * random.uniform(0.8, 1.2))
+
+
+def reclamar_lote(tamano):
+    """
+    Marca hasta ``tamano`` correos vencidos como 'enviando' para este worker.
+    Un correo 'enviando' cuyo plazo venció (worker caído) vuelve a reclamarse.
+    """
+    ahora = timezone.now()
+    vencidos = Q(estado__in=[CorreoSaliente.PENDIENTE, CorreoSaliente.ENVIANDO], proximo_intento__lte=ahora)
+    reclamo = uuid.uuid4()
+
+    with transaction.atomic():
+        candidatos = CorreoSaliente.objects.filter(vencidos).order_by('proximo_intento')
+        if connection.features.has_select_for_update_skip_locked:
+            candidatos = candidatos.select_for_update(skip_locked=True)
+        ids = list(candidatos.values_list('id', flat=True)[:tamano])
+        if not ids:
+            return []
+        # El WHERE repite la condición: si otro worker ya los tomó no se pisan.
+        CorreoSaliente.objects.filter(vencidos, id__in=ids).update(
+            estado=CorreoSaliente.ENVIANDO,
+            reclamo=reclamo,
+            intentos=F('intentos') + 1,
+            proximo_intento=ahora + timedelta(seconds=settings.CORREOS_PLAZO_ENVIO),
+        )
+    return list(CorreoSaliente.objects.filter(reclamo=reclamo))
+
+
+def _enviar(transporte, correo):
+    try:
+        transporte.enviar(correo.destinatario, correo.asunto, correo.html)
+        return correo, None
+    except Exception as e:
+        return correo, e
+
+
+def despachar_lote(executor, tamano):
+    """
+    Envía un lote en paralelo. Los hilos solo hacen la llamada HTTP; los
+    resultados se guardan desde el hilo principal. Devuelve cuántos procesó.
+    """
+    correos = reclamar_lote(tamano)
+    if not correos:
+        return 0
+
+    transporte = obtener_transporte()
+    enviados = []
+    for correo, error in executor.map(lambda c: _enviar(transporte, c), correos):
+        if error is None:
+            enviados.append(correo.id)
+            continue
+        logger.warning("Fallo al enviar correo %s (intento %s): %s", correo.id, correo.intentos, error)
+        if correo.intentos >= settings.CORREOS_MAX_INTENTOS:
+            estado, proximo = CorreoSaliente.FALLIDO, correo.proximo_intento
+        else:
+            estado, proximo = CorreoSaliente.PENDIENTE, timezone.now() + calcular_espera(correo.intentos)
+        CorreoSaliente.objects.filter(id=correo.id, reclamo=correo.reclamo).update(
+            estado=estado, proximo_intento=proximo, ultimo_error=str(error)[:2000]
+        )
+
+    if enviados:
+        # Todo el lote comparte el reclamo. Si el plazo venció y otro worker
+        # lo reclamó, esa fila ya es suya: no se marca (puede salir dos veces).
+        reclamo = correos[0].reclamo
+        marcados = CorreoSaliente.objects.filter(id__in=enviados, reclamo=reclamo).update(
+            estado=CorreoSaliente.ENVIADO, enviado=timezone.now(), ultimo_error=None
+        )
+        if marcados != len(enviados):
+            logger.warning("%s correos enviados ya los había reclamado otro worker (reclamo %s).",
+                           len(enviados) - marcados, reclamo)
+    return len(correos)
+
+
+def crear_executor(hilos):
+    return ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="correos")
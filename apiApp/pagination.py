@@ -0,0 +1,183 @@
+# apiApp/pagination.py
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import ProductoSnapshot
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por keyset sobre un orden compuesto y único, p. ej.
+    ('-fecha', 'id'). El cursor es opaco y codifica los valores de la última
+    fila vista, así cada página es un rango del índice y no un OFFSET. Un
+    cursor alterado o mal formado responde 400.
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = None  # Por defecto settings.PAGINACION_TAMANO
+    max_page_size = None  # Por defecto settings.PAGINACION_MAXIMO
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def get_page_size(self, request):
+        page_size = self.page_size or settings.PAGINACION_TAMANO
+        if self.page_size_query_param in request.query_params:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except ValueError:
+                pass
+        return max(1, min(page_size, self.max_page_size or settings.PAGINACION_MAXIMO))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request, queryset, view)
+        page_size = self.get_page_size(request)
+        posicion, reverso = self.decode_cursor(request)
+
+        ordering = [self._invertir(campo) for campo in self.ordering] if reverso else list(self.ordering)
+        if posicion is not None:
+            try:
+                queryset = queryset.filter(self._despues_de(ordering, posicion))
+            except (ValidationError, TypeError, ValueError):
+                raise ParseError('Cursor inválido.')
+        resultados = list(queryset.order_by(*ordering)[:page_size + 1])
+
+        hay_mas = len(resultados) > page_size
+        resultados = resultados[:page_size]
+        if reverso:
+            resultados.reverse()
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, posicion is not None
+        self.page = resultados
+        return resultados
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverso=True)
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _invertir(campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+    def _despues_de(self, ordering, posicion):
+        """
+        (a, b) > (x, y) respetando la dirección de cada campo:
+        a > x OR (a = x AND b > y).
+        """
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(ordering, posicion):
+            nombre = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+            iguales[nombre] = valor
+        return condicion
+
+    def _link(self, instancia, reverso):
+        posicion = [self._valor(instancia, campo.lstrip('-')) for campo in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(posicion, reverso))
+
+    @staticmethod
+    def _valor(instancia, nombre):
+        valor = getattr(instancia, nombre)
+        return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+    def encode_cursor(self, posicion, reverso):
+        datos = json.dumps({'p': posicion, 'r': int(reverso)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            posicion, reverso = datos['p'], bool(datos['r'])
+        except (TypeError, ValueError, KeyError):
+            raise ParseError('Cursor inválido.')
+        if not isinstance(posicion, list) or len(posicion) != len(self.ordering):
+            raise ParseError('Cursor inválido.')
+        return posicion, reverso
+
+
+class PedidoPagination(KeysetPagination):
+    ordering = ('-fecha', 'id')
+
+
+class ProductoPagination(KeysetPagination):
+    ordering = ('fecha_ingreso', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        # Con ?search= los resultados van por relevancia (ver apiApp.search).
+        if 'rango' in queryset.query.annotations:
+            return ('-rango', 'id')
+        # Mismos valores que ('fecha_ingreso', 'id'): los cursores sirven en ambos caminos.
+        if queryset.model is ProductoSnapshot:
+            return ('fecha_ingreso', 'producto_id')
+        return self.ordering
+
+
+class ConteoEstimadoPaginator(Paginator):
+    """
+    Paginador de changelists del admin. Sin filtros, en Postgres toma el
+    total de la estimación del planner (pg_class.reltuples) en vez de un
+    COUNT(*) que recorre la tabla; con filtros, o en tablas chicas, cuenta.
+    """
+    conteo_exacto_hasta = 10000
+
+    @cached_property
+    def count(self):
+        consulta = getattr(self.object_list, 'query', None)
+        conexion = connections[self.object_list.db] if consulta is not None else None
+        if conexion is not None and conexion.vendor == 'postgresql' and not consulta.where:
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [conexion.ops.quote_name(self.object_list.model._meta.db_table)],
+                )
+                fila = cursor.fetchone()
+            # reltuples es -1 si la tabla nunca se analizó.
+            if fila and fila[0] >= self.conteo_exacto_hasta:
+                return fila[0]
+        return super().count
@@ -0,0 +1,96 @@
+# apiApp/pedidos_io.py
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Pedido, PedidoItem
+from .streaming import lineas_csv, lineas_jsonl
+
+# Exportación de pedidos para finanzas: filas de values() leídas con
+# iterator(), sin instanciar modelos ni armar el anidado del serializer.
+FORMATOS = ("csv", "ndjson")
+TAMANO_BLOQUE = 2000
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+COLUMNAS = {
+    "pedidos": [
+        "id", "codigo", "fecha", "nombre", "apellido", "dni", "telefono", "correo",
+        "envio_provincia", "departamento", "provincia", "distrito", "direccion",
+        "metodo_pago__nombre", "total",
+    ],
+    "items": [
+        "id", "pedido__codigo", "pedido__fecha", "producto_id", "producto__nombre",
+        "cantidad", "precio_unitario",
+    ],
+}
+# Campo de fecha por el que se filtra y ordena cada nivel.
+CAMPO_FECHA = {"pedidos": "fecha", "items": "pedido__fecha"}
+
+
+def _fecha(texto, parametro):
+    try:
+        fecha = parse_date(texto)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValueError(f"{parametro} debe tener el formato AAAA-MM-DD.")
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _booleano(texto, parametro):
+    if texto.lower() in ("true", "1", "si", "sí"):
+        return True
+    if texto.lower() in ("false", "0", "no"):
+        return False
+    raise ValueError(f"{parametro} debe ser true o false.")
+
+
+def filtros_exportacion(parametros, nivel):
+    """
+    Filtros del ORM a partir de desde/hasta (AAAA-MM-DD, ambos inclusive),
+    metodo_pago (id) y envio_provincia. ValueError si alguno es inválido.
+    """
+    prefijo = "" if nivel == "pedidos" else "pedido__"
+    filtros = {}
+    if parametros.get("desde"):
+        filtros[f"{prefijo}fecha__gte"] = _fecha(parametros["desde"], "desde")
+    if parametros.get("hasta"):
+        # Rango semiabierto sobre la fecha local: usa el índice de fecha.
+        filtros[f"{prefijo}fecha__lt"] = _fecha(parametros["hasta"], "hasta") + timedelta(days=1)
+    if parametros.get("metodo_pago"):
+        try:
+            filtros[f"{prefijo}metodo_pago_id"] = int(parametros["metodo_pago"])
+        except ValueError:
+            raise ValueError("metodo_pago debe ser el id del método de pago.")
+    if parametros.get("envio_provincia"):
+        filtros[f"{prefijo}envio_provincia"] = _booleano(parametros["envio_provincia"], "envio_provincia")
+    return filtros
+
+
+def _filas(nivel, filtros):
+    modelo = Pedido if nivel == "pedidos" else PedidoItem
+    campo_fecha = CAMPO_FECHA[nivel]
+    filas = (
+        modelo.objects.filter(**filtros)
+        .order_by(campo_fecha, "id")
+        .values(*COLUMNAS[nivel])
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+    for fila in filas:
+        fila[campo_fecha] = timezone.localtime(fila[campo_fecha]).isoformat()
+        if nivel == "items":
+            fila["subtotal"] = fila["cantidad"] * fila["precio_unitario"]
+        yield fila
+
+
+def exportar_pedidos(formato, nivel="pedidos", filtros=None):
+    """
+    Líneas (str) de la exportación de pedidos o de sus ítems. El encabezado
+    del CSV sale antes de la primera consulta.
+    """
+    filas = _filas(nivel, filtros or {})
+    if formato == "csv":
+        columnas = COLUMNAS[nivel] + (["subtotal"] if nivel == "items" else [])
+        return lineas_csv(columnas, ([fila[columna] for columna in columnas] for fila in filas))
+    return lineas_jsonl(filas)
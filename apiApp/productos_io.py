@@ -0,0 +1,349 @@
+# apiApp/productos_io.py
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .cache import invalidar_catalogo, invalidar_tarifas, registrar_cambio
+from .models import Categoria, Producto, Tarifa
+from .signals import senales_suspendidas
+from .snapshot import reconstruir_snapshots
+from .stock import guardar_stock
+from .streaming import en_bloques, leer_csv, leer_jsonl, lineas_csv, lineas_jsonl
+from .tarifas import validar_tramos
+
+# Formato de intercambio de productos. En CSV las categorías van como
+# "A|B" y las tarifas como "1-5:10.00|6-:8.50"; en JSONL como listas.
+# Una columna (o clave) ausente deja ese dato del producto como está.
+FORMATOS = ("csv", "jsonl")
+COLUMNAS = ["id", "nombre", "descripcion", "cantidad", "categorias", "tarifas"]
+CAMPOS_PRODUCTO = ["nombre", "descripcion", "cantidad"]
+SEPARADOR = "|"
+MAX_NOMBRE = Producto._meta.get_field("nombre").max_length
+MAX_CATEGORIA = Categoria._meta.get_field("nombre").max_length
+MAX_PRECIO = Decimal(10) ** (Tarifa._meta.get_field("precio_unitario").max_digits - 2)
+
+
+# ---------------------------- LECTURA ----------------------------
+def _entero(valor, campo):
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} debe ser un entero ('{valor}').")
+    if numero < 0 or isinstance(valor, (bool, float)):
+        raise ValueError(f"{campo} debe ser un entero no negativo ('{valor}').")
+    return numero
+
+
+def _precio(valor):
+    try:
+        precio = Decimal(str(valor).strip())
+    except InvalidOperation:
+        raise ValueError(f"Precio inválido '{valor}'.")
+    if not precio.is_finite() or precio < 0 or precio >= MAX_PRECIO or precio.as_tuple().exponent < -2:
+        raise ValueError(f"Precio inválido '{valor}': hasta 2 decimales y menor que {MAX_PRECIO}.")
+    return precio
+
+
+def _tramo_csv(texto):
+    rango, dos_puntos, precio = texto.partition(":")
+    minimo, guion, maximo = rango.partition("-")
+    if not dos_puntos or not guion:
+        raise ValueError(f"Tramo inválido '{texto}': se espera minimo-maximo:precio (1-5:10.00 o 6-:8.50).")
+    return {"minimo": minimo.strip(), "maximo": maximo.strip() or None, "precio_unitario": precio}
+
+
+def _desde_csv(fila):
+    # Una celda vacía de nombre/descripcion/cantidad no cambia el dato; una
+    # de categorias o tarifas deja al producto sin ellas.
+    datos = {}
+    if fila.get("id"):
+        datos["id"] = fila["id"]
+    for campo in CAMPOS_PRODUCTO:
+        if fila.get(campo):
+            datos[campo] = fila[campo]
+    if fila.get("categorias") is not None:
+        datos["categorias"] = [nombre for nombre in fila["categorias"].split(SEPARADOR)]
+    if fila.get("tarifas") is not None:
+        datos["tarifas"] = [_tramo_csv(tramo) for tramo in fila["tarifas"].split(SEPARADOR) if tramo.strip()]
+    return datos
+
+
+def _desde_jsonl(linea):
+    try:
+        objeto = json.loads(linea)
+    except json.JSONDecodeError as error:
+        raise ValueError(f"JSON inválido: {error.msg}.")
+    if not isinstance(objeto, dict):
+        raise ValueError("Cada línea debe ser un objeto JSON.")
+    datos = {campo: objeto[campo] for campo in ("id", *CAMPOS_PRODUCTO) if objeto.get(campo) is not None}
+    for campo in ("categorias", "tarifas"):
+        if campo in objeto:
+            if not isinstance(objeto[campo], list):
+                raise ValueError(f"{campo} debe ser una lista.")
+            datos[campo] = objeto[campo] or []
+    if any(not isinstance(tramo, dict) for tramo in datos.get("tarifas", [])):
+        raise ValueError("Cada tarifa debe ser un objeto con minimo, maximo y precio_unitario.")
+    return datos
+
+
+def _validar(datos):
+    if "id" in datos:
+        datos["id"] = _entero(datos["id"], "id")
+    if "nombre" in datos:
+        datos["nombre"] = str(datos["nombre"]).strip()
+        if not datos["nombre"] or len(datos["nombre"]) > MAX_NOMBRE:
+            raise ValueError(f"nombre debe tener entre 1 y {MAX_NOMBRE} caracteres.")
+    if "descripcion" in datos:
+        datos["descripcion"] = str(datos["descripcion"])
+    if "cantidad" in datos:
+        datos["cantidad"] = _entero(datos["cantidad"], "cantidad")
+    if "categorias" in datos:
+        nombres = [str(nombre).strip() for nombre in datos["categorias"]]
+        if any(len(nombre) > MAX_CATEGORIA for nombre in nombres):
+            raise ValueError(f"Las categorías tienen máximo {MAX_CATEGORIA} caracteres.")
+        datos["categorias"] = list(dict.fromkeys(nombre for nombre in nombres if nombre))
+    if "tarifas" in datos:
+        tramos = [
+            {
+                "minimo": _entero(tramo.get("minimo"), "minimo"),
+                "maximo": None if tramo.get("maximo") is None else _entero(tramo["maximo"], "maximo"),
+                "precio_unitario": _precio(tramo.get("precio_unitario")),
+            }
+            for tramo in datos["tarifas"]
+        ]
+        errores = validar_tramos([(t["minimo"], t["maximo"]) for t in tramos], permitir_huecos=True)
+        if errores:
+            raise ValueError(" ".join(errores))
+        datos["tarifas"] = tramos
+    return datos
+
+
+def leer_productos(archivo, formato):
+    """
+    (línea, datos validados, error) por cada fila del archivo; datos es None
+    si la fila tiene un error.
+    """
+    if formato == "csv":
+        filas, normalizar = leer_csv(archivo), _desde_csv
+    else:
+        filas, normalizar = leer_jsonl(archivo), _desde_jsonl
+    for linea, fila in filas:
+        try:
+            yield linea, _validar(normalizar(fila)), None
+        except ValueError as error:
+            yield linea, None, str(error)
+
+
+# ---------------------------- IMPORTACIÓN ----------------------------
+class Importacion:
+    """
+    Upsert de productos por lotes, cada uno en su transacción. Una fila con
+    id actualiza ese producto (un id inexistente es un error); sin id crea
+    uno nuevo. Los errores quedan en ``errores`` como (línea, mensaje).
+    """
+
+    def __init__(self, tamano_lote=1000):
+        self.tamano_lote = tamano_lote
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []
+        self._categorias = {}  # nombre -> id, compartido entre lotes
+
+    def ejecutar(self, filas):
+        lote = []
+        with senales_suspendidas():
+            for linea, datos, error in filas:
+                if error:
+                    self.errores.append((linea, error))
+                    continue
+                lote.append((linea, datos))
+                if len(lote) >= self.tamano_lote:
+                    self._procesar(lote)
+                    lote = []
+            if lote:
+                self._procesar(lote)
+        self.errores.sort()
+        # Una sola invalidación para toda la importación.
+        transaction.on_commit(_invalidar_importacion)
+        return self
+
+    def _procesar(self, lote):
+        errores = len(self.errores)
+        try:
+            with transaction.atomic():
+                validas = self._productos(lote)
+                if not validas:
+                    return
+                self._guardar(validas)
+                # Solo el stock que trae el archivo; el resto del espejo no se toca.
+                stock = {producto.pk: producto.cantidad for _, datos, producto in validas if "cantidad" in datos}
+                if stock:
+                    transaction.on_commit(partial(guardar_stock, stock))
+                if settings.CATALOGO_SNAPSHOT:
+                    transaction.on_commit(partial(reconstruir_snapshots, [p.pk for _, _, p in validas]))
+        except DatabaseError as error:
+            # Las categorías creadas en el lote se deshicieron con él.
+            self._categorias.clear()
+            con_error = {linea for linea, _ in self.errores[errores:]}
+            self.errores.extend(
+                (linea, f"Lote no importado: {error}") for linea, _ in lote if linea not in con_error
+            )
+            return
+        nuevos = sum(1 for _, datos, _ in validas if "id" not in datos)
+        self.creados += nuevos
+        self.actualizados += len(validas) - nuevos
+
+    def _productos(self, lote):
+        """
+        (línea, datos, producto) de las filas que se pueden guardar. Un
+        producto existente solo lleva los campos que trae el archivo; se
+        bloquea hasta el fin del lote para que nadie cambie su fila en medio.
+        """
+        # Un id repetido en el lote se combina: cada dato toma su último valor.
+        con_id = {}
+        sin_id = []
+        for linea, datos in lote:
+            if "id" in datos:
+                _, anteriores = con_id.pop(datos["id"], (None, {}))
+                con_id[datos["id"]] = (linea, {**anteriores, **datos})
+            else:
+                sin_id.append((linea, datos))
+
+        existentes = set(
+            Producto.objects.select_for_update().filter(pk__in=list(con_id)).order_by("pk").values_list("pk", flat=True)
+        )
+        validas = []
+        for producto_id, (linea, datos) in con_id.items():
+            if producto_id not in existentes:
+                self.errores.append((linea, f"No existe el producto con id {producto_id}."))
+                continue
+            validas.append((linea, datos, Producto(pk=producto_id, **{c: datos[c] for c in CAMPOS_PRODUCTO if c in datos})))
+        for linea, datos in sin_id:
+            faltantes = [campo for campo in CAMPOS_PRODUCTO if campo not in datos]
+            if faltantes:
+                self.errores.append((linea, f"Para crear un producto falta: {', '.join(faltantes)}."))
+                continue
+            validas.append((linea, datos, Producto(**{c: datos[c] for c in CAMPOS_PRODUCTO})))
+        return validas
+
+    def _guardar(self, validas):
+        Producto.objects.bulk_create([producto for _, datos, producto in validas if "id" not in datos])
+        # Las actualizaciones se agrupan por las columnas que trae cada fila:
+        # una columna ausente no se escribe, ni siquiera con el valor leído.
+        por_campos = defaultdict(list)
+        for _, datos, producto in validas:
+            if "id" in datos:
+                por_campos[tuple(c for c in CAMPOS_PRODUCTO if c in datos)].append(producto)
+        for campos, productos in por_campos.items():
+            if campos:
+                Producto.objects.bulk_update(productos, campos)
+        # Solo los productos que ya existían pueden tener relaciones previas.
+        actualizados = {producto.pk for _, datos, producto in validas if "id" in datos}
+
+        con_categorias = [(producto.pk, datos["categorias"]) for _, datos, producto in validas if "categorias" in datos]
+        if con_categorias:
+            ids = self._ids_categorias({nombre for _, nombres in con_categorias for nombre in nombres})
+            Relacion = Producto.categorias.through
+            Relacion.objects.filter(producto_id__in=[pid for pid, _ in con_categorias if pid in actualizados]).delete()
+            Relacion.objects.bulk_create([
+                Relacion(producto_id=pid, categoria_id=ids[nombre])
+                for pid, nombres in con_categorias for nombre in nombres
+            ])
+
+        con_tarifas = [(producto.pk, datos["tarifas"]) for _, datos, producto in validas if "tarifas" in datos]
+        if con_tarifas:
+            tramos = [Tarifa(producto_id=pid, **tramo) for pid, lista in con_tarifas for tramo in lista]
+            Tarifa.objects.bulk_create(
+                tramos, update_conflicts=True,
+                unique_fields=["producto", "minimo"], update_fields=["maximo", "precio_unitario"],
+            )
+            # Los tramos que el archivo ya no trae se eliminan.
+            vigentes = {(tramo.producto_id, tramo.minimo) for tramo in tramos}
+            sobrantes = [
+                pk for pk, producto_id, minimo
+                in Tarifa.objects.filter(producto_id__in=[pid for pid, _ in con_tarifas if pid in actualizados])
+                .values_list("pk", "producto_id", "minimo")
+                if (producto_id, minimo) not in vigentes
+            ]
+            if sobrantes:
+                Tarifa.objects.filter(pk__in=sobrantes).delete()
+
+    def _ids_categorias(self, nombres):
+        """
+        Id de cada categoría por nombre; las que no existen se crean. Con
+        nombres repetidos en la base se usa la categoría más antigua.
+        """
+        faltantes = nombres - self._categorias.keys()
+        if faltantes:
+            self._categorias.update(
+                Categoria.objects.filter(nombre__in=faltantes).order_by("-pk").values_list("nombre", "pk")
+            )
+            nuevas = Categoria.objects.bulk_create(
+                [Categoria(nombre=nombre) for nombre in faltantes - self._categorias.keys()]
+            )
+            self._categorias.update((categoria.nombre, categoria.pk) for categoria in nuevas)
+        return self._categorias
+
+
+def _invalidar_importacion():
+    invalidar_catalogo()
+    invalidar_tarifas()
+    for modelo in (Producto, Categoria, Tarifa):
+        registrar_cambio(modelo)
+
+
+def importar_productos(archivo, formato, tamano_lote=1000):
+    return Importacion(tamano_lote).ejecutar(leer_productos(archivo, formato))
+
+
+# ---------------------------- EXPORTACIÓN ----------------------------
+def _filas_exportacion(queryset, tamano_bloque=2000):
+    """
+    Productos como dicts con sus categorías y tarifas. Las relaciones se leen
+    con una consulta por bloque en vez de instanciar modelos con prefetch.
+    """
+    Relacion = Producto.categorias.through
+    productos = queryset.order_by("pk").values("id", *CAMPOS_PRODUCTO).iterator(chunk_size=tamano_bloque)
+    for bloque in en_bloques(productos, tamano_bloque):
+        ids = [fila["id"] for fila in bloque]
+        categorias = defaultdict(list)
+        for producto_id, nombre in (
+            Relacion.objects.filter(producto_id__in=ids).order_by("pk").values_list("producto_id", "categoria__nombre")
+        ):
+            categorias[producto_id].append(nombre)
+        tarifas = defaultdict(list)
+        for producto_id, minimo, maximo, precio in (
+            Tarifa.objects.filter(producto_id__in=ids).values_list("producto_id", "minimo", "maximo", "precio_unitario")
+        ):
+            tarifas[producto_id].append({"minimo": minimo, "maximo": maximo, "precio_unitario": precio})
+        for fila in bloque:
+            fila["categorias"] = categorias[fila["id"]]
+            fila["tarifas"] = tarifas[fila["id"]]
+            yield fila
+
+
+def _tramos_csv(tramos):
+    return SEPARADOR.join(
+        f"{t['minimo']}-{'' if t['maximo'] is None else t['maximo']}:{t['precio_unitario']}" for t in tramos
+    )
+
+
+def exportar_productos(formato, queryset=None):
+    """
+    Líneas (str) del archivo de exportación, en el mismo formato que lee
+    importar_productos. Recorre la tabla por bloques sin cargarla entera.
+    """
+    filas = _filas_exportacion(Producto.objects.all() if queryset is None else queryset)
+    if formato == "csv":
+        return lineas_csv(COLUMNAS, (
+            [
+                fila["id"], fila["nombre"], fila["descripcion"], fila["cantidad"],
+                SEPARADOR.join(fila["categorias"]), _tramos_csv(fila["tarifas"]),
+            ]
+            for fila in filas
+        ))
+    return lineas_jsonl(filas)
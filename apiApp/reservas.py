@@ -0,0 +1,295 @@
+# apiApp/reservas.py
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import redis_async, usa_redis
+from .stock import (
+    GUARDAR_LUA, NO_EXISTE, STOCK_TTL, _clave_hash, _redis, aleer_stock, completar_stock, guardar_stock, leer_stock
+)
+
+# Reservas de stock por carrito con vencimiento. En Redis:
+#   reservas:totales          hash {producto: unidades reservadas}
+#   reservas:carrito:<id>     hash {producto: unidades} de un carrito
+#   reservas:vencimientos     zset {carrito: timestamp de vencimiento}
+# Los scripts Lua leen el espejo de stock (apiApp.stock) y validan y
+# escriben en un solo paso, así la disputa por un producto popular se
+# resuelve en Redis y no en el bloqueo de la fila de Producto.
+# Sin Redis se usa un registro en memoria del proceso (desarrollo).
+RESERVAS_TTL = getattr(settings, "RESERVAS_TTL", 60 * 15)
+RESERVAS_MAX_UNIDADES = getattr(settings, "RESERVAS_MAX_UNIDADES", 20)
+TOTALES_KEY = "reservas:totales"
+VENCIMIENTOS_KEY = "reservas:vencimientos"
+
+# KEYS: totales, carrito, vencimientos, stock. ARGV: id, vence, (producto, unidades)...
+# Fija las unidades del carrito para cada producto (0 las libera); bajar una
+# reserva nunca falla. Devuelve {1} si reservó, {0, producto, disponible} si
+# no alcanza y {-1, producto} si el producto aún no está en el espejo de stock.
+RESERVAR_LUA = """
+for i = 3, #ARGV, 2 do
+    local propias = tonumber(redis.call('HGET', KEYS[2], ARGV[i]) or '0')
+    if tonumber(ARGV[i + 1]) > propias then
+        local stock = redis.call('HGET', KEYS[4], ARGV[i])
+        if not stock then
+            return {-1, ARGV[i]}
+        end
+        local libres = tonumber(stock) - tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0') + propias
+        if tonumber(ARGV[i + 1]) > libres then
+            return {0, ARGV[i], math.max(libres, 0)}
+        end
+    end
+end
+for i = 3, #ARGV, 2 do
+    local unidades = tonumber(ARGV[i + 1])
+    local propias = tonumber(redis.call('HGET', KEYS[2], ARGV[i]) or '0')
+    if redis.call('HINCRBY', KEYS[1], ARGV[i], unidades - propias) <= 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+    if unidades > 0 then
+        redis.call('HSET', KEYS[2], ARGV[i], unidades)
+    else
+        redis.call('HDEL', KEYS[2], ARGV[i])
+    end
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+else
+    redis.call('ZREM', KEYS[3], ARGV[1])
+end
+return {1}
+"""
+
+# KEYS: totales, carrito, vencimientos. ARGV: id y, opcional, un instante:
+# solo libera si el carrito venció antes de él (el worker no pisa una renovación).
+LIBERAR_LUA = """
+if ARGV[2] then
+    local vence = redis.call('ZSCORE', KEYS[3], ARGV[1])
+    if vence and tonumber(vence) > tonumber(ARGV[2]) then
+        return 0
+    end
+end
+local items = redis.call('HGETALL', KEYS[2])
+for i = 1, #items, 2 do
+    if redis.call('HINCRBY', KEYS[1], items[i], -tonumber(items[i + 1])) <= 0 then
+        redis.call('HDEL', KEYS[1], items[i])
+    end
+end
+redis.call('DEL', KEYS[2])
+redis.call('ZREM', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Convierte la reserva en descuento: fija en el espejo el stock que dejó el
+# pedido y libera el carrito en el mismo paso, sin un instante en que se
+# cuente dos veces.
+# KEYS: stock, totales, carrito, vencimientos. ARGV: id, (producto, cantidad)..., ttl
+CONVERTIR_LUA = f"""
+local function guardar(KEYS, ARGV)
+{GUARDAR_LUA}
+end
+local function liberar(KEYS, ARGV)
+{LIBERAR_LUA}
+end
+guardar({{KEYS[1]}}, {{unpack(ARGV, 2)}})
+return liberar({{KEYS[2], KEYS[3], KEYS[4]}}, {{ARGV[1]}})
+"""
+
+
+class StockInsuficiente(ValueError):
+    def __init__(self, producto_id, disponible):
+        self.producto_id = producto_id
+        self.disponible = disponible
+        if disponible is None:
+            mensaje = f"El producto {producto_id} no existe."
+        else:
+            mensaje = f"Stock insuficiente para el producto {producto_id}. Solo hay {disponible} disponibles."
+        super().__init__(mensaje)
+
+
+def nuevo_carrito():
+    return uuid.uuid4().hex
+
+
+def _clave_carrito(carrito):
+    return cache.make_key(f"reservas:carrito:{carrito}")
+
+
+def _claves(carrito):
+    return [cache.make_key(TOTALES_KEY), _clave_carrito(carrito), cache.make_key(VENCIMIENTOS_KEY)]
+
+
+# ---------------------------- REGISTRO LOCAL ----------------------------
+# Sin Redis: {carrito: ({producto: unidades}, vence)} y los totales, bajo un
+# lock. Solo es coherente dentro de un proceso.
+_lock = threading.Lock()
+_carritos = {}
+_totales = {}
+
+
+def _liberar_local(carrito):
+    items, _ = _carritos.pop(carrito, ({}, None))
+    for producto_id, unidades in items.items():
+        restantes = _totales.get(producto_id, 0) - unidades
+        if restantes > 0:
+            _totales[producto_id] = restantes
+        else:
+            _totales.pop(producto_id, None)
+
+
+def _vencer_locales(ahora, limite=None):
+    vencidos = [carrito for carrito, (_, vence) in _carritos.items() if vence <= ahora][:limite]
+    for carrito in vencidos:
+        _liberar_local(carrito)
+    return len(vencidos)
+
+
+def _reservar_local(carrito, cantidades, stock, vence):
+    with _lock:
+        _vencer_locales(time.time())
+        propias, _ = _carritos.get(carrito, ({}, None))
+        for producto_id, unidades in cantidades.items():
+            if unidades <= propias.get(producto_id, 0):
+                continue
+            libres = stock[producto_id] - _totales.get(producto_id, 0) + propias.get(producto_id, 0)
+            if unidades > libres:
+                raise StockInsuficiente(producto_id, max(libres, 0))
+        items = dict(propias)
+        for producto_id, unidades in cantidades.items():
+            _totales[producto_id] = _totales.get(producto_id, 0) + unidades - items.get(producto_id, 0)
+            if _totales[producto_id] <= 0:
+                del _totales[producto_id]
+            if unidades:
+                items[producto_id] = unidades
+            else:
+                items.pop(producto_id, None)
+        if items:
+            _carritos[carrito] = (items, vence)
+        else:
+            _carritos.pop(carrito, None)
+
+
+# ---------------------------- API ----------------------------
+def reservar(carrito, cantidades, ttl=None):
+    """
+    Fija las unidades reservadas por el carrito ({producto: unidades}; 0
+    libera el producto) y renueva su vencimiento. Todo o nada: lanza
+    StockInsuficiente con el primer producto que no alcanza. Devuelve el
+    timestamp de vencimiento.
+    """
+    vence = time.time() + (ttl or RESERVAS_TTL)
+    # Solo se valida lo que sube: soltar un producto ya borrado también vale.
+    ids = [producto_id for producto_id, unidades in cantidades.items() if unidades]
+    stock = leer_stock(ids) if ids else {}
+    for producto_id, unidades in cantidades.items():
+        if unidades and producto_id not in stock:
+            raise StockInsuficiente(producto_id, None)
+    if not usa_redis():
+        _reservar_local(carrito, cantidades, stock, vence)
+        return vence
+
+    argumentos = [carrito, vence] + [x for par in cantidades.items() for x in par]
+    claves = _claves(carrito) + [_clave_hash()]
+    resultado = _redis().eval(RESERVAR_LUA, 4, *claves, *argumentos)
+    if resultado[0] == -1:
+        # El hash del espejo venció entre leer_stock y el script: se repone una vez.
+        completar_stock(stock)
+        resultado = _redis().eval(RESERVAR_LUA, 4, *claves, *argumentos)
+    if resultado[0] == 0:
+        raise StockInsuficiente(int(resultado[1]), int(resultado[2]))
+    if resultado[0] == -1:
+        raise StockInsuficiente(int(resultado[1]), 0)
+    return vence
+
+
+def reserva(carrito):
+    """
+    ({producto: unidades}, vence) del carrito, o None si no tiene reservas
+    vigentes.
+    """
+    if not usa_redis():
+        with _lock:
+            items, vence = _carritos.get(carrito, (None, 0))
+            return (dict(items), vence) if items and vence > time.time() else None
+    conexion = _redis()
+    items = conexion.hgetall(_clave_carrito(carrito))
+    vence = conexion.zscore(cache.make_key(VENCIMIENTOS_KEY), carrito)
+    if not items or vence is None or vence <= time.time():
+        return None
+    return {int(producto_id): int(unidades) for producto_id, unidades in items.items()}, vence
+
+
+def liberar(carrito):
+    if not usa_redis():
+        with _lock:
+            _liberar_local(carrito)
+        return
+    _redis().eval(LIBERAR_LUA, 3, *_claves(carrito), carrito)
+
+
+def liberar_vencidas(limite=500):
+    """
+    Libera hasta ``limite`` carritos vencidos; lo corre el comando
+    liberar_reservas en segundo plano. Devuelve cuántos liberó.
+    """
+    ahora = time.time()
+    if not usa_redis():
+        with _lock:
+            return _vencer_locales(ahora, limite)
+    conexion = _redis()
+    vencidos = conexion.zrangebyscore(cache.make_key(VENCIMIENTOS_KEY), "-inf", ahora, start=0, num=limite)
+    liberados = 0
+    for carrito in vencidos:
+        carrito = carrito.decode() if isinstance(carrito, bytes) else carrito
+        liberados += conexion.eval(LIBERAR_LUA, 3, *_claves(carrito), carrito, ahora)
+    return liberados
+
+
+def convertir(carrito, stock):
+    """
+    Tras confirmar un pedido (on_commit): fija en el espejo el stock que
+    quedó ({producto: cantidad}) y suelta la reserva del carrito, si la hay.
+    """
+    if carrito is None:
+        guardar_stock(stock)
+        return
+    if not usa_redis():
+        guardar_stock(stock)
+        with _lock:
+            _liberar_local(carrito)
+        return
+    argumentos = [carrito] + [x for par in stock.items() for x in par] + [STOCK_TTL]
+    _redis().eval(CONVERTIR_LUA, 4, _clave_hash(), *_claves(carrito), *argumentos)
+
+
+def reservados(ids):
+    if not usa_redis():
+        with _lock:
+            _vencer_locales(time.time())
+            return {pid: _totales[pid] for pid in ids if pid in _totales}
+    valores = _redis().hmget(cache.make_key(TOTALES_KEY), ids)
+    return {pid: int(valor) for pid, valor in zip(ids, valores) if valor is not None}
+
+
+async def areservados(ids):
+    if not usa_redis():
+        return reservados(ids)
+    valores = await redis_async().hmget(cache.make_key(TOTALES_KEY), ids)
+    return {pid: int(valor) for pid, valor in zip(ids, valores) if valor is not None}
+
+
+def _libres(stock, reservado):
+    return {pid: max(cantidad - reservado.get(pid, 0), 0) for pid, cantidad in stock.items() if cantidad != NO_EXISTE}
+
+
+def disponibles(ids):
+    """
+    {id: stock menos lo reservado} de los productos que existen.
+    """
+    return _libres(leer_stock(ids), reservados(ids))
+
+
+async def adisponibles(ids):
+    return _libres(await aleer_stock(ids), await areservados(ids))
@@ -0,0 +1,113 @@
+# apiApp/search.py
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Producto
+
+FTS_SQLITE = "apiapp_producto_fts"
+CONFIG_POSTGRES = "public.es_unaccent"
+MAX_TERMINOS = 8
+
+
+def terminos(texto):
+    return re.findall(r"\w+", texto.lower())[:MAX_TERMINOS]
+
+
+class BusquedaBackend:
+    """
+    Filtra un queryset de Producto por texto y lo anota con ``rango``
+    (mayor es más relevante).
+    """
+
+    def buscar(self, queryset, texto):
+        raise NotImplementedError
+
+
+class PostgresBusqueda(BusquedaBackend):
+    """
+    Columna tsvector ``busqueda`` mantenida por trigger (migración 0008),
+    índice GIN y configuración española sin tildes (unaccent + spanish_stem).
+    """
+
+    def buscar(self, queryset, texto):
+        consulta = " & ".join(f"{termino}:*" for termino in terminos(texto))
+        if not consulta:
+            return queryset.none()
+        tabla = connection.ops.quote_name(Producto._meta.db_table)
+        tsquery = f"to_tsquery('{CONFIG_POSTGRES}', %s)"
+        return queryset.filter(
+            RawSQL(f"{tabla}.busqueda @@ {tsquery}", [consulta], output_field=BooleanField())
+        ).annotate(
+            rango=RawSQL(f"ts_rank({tabla}.busqueda, {tsquery})", [consulta], output_field=FloatField())
+        )
+
+
+class SqliteFts5Busqueda(BusquedaBackend):
+    """
+    Tabla virtual FTS5 de contenido externo sincronizada por triggers. El
+    tokenizer quita tildes; SQLite no trae stemmer español, así que se recorta
+    el plural y se busca por prefijo.
+    """
+
+    @staticmethod
+    def raiz(termino):
+        if len(termino) > 4 and termino.endswith("es"):
+            return termino[:-2]
+        if len(termino) > 3 and termino.endswith("s"):
+            return termino[:-1]
+        return termino
+
+    def buscar(self, queryset, texto):
+        consulta = " ".join(f'"{self.raiz(termino)}"*' for termino in terminos(texto))
+        if not consulta:
+            return queryset.none()
+        tabla = connection.ops.quote_name(Producto._meta.db_table)
+        # Join con la tabla FTS (no tiene modelo): la consulta parte del índice
+        # MATCH y bm25/rank solo existen dentro de esa misma consulta.
+        return queryset.extra(
+            tables=[FTS_SQLITE],
+            where=[f"{FTS_SQLITE}.rowid = {tabla}.id", f"{FTS_SQLITE} MATCH %s"],
+            params=[consulta],
+        ).annotate(rango=RawSQL(f"-{FTS_SQLITE}.rank", [], output_field=FloatField()))
+
+
+class IcontainsBusqueda(BusquedaBackend):
+    """
+    Equivalente al SearchFilter anterior, para motores sin índice de texto.
+    """
+
+    def buscar(self, queryset, texto):
+        condicion = Q()
+        for termino in terminos(texto):
+            condicion &= Q(nombre__icontains=termino) | Q(descripcion__icontains=termino)
+        return queryset.filter(condicion).annotate(rango=Value(0.0, output_field=FloatField()))
+
+
+BACKENDS = {
+    "postgresql": PostgresBusqueda,
+    "sqlite": SqliteFts5Busqueda,
+    "icontains": IcontainsBusqueda,
+}
+
+
+def obtener_backend():
+    nombre = getattr(settings, "BUSQUEDA_BACKEND", None) or connection.vendor
+    return BACKENDS.get(nombre, IcontainsBusqueda)()
+
+
+class BusquedaProductoFilter(BaseFilterBackend):
+    """
+    Reemplaza SearchFilter en ProductoViewSet; mismo parámetro ?search=.
+    """
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, "").strip()
+        if not texto:
+            return queryset
+        return obtener_backend().buscar(queryset, texto)
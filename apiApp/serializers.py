@@ -1,36 +1,159 @@
 # apiApp/serializers.py
+import time
+from decimal import Decimal
+from functools import partial
+from django.db import models, transaction
+from django.db.models import Case, F, Prefetch, Q, When
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from .media import srcset, url_recurso
+from .metricas import sumar_serializacion
+from .reservas import RESERVAS_MAX_UNIDADES, convertir, liberar, reserva, reservados
+from .stock import STOCK_MAX_IDS
+from .tarifas import resolver_precios, validar_tramos
+from .ventas import programar_acumulacion
 from .models import (
     Categoria, Producto, Tarifa,
     ImagenProducto, VideoProducto,
     MetodoPago, Pedido, PedidoItem
 )
 
-class CategoriaSerializer(serializers.ModelSerializer):
+COSTO_ENVIO_PROVINCIA = Decimal("8.00")
+
+def arbol_campos(texto):
+    """
+    "id,tarifas.precio_unitario" -> {"id": None, "tarifas": {"precio_unitario": None}}.
+    None es el campo completo y gana sobre rutas más profundas del mismo campo.
+    """
+    arbol = {}
+    for ruta in texto.split(','):
+        partes = [parte for parte in ruta.strip().split('.') if parte]
+        if not partes:
+            continue
+        nodo = arbol
+        for parte in partes[:-1]:
+            if parte in nodo and nodo[parte] is None:
+                break
+            nodo = nodo.setdefault(parte, {})
+        else:
+            nodo[partes[-1]] = None
+    return arbol
+
+def campos_de_request(request):
+    """
+    (incluir, omitir) de ?fields= y ?omit=; solo en lecturas.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    return (arbol_campos(fields) if fields else None), (arbol_campos(omit) if omit else None)
+
+def se_serializa(request, ruta):
+    """
+    Si el campo ``ruta`` (con puntos para anidados) sale en la respuesta;
+    los viewsets lo usan para no consultar relaciones omitidas.
+    """
+    incluir, omitir = campos_de_request(request)
+    for parte in ruta.split('.'):
+        if incluir is not None:
+            if parte not in incluir:
+                return False
+            incluir = incluir[parte]
+        if omitir is not None:
+            if parte in omitir and omitir[parte] is None:
+                return False
+            omitir = omitir.get(parte)
+    return True
+
+class CamposDinamicosMixin:
+    """
+    ?fields= / ?omit= con rutas anidadas (fields=id,nombre,tarifas.precio_unitario).
+    El serializer raíz lee la request y pasa a cada anidado su parte del árbol.
+    """
+    campos_solicitados = None
+
+    def _es_raiz(self):
+        padre = self.parent
+        if isinstance(padre, serializers.ListSerializer):
+            padre = padre.parent
+        return padre is None
+
+    @cached_property
+    def fields(self):
+        # Sobre ``fields`` y no get_fields para podar después de los
+        # get_fields propios (p. ej. el ?expand= de PedidoItemSerializer).
+        fields = super().fields
+        if self.campos_solicitados is not None:
+            incluir, omitir = self.campos_solicitados
+        elif self._es_raiz():
+            incluir, omitir = campos_de_request(self.context.get('request'))
+        else:
+            incluir, omitir = None, None
+        for nombre in list(fields):
+            if incluir is not None and nombre not in incluir:
+                del fields[nombre]
+            elif omitir is not None and nombre in omitir and omitir[nombre] is None:
+                del fields[nombre]
+        for nombre, campo in fields.items():
+            hijo = getattr(campo, 'child', campo)
+            if isinstance(hijo, CamposDinamicosMixin):
+                hijo.campos_solicitados = ((incluir or {}).get(nombre), (omitir or {}).get(nombre))
+        return fields
+
+    def to_representation(self, instance):
+        # Solo el raíz suma a las métricas: los anidados ya caen en su tiempo.
+        if not self._es_raiz():
+            return super().to_representation(instance)
+        inicio = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            sumar_serializacion(time.perf_counter() - inicio)
+
+class CategoriaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Categoria
         fields = '__all__'
 
-class TarifaSerializer(serializers.ModelSerializer):
+class TarifaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Tarifa
         fields = '__all__'
 
-class ImagenProductoSerializer(serializers.ModelSerializer):
+    def validate(self, data):
+        producto = data.get('producto') or self.instance.producto
+        minimo = data.get('minimo', getattr(self.instance, 'minimo', None))
+        maximo = data.get('maximo', getattr(self.instance, 'maximo', None))
+        otros = Tarifa.objects.filter(producto=producto)
+        if self.instance is not None:
+            otros = otros.exclude(pk=self.instance.pk)
+        # Solo solapes: los huecos pueden ser transitorios mientras se editan tramos.
+        errores = validar_tramos([(minimo, maximo), *otros.values_list('minimo', 'maximo')], permitir_huecos=True)
+        if errores:
+            raise serializers.ValidationError(errores)
+        return data
+
+class ImagenProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
     public_id = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = ImagenProducto
-        fields = ["id", "url", "public_id"]
+        fields = ["id", "url", "public_id", "srcset"]
 
     def get_url(self, obj):
-        return obj.imagen.url if obj.imagen else None
+        return url_recurso(obj.imagen)
+
+    def get_srcset(self, obj):
+        return srcset(obj.imagen)
 
     def get_public_id(self, obj):
         return obj.imagen.public_id if obj.imagen else None
 
-class VideoProductoSerializer(serializers.ModelSerializer):
+class VideoProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
     public_id = serializers.SerializerMethodField()
 
@@ -39,12 +162,12 @@ class VideoProductoSerializer(serializers.ModelSerializer):
         fields = ["id", "url", "public_id"]
 
     def get_url(self, obj):
-        return obj.video.url if obj.video else None
+        return url_recurso(obj.video)
 
     def get_public_id(self, obj):
         return obj.video.public_id if obj.video else None
 
-class ProductoSerializer(serializers.ModelSerializer):
+class ProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     categorias = CategoriaSerializer(many=True, read_only=True)
     tarifas = TarifaSerializer(many=True, read_only=True)
     imagenes = ImagenProductoSerializer(many=True, read_only=True)
@@ -53,8 +176,60 @@ class ProductoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Producto
         fields = ['id', 'nombre', 'descripcion', 'fecha_ingreso', 'cantidad', 'categorias', 'tarifas', 'imagenes', 'videos']
+        # El catálogo no publica el stock: cambia en cada pedido y ni el cache
+        # ni el ETag lo cubren. Se lee en /api/productos/<id>/cantidad/ y
+        # /api/productos/stock/; aquí solo se escribe.
+        extra_kwargs = {'cantidad': {'write_only': True}}
+
+class ProductoResumenSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """
+    Vista compacta del producto para las líneas de pedido.
+    Espera las imágenes prefetcheadas y ordenadas por id.
+    """
+    imagen_url = serializers.SerializerMethodField()
+    imagen_srcset = serializers.SerializerMethodField()
 
-class MetodoPagoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Producto
+        fields = ['id', 'nombre', 'imagen_url', 'imagen_srcset']
+
+    def _imagen(self, obj):
+        imagenes = obj.imagenes.all()
+        return imagenes[0].imagen if imagenes else None
+
+    def get_imagen_url(self, obj):
+        return url_recurso(self._imagen(obj))
+
+    def get_imagen_srcset(self, obj):
+        return srcset(self._imagen(obj))
+
+def expandir_producto(request):
+    """
+    ?expand=producto pide el ProductoSerializer completo en las líneas de pedido.
+    """
+    if request is None:
+        return False
+    return 'producto' in request.query_params.get('expand', '').split(',')
+
+def prefetch_producto(request, prefijo='', ruta=None):
+    """
+    Prefetch de las relaciones de Producto que realmente se serializan en
+    las líneas de pedido; ``prefijo`` permite aplicarlo desde Pedido o PedidoItem
+    y ``ruta`` es el campo del producto en la respuesta, para ?fields=/?omit=.
+    """
+    def necesita(campo):
+        return ruta is None or se_serializa(request, f'{ruta}.{campo}')
+
+    expandir = expandir_producto(request)
+    lookups = []
+    campos_imagen = ('imagenes',) if expandir else ('imagen_url', 'imagen_srcset')
+    if any(necesita(campo) for campo in campos_imagen):
+        lookups.append(Prefetch(f'{prefijo}imagenes', queryset=ImagenProducto.objects.order_by('id')))
+    if expandir:
+        lookups += [f'{prefijo}{relacion}' for relacion in ('categorias', 'tarifas', 'videos') if necesita(relacion)]
+    return lookups
+
+class MetodoPagoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     qr_imagen_url = serializers.SerializerMethodField()
     qr_imagen_id = serializers.SerializerMethodField()
 
@@ -63,13 +238,14 @@ class MetodoPagoSerializer(serializers.ModelSerializer):
         fields = ["id", "nombre", "descripcion", "qr_imagen_url", "qr_imagen_id", "numero_cuenta"]
 
     def get_qr_imagen_url(self, obj):
-        return obj.qr_imagen.url if obj.qr_imagen else None
+        # Sin f_auto/q_auto: el QR debe llegar sin recompresión.
+        return url_recurso(obj.qr_imagen)
 
     def get_qr_imagen_id(self, obj):
         return obj.qr_imagen.public_id if obj.qr_imagen else None
 
-class PedidoItemSerializer(serializers.ModelSerializer):
-    producto = ProductoSerializer(read_only=True)
+class PedidoItemSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    producto = ProductoResumenSerializer(read_only=True)
     producto_id = serializers.PrimaryKeyRelatedField(queryset=Producto.objects.all(), write_only=True)
     subtotal = serializers.SerializerMethodField()
 
@@ -78,35 +254,94 @@ class PedidoItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'producto', 'producto_id', 'cantidad', 'precio_unitario', 'subtotal']
         read_only_fields = ['precio_unitario', 'subtotal']
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if expandir_producto(self.context.get('request')):
+            fields['producto'] = ProductoSerializer(read_only=True)
+        return fields
+
     def get_subtotal(self, obj):
         return obj.cantidad * obj.precio_unitario
 
-class PedidoSerializer(serializers.ModelSerializer):
-    items = PedidoItemSerializer(many=True, write_only=True)
+class PedidoItemEntradaSerializer(serializers.Serializer):
+    """
+    Línea de pedido de entrada. Los productos se resuelven en bloque en
+    PedidoSerializer.validate en lugar de una consulta por línea.
+    """
+    producto_id = serializers.IntegerField()
+    cantidad = serializers.IntegerField()
+
+class CotizacionSerializer(serializers.Serializer):
+    items = PedidoItemEntradaSerializer(many=True)
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("Debe cotizar al menos un producto.")
+        for item in items:
+            if item['cantidad'] <= 0:
+                raise serializers.ValidationError(f"Cantidad inválida para el producto {item['producto_id']}.")
+        return items
+
+    def cotizar(self):
+        """
+        Precios por línea con resolver_precios; las líneas sin tarifa quedan
+        en null y ``completo`` en false.
+        """
+        items = self.validated_data['items']
+        precios = resolver_precios([(item['producto_id'], item['cantidad']) for item in items])
+        lineas = []
+        total = Decimal("0")
+        for item, precio in zip(items, precios):
+            subtotal = precio * item['cantidad'] if precio is not None else None
+            if subtotal is not None:
+                total += subtotal
+            lineas.append({
+                **item,
+                'precio_unitario': f"{precio:.2f}" if precio is not None else None,
+                'subtotal': f"{subtotal:.2f}" if subtotal is not None else None,
+            })
+        return {'items': lineas, 'total': f"{total:.2f}", 'completo': None not in precios}
+
+class ReservaSerializer(serializers.Serializer):
+    """
+    Unidades a reservar por producto (apiApp.reservas); 0 suelta la reserva
+    del producto.
+    """
+    items = PedidoItemEntradaSerializer(many=True)
+
+    def validate_items(self, items):
+        if len(items) > STOCK_MAX_IDS:
+            raise serializers.ValidationError(f"Máximo {STOCK_MAX_IDS} productos por reserva.")
+        cantidades = {}
+        for item in items:
+            if item['cantidad'] < 0:
+                raise serializers.ValidationError(f"Cantidad inválida para el producto {item['producto_id']}.")
+            cantidades[item['producto_id']] = cantidades.get(item['producto_id'], 0) + item['cantidad']
+        # Un carrito no puede acaparar el stock de un producto.
+        for producto_id, unidades in cantidades.items():
+            if unidades > RESERVAS_MAX_UNIDADES:
+                raise serializers.ValidationError(
+                    f"Máximo {RESERVAS_MAX_UNIDADES} unidades reservadas por producto ({producto_id})."
+                )
+        return cantidades
+
+class PedidoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    items = PedidoItemEntradaSerializer(many=True, write_only=True)
     items_detalle = PedidoItemSerializer(many=True, read_only=True, source='items')
     metodo_pago = MetodoPagoSerializer(read_only=True)
     metodo_pago_id = serializers.PrimaryKeyRelatedField(queryset=MetodoPago.objects.all(), write_only=True)
+    # Carrito de apiApp.reservas: sus reservas se convierten en el descuento.
+    reserva = serializers.RegexField(r'^[0-9a-f]{32}$', write_only=True, required=False)
 
     class Meta:
         model = Pedido
         fields = [
             'id', 'codigo', 'fecha', 'nombre', 'apellido', 'dni', 'telefono', 'correo',
             'envio_provincia', 'departamento', 'provincia', 'distrito', 'direccion',
-            'total', 'metodo_pago', 'metodo_pago_id', 'items', 'items_detalle'
+            'total', 'metodo_pago', 'metodo_pago_id', 'items', 'items_detalle', 'reserva'
         ]
         read_only_fields = ['codigo', 'fecha', 'metodo_pago', 'total']
 
-    def calcular_precio_unitario(self, producto, cantidad):
-        tarifas = producto.tarifas.all().order_by("minimo")
-        for tarifa in tarifas:
-            if tarifa.maximo is not None:
-                if tarifa.minimo <= cantidad <= tarifa.maximo:
-                    return tarifa.precio_unitario
-            else:
-                if cantidad >= tarifa.minimo:
-                    return tarifa.precio_unitario
-        return 0
-
     def validate(self, data):
         items = data.get('items') or []
         if not items:
@@ -117,30 +352,49 @@ class PedidoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("El DNI debe tener 8 dígitos.")
         if telefono and len(telefono) != 9:
             raise serializers.ValidationError("El teléfono debe tener 9 dígitos.")
+
+        productos = self.cargar_productos({item['producto_id'] for item in items})
+        for item in items:
+            producto = productos.get(item['producto_id'])
+            if producto is None:
+                raise serializers.ValidationError(
+                    {"items": f"El producto {item['producto_id']} no existe."}
+                )
+            item['producto'] = producto
         return data
 
+    def cargar_productos(self, ids):
+        """
+        Carga en una sola pasada los productos del pedido con lo que usan la
+        respuesta y el correo de confirmación (las tarifas van por apiApp.tarifas).
+        """
+        return Producto.objects.prefetch_related(
+            *prefetch_producto(self.context.get('request'))
+        ).in_bulk(ids)
+
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         metodo_pago = validated_data.pop('metodo_pago_id')
-        total = 0
+        carrito = validated_data.pop('reserva', None)
+        total = Decimal("0")
         prepared_items = []
+        cantidades = {}
 
         for item in items_data:
-            producto = item['producto_id']
+            if item['cantidad'] <= 0:
+                raise serializers.ValidationError(f"Cantidad inválida para {item['producto'].nombre}.")
+        precios = resolver_precios([(item['producto'].pk, item['cantidad']) for item in items_data])
+
+        for item, precio_unitario in zip(items_data, precios):
+            producto = item['producto']
             cantidad = item['cantidad']
-            if cantidad <= 0:
-                raise serializers.ValidationError(f"Cantidad inválida para {producto.nombre}.")
-            if cantidad > producto.cantidad:
-                raise serializers.ValidationError(
-                    f"Stock insuficiente para {producto.nombre}. Solo hay {producto.cantidad} disponibles."
-                )
-            precio_unitario = self.calcular_precio_unitario(producto, cantidad)
-            if precio_unitario == 0:
+            if precio_unitario is None:
                 raise serializers.ValidationError(
                     f"No existe tarifa válida para {producto.nombre} con {cantidad} unidades."
                 )
             subtotal = cantidad * precio_unitario
             total += subtotal
+            cantidades[producto.pk] = cantidades.get(producto.pk, 0) + cantidad
             prepared_items.append({
                 "producto": producto,
                 "cantidad": cantidad,
@@ -149,21 +403,107 @@ class PedidoSerializer(serializers.ModelSerializer):
             })
 
         if validated_data.get('envio_provincia'):
-            total += 8
-
-        pedido = Pedido.objects.create(metodo_pago=metodo_pago, total=total, **validated_data)
-
-        for it in prepared_items:
-            producto = it['producto']
-            cantidad = it['cantidad']
-            precio_unitario = it['precio_unitario']
-            producto.cantidad -= cantidad
-            producto.save()
-            PedidoItem.objects.create(
-                pedido=pedido,
-                producto=producto,
-                cantidad=cantidad,
-                precio_unitario=precio_unitario
+            total += COSTO_ENVIO_PROVINCIA
+
+        propias, ajenas = self.reservas(carrito, cantidades)
+        with transaction.atomic():
+            stock = self.descontar_stock(
+                cantidades, {it['producto'].pk: it['producto'] for it in prepared_items}, propias, ajenas
+            )
+            pedido = Pedido.objects.create(metodo_pago=metodo_pago, total=total, **validated_data)
+            items = PedidoItem.objects.bulk_create([
+                PedidoItem(
+                    pedido=pedido,
+                    producto=it['producto'],
+                    cantidad=it['cantidad'],
+                    precio_unitario=it['precio_unitario']
+                )
+                for it in prepared_items
+            ])
+            # Ni el cache del catálogo ni su ETag dependen del stock (no lo serializan).
+            transaction.on_commit(partial(convertir, carrito, stock))
+            programar_acumulacion(pedido, items)
+
+        # La respuesta y el correo reutilizan lo ya resuelto sin volver a consultar.
+        pedido._prefetched_objects_cache = {'items': items}
+        self.lineas = prepared_items
+        return pedido
+
+    def reservas(self, carrito, cantidades):
+        """
+        ({producto: unidades} reservadas por el carrito, {producto: unidades}
+        reservadas por otros carritos) para los productos del pedido.
+        """
+        propias = {}
+        if carrito:
+            vigente = reserva(carrito)
+            if vigente is None:
+                # Vencida: se suelta ya para no contarla como ajena.
+                liberar(carrito)
+            else:
+                propias = vigente[0]
+        ajenas = {
+            producto_id: unidades - propias.get(producto_id, 0)
+            for producto_id, unidades in reservados(list(cantidades)).items()
+        }
+        return propias, ajenas
+
+    def descontar_stock(self, cantidades, productos, propias=None, ajenas=None):
+        """
+        Descuenta el stock de todos los productos del pedido en un solo UPDATE.
+        Debe ejecutarse dentro de una transacción. Devuelve {id: cantidad}
+        tras el descuento, para el espejo de stock.
+        """
+        propias, ajenas = propias or {}, ajenas or {}
+        ids = sorted(cantidades)
+        # Si la reserva del carrito cubre todo, la disputa ya se resolvió en
+        # apiApp.reservas y alcanza con el UPDATE condicional, sin bloquear filas.
+        if any(cantidades[producto_id] > propias.get(producto_id, 0) for producto_id in ids):
+            # Bloquea las filas siempre en el mismo orden para evitar deadlocks
+            # entre pedidos concurrentes que comparten productos.
+            stock = dict(
+                Producto.objects.select_for_update().filter(pk__in=ids)
+                .order_by('pk').values_list('pk', 'cantidad')
+            )
+            for producto_id in ids:
+                disponible = max(stock.get(producto_id, 0) - ajenas.get(producto_id, 0), 0)
+                if cantidades[producto_id] > disponible:
+                    raise serializers.ValidationError(
+                        f"Stock insuficiente para {productos[producto_id].nombre}. Solo hay {disponible} disponibles."
+                    )
+
+        condicion = Q()
+        for producto_id in ids:
+            condicion |= Q(pk=producto_id, cantidad__gte=cantidades[producto_id])
+        actualizados = Producto.objects.filter(condicion).update(
+            cantidad=Case(
+                *[When(pk=producto_id, then=F('cantidad') - cantidades[producto_id]) for producto_id in ids],
+                default=F('cantidad'),
+                output_field=models.PositiveIntegerField()
             )
+        )
+        if actualizados != len(ids):
+            # Con las filas bloqueadas no debería ocurrir; sin bloqueo (reserva que
+            # cubre el pedido) el WHERE es la última defensa contra la sobreventa.
+            raise serializers.ValidationError("Stock insuficiente para completar el pedido.")
+        # Las filas quedan bloqueadas por el UPDATE hasta el commit: lo leído
+        # es lo que se confirma.
+        return dict(Producto.objects.filter(pk__in=ids).values_list('pk', 'cantidad'))
+
+class VentaSerializer(serializers.Serializer):
+    """Métricas de los rollups de ventas (apiApp.ventas); solo lectura."""
+    ingresos = serializers.DecimalField(max_digits=14, decimal_places=2)
+    unidades = serializers.IntegerField()
+    pedidos = serializers.IntegerField()
+
+
+class VentaDiaSerializer(VentaSerializer):
+    fecha = serializers.DateField()
+
 
-        return pedido
\ No newline at end of file
+class VentaRankingSerializer(VentaSerializer):
+    # id/nombre en productos, categorías y métodos de pago; región en regiones
+    id = serializers.IntegerField(required=False)
+    nombre = serializers.CharField(required=False)
+    departamento = serializers.CharField(required=False)
+    provincia = serializers.CharField(required=False)
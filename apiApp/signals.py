@@ -0,0 +1,116 @@
+# apiApp/signals.py
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .cache import invalidar_catalogo, invalidar_tarifas, registrar_cambio
+from .models import Producto, Categoria, Tarifa, ImagenProducto, VideoProducto, MetodoPago
+from .snapshot import programar_snapshot
+from .stock import guardar_stock, quitar_stock
+
+MODELOS_CATALOGO = (Producto, Categoria, Tarifa, ImagenProducto, VideoProducto)
+# Modelos con versión de cambios para los ETags (RespuestaCondicionalMixin).
+MODELOS_VERSIONADOS = MODELOS_CATALOGO + (MetodoPago,)
+
+
+_estado = threading.local()
+
+
+@contextmanager
+def senales_suspendidas():
+    """
+    Desactiva en este hilo las invalidaciones por objeto; quien lo usa
+    (p. ej. import_productos) invalida una sola vez al terminar.
+    """
+    _estado.suspendidas = getattr(_estado, "suspendidas", 0) + 1
+    try:
+        yield
+    finally:
+        _estado.suspendidas -= 1
+
+
+def _suspendidas():
+    return getattr(_estado, "suspendidas", 0) > 0
+
+
+def _invalidar_al_confirmar():
+    # Si hay una transacción abierta se espera al commit para que ningún
+    # lector vuelva a cachear datos viejos entre el cambio y el commit.
+    transaction.on_commit(invalidar_catalogo)
+
+
+def _snapshot_afectado(sender, instance):
+    # Sin CATALOGO_SNAPSHOT nadie lee los snapshots; al activarlo se ponen al
+    # día con rebuild_catalog_snapshot.
+    if not settings.CATALOGO_SNAPSHOT:
+        return
+    if sender is Producto:
+        programar_snapshot([instance.pk])
+    elif sender in (Tarifa, ImagenProducto, VideoProducto):
+        programar_snapshot([instance.producto_id])
+    elif sender is Categoria:
+        programar_snapshot(instance.productos.values_list('pk', flat=True))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def catalogo_modificado(sender, instance, signal, **kwargs):
+    if _suspendidas():
+        return
+    if sender in MODELOS_CATALOGO:
+        # El snapshot se reconstruye antes de invalidar: nadie debe cachear un
+        # documento viejo bajo la versión nueva. Una categoría borrada se
+        # resuelve en pre_delete, cuando aún tiene productos.
+        if not (sender is Categoria and signal is post_delete):
+            _snapshot_afectado(sender, instance)
+        _invalidar_al_confirmar()
+    if sender is Tarifa:
+        transaction.on_commit(invalidar_tarifas)
+    if sender in MODELOS_VERSIONADOS:
+        # Después de invalidar el cache: un ETag nuevo nunca debe acompañar
+        # un payload cacheado viejo.
+        transaction.on_commit(partial(registrar_cambio, sender))
+
+
+@receiver(pre_delete, sender=Categoria)
+def categoria_por_eliminar(sender, instance, **kwargs):
+    if _suspendidas():
+        return
+    _snapshot_afectado(sender, instance)
+
+
+@receiver(m2m_changed, sender=Producto.categorias.through)
+def categorias_modificadas(sender, instance, action, reverse, pk_set, **kwargs):
+    if _suspendidas():
+        return
+    if settings.CATALOGO_SNAPSHOT and action in ("pre_clear", "post_add", "post_remove"):
+        # Con reverse el cambio viene desde la categoría y pk_set son productos;
+        # en un clear pk_set es None y se toman los productos antes de quitarlos.
+        if not reverse:
+            programar_snapshot([instance.pk])
+        elif action == "pre_clear":
+            programar_snapshot(instance.productos.values_list('pk', flat=True))
+        else:
+            programar_snapshot(pk_set)
+    if action in ("post_add", "post_remove", "post_clear"):
+        _invalidar_al_confirmar()
+        transaction.on_commit(partial(registrar_cambio, Producto))
+
+
+@receiver(post_save, sender=Producto)
+def stock_guardado(sender, instance, **kwargs):
+    if _suspendidas():
+        return
+    transaction.on_commit(partial(guardar_stock, {instance.pk: instance.cantidad}))
+
+
+@receiver(post_delete, sender=Producto)
+def stock_eliminado(sender, instance, **kwargs):
+    if _suspendidas():
+        return
+    transaction.on_commit(partial(quitar_stock, instance.pk))
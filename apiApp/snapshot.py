@@ -0,0 +1,62 @@
+# apiApp/snapshot.py
+import threading
+
+from django.db import transaction
+
+from .models import Producto, ProductoSnapshot
+from .serializers import ProductoSerializer
+
+CAMPOS_SNAPSHOT = ["fecha_ingreso", "documento", "actualizado"]
+
+
+def reconstruir_snapshots(producto_ids):
+    """
+    Vuelve a serializar los productos indicados y guarda sus documentos con
+    un upsert; los que ya no existen pierden su snapshot.
+    """
+    producto_ids = set(producto_ids)
+    productos = list(
+        Producto.objects.filter(pk__in=producto_ids)
+        .prefetch_related('categorias', 'tarifas', 'imagenes', 'videos')
+    )
+    ProductoSnapshot.objects.bulk_create(
+        [
+            ProductoSnapshot(producto=producto, fecha_ingreso=producto.fecha_ingreso,
+                             documento=ProductoSerializer(producto).data)
+            for producto in productos
+        ],
+        update_conflicts=True, unique_fields=["producto"], update_fields=CAMPOS_SNAPSHOT,
+    )
+    eliminados = producto_ids - {producto.pk for producto in productos}
+    if eliminados:
+        ProductoSnapshot.objects.filter(pk__in=eliminados).delete()
+    return len(productos)
+
+
+# Productos tocados en la transacción en curso de cada hilo: un producto
+# guardado desde el admin con sus inlines se reconstruye una vez.
+_pendientes = threading.local()
+
+
+def _reconstruir_pendientes():
+    ids = getattr(_pendientes, "ids", None)
+    if not ids:
+        # Ya lo hizo el primer callback de esta transacción.
+        return
+    _pendientes.ids = set()
+    reconstruir_snapshots(ids)
+
+
+def programar_snapshot(producto_ids):
+    if not hasattr(_pendientes, "ids"):
+        _pendientes.ids = set()
+    _pendientes.ids.update(producto_ids)
+    # Cada llamada registra el callback, pero solo el primero reconstruye: si
+    # la transacción se revierte no queda un lote huérfano esperando, y lo
+    # que sobre se reconstruye (idempotente) en el siguiente commit del hilo.
+    # robust: un fallo del snapshot se registra, no rompe la petición ya confirmada.
+    transaction.on_commit(_reconstruir_pendientes, robust=True)
+
+
+def documento_snapshot(producto_id):
+    return ProductoSnapshot.objects.filter(pk=producto_id).values_list("documento", flat=True).first()
@@ -0,0 +1,141 @@
+# apiApp/stock.py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import usa_redis, redis_async
+from .metricas import registrar_cache
+from .models import Producto
+
+# Espejo de Producto.cantidad para las consultas de disponibilidad: un hash
+# de Redis {id: cantidad} (o una clave por producto fuera de Redis). Se
+# completa al leer y se fija en cada save de Producto y al confirmar un
+# pedido, con la cantidad que dejó su UPDATE. Cada escritura renueva el TTL, así el hash vence
+# STOCK_TTL después de la última actividad.
+STOCK_KEY = "stock:productos"
+STOCK_TTL = getattr(settings, "STOCK_ESPEJO_TTL", 60 * 15)
+STOCK_MAX_IDS = getattr(settings, "STOCK_MAX_IDS", 200)
+# Marca de "no existe" para que un id inválido no consulte la base en cada sondeo.
+NO_EXISTE = -1
+
+# Fija valores (ARGV: (producto, cantidad)..., ttl) y renueva el TTL.
+GUARDAR_LUA = """
+for i = 1, #ARGV - 1, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[#ARGV])
+return 1
+"""
+
+# Completa solo los productos ausentes: si otro proceso ya cargó o descontó
+# uno mientras se leía la base, su valor gana sobre el leído.
+COMPLETAR_LUA = """
+for i = 1, #ARGV - 1, 2 do
+    redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[#ARGV])
+return 1
+"""
+
+
+def parsear_ids(texto):
+    """
+    "1,2,3" -> [1, 2, 3] sin repetidos. ValueError si no son enteros o son
+    demasiados.
+    """
+    try:
+        ids = list(dict.fromkeys(int(parte) for parte in texto.split(",") if parte.strip()))
+    except ValueError:
+        raise ValueError("Los ids deben ser enteros separados por comas.")
+    if not ids:
+        raise ValueError("Indica al menos un id.")
+    if len(ids) > STOCK_MAX_IDS:
+        raise ValueError(f"Máximo {STOCK_MAX_IDS} ids por consulta.")
+    return ids
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection("default")
+
+
+def _clave_hash():
+    return cache.make_key(STOCK_KEY)
+
+
+def _clave(producto_id):
+    return f"{STOCK_KEY}:{producto_id}"
+
+
+def _a_enteros(ids, valores):
+    return {pid: int(valor) for pid, valor in zip(ids, valores) if valor is not None}
+
+
+def _existentes(stock):
+    return {pid: cantidad for pid, cantidad in stock.items() if cantidad != NO_EXISTE}
+
+
+def _cargar(faltantes):
+    cargados = dict.fromkeys(faltantes, NO_EXISTE)
+    cargados.update(Producto.objects.filter(id__in=faltantes).values_list("id", "cantidad"))
+    completar_stock(cargados)
+    return cargados
+
+
+def leer_stock(ids):
+    """
+    {id: cantidad} de los productos que existen. Un HMGET al espejo; lo que
+    falte se lee de la base en una consulta y se agrega.
+    """
+    if usa_redis():
+        stock = _a_enteros(ids, _redis().hmget(_clave_hash(), ids))
+    else:
+        en_cache = cache.get_many([_clave(pid) for pid in ids])
+        stock = {pid: en_cache[_clave(pid)] for pid in ids if _clave(pid) in en_cache}
+    faltantes = [pid for pid in ids if pid not in stock]
+    registrar_cache("stock", hits=len(ids) - len(faltantes), misses=len(faltantes))
+    if faltantes:
+        stock.update(_cargar(faltantes))
+    return _existentes(stock)
+
+
+async def aleer_stock(ids):
+    if not usa_redis():
+        return await sync_to_async(leer_stock)(ids)
+    stock = _a_enteros(ids, await redis_async().hmget(_clave_hash(), ids))
+    faltantes = [pid for pid in ids if pid not in stock]
+    registrar_cache("stock", hits=len(ids) - len(faltantes), misses=len(faltantes))
+    if faltantes:
+        stock.update(await sync_to_async(_cargar)(faltantes))
+    return _existentes(stock)
+
+
+def guardar_stock(valores):
+    """
+    Fija el stock confirmado en la base (save de Producto, importación,
+    pedido). Pisa lo que haya: una carga de completar_stock leída antes del
+    commit no sobrevive.
+    """
+    if usa_redis():
+        argumentos = [x for par in valores.items() for x in par] + [STOCK_TTL]
+        _redis().eval(GUARDAR_LUA, 1, _clave_hash(), *argumentos)
+    else:
+        cache.set_many({_clave(pid): cantidad for pid, cantidad in valores.items()}, timeout=STOCK_TTL)
+
+
+def completar_stock(valores):
+    """
+    Agrega al espejo lo leído de la base tras un fallo sin pisar lo que ya
+    esté: un pedido confirmado mientras se leía no se pierde.
+    """
+    if usa_redis():
+        argumentos = [x for par in valores.items() for x in par] + [STOCK_TTL]
+        _redis().eval(COMPLETAR_LUA, 1, _clave_hash(), *argumentos)
+    else:
+        for producto_id, cantidad in valores.items():
+            cache.add(_clave(producto_id), cantidad, timeout=STOCK_TTL)
+
+
+def quitar_stock(producto_id):
+    guardar_stock({producto_id: NO_EXISTE})
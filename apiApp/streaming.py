@@ -0,0 +1,98 @@
+# apiApp/streaming.py
+import codecs
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Líneas que se juntan en cada salto al hilo síncrono bajo ASGI.
+LINEAS_POR_BLOQUE = 500
+
+
+class _Eco:
+    """
+    Pseudo-archivo para csv.writer: write() devuelve la línea en vez de
+    guardarla, así cada fila sale como un str sin acumular nada.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def en_bloques(iterable, tamano):
+    """
+    Agrupa un iterable en listas de ``tamano`` elementos (la última puede
+    ser menor); sirve para resolver relaciones bloque a bloque.
+    """
+    bloque = []
+    for elemento in iterable:
+        bloque.append(elemento)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def lineas_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def lineas_jsonl(objetos):
+    codificador = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for objeto in objetos:
+        yield codificador.encode(objeto) + "\n"
+
+
+def _texto(archivo):
+    # Acepta archivos binarios (subidas del admin, stdin.buffer) o de texto.
+    if isinstance(archivo.read(0), bytes):
+        return codecs.getreader("utf-8-sig")(archivo)
+    return archivo
+
+
+def leer_csv(archivo):
+    """
+    (número de línea, fila como dict) de un CSV con encabezados. La
+    numeración es la del archivo: la primera fila de datos es la 2.
+    """
+    lector = csv.DictReader(_texto(archivo))
+    for fila in lector:
+        yield lector.line_num, fila
+
+
+def leer_jsonl(archivo):
+    """
+    (número de línea, línea) de un JSONL, sin las líneas vacías; el que
+    consume decide qué hacer con un JSON inválido.
+    """
+    for numero, linea in enumerate(_texto(archivo), start=1):
+        if linea.strip():
+            yield numero, linea
+
+
+async def _en_async(lineas):
+    # thread_sensitive: el cursor del iterator() vive en el hilo síncrono
+    # que tiene la conexión a la base.
+    siguiente = sync_to_async(lambda: "".join(islice(lineas, LINEAS_POR_BLOQUE)), thread_sensitive=True)
+    while bloque := await siguiente():
+        yield bloque
+
+
+def respuesta_streaming(lineas, content_type, nombre_archivo):
+    """
+    Descarga en streaming de un generador de líneas. Bajo ASGI Django
+    consumiría un iterador síncrono entero antes de enviar nada, así que se
+    le pasa uno async.
+    """
+    contenido = _en_async(lineas) if settings.SERVIDOR == "asgi" else lineas
+    respuesta = StreamingHttpResponse(contenido, content_type=content_type)
+    respuesta["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    respuesta["Cache-Control"] = "no-store"
+    return respuesta
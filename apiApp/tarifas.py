@@ -0,0 +1,139 @@
+# apiApp/tarifas.py
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import CacheLRU, version_tarifas
+from .metricas import registrar_cache
+from .models import Tarifa
+
+TARIFAS_TTL = getattr(settings, "TARIFAS_CACHE_TTL", 60 * 60)
+
+# Tablas ya construidas en este proceso, por (versión de tarifas, producto).
+tablas_locales = CacheLRU(getattr(settings, "TARIFAS_LOCAL_MAX", 4096))
+
+
+class TablaTarifas:
+    """
+    Tramos de un producto en arreglos ordenados por ``minimo``. Con tramos
+    sin solapes (ver validar_tramos) el precio se resuelve con bisect. Si
+    se solapan (datos anteriores a la validación) gana, como siempre, el
+    primer tramo que cubre la cantidad en orden de ``minimo``; el comando
+    revisar_tarifas los lista para corregirlos.
+    """
+    __slots__ = ("minimos", "maximos", "precios", "solapada")
+
+    def __init__(self, tramos):
+        tramos = sorted(tramos, key=lambda t: t[0])
+        self.minimos = [t[0] for t in tramos]
+        self.maximos = [t[1] for t in tramos]
+        self.precios = [t[2] for t in tramos]
+        self.solapada = self._solapada()
+
+    def _solapada(self):
+        return any(
+            maximo is None or siguiente <= maximo
+            for maximo, siguiente in zip(self.maximos, self.minimos[1:])
+        )
+
+    def precio(self, cantidad):
+        if self.solapada:
+            return self._primer_tramo(cantidad)
+        i = bisect_right(self.minimos, cantidad) - 1
+        if i < 0:
+            return None
+        maximo = self.maximos[i]
+        if maximo is not None and cantidad > maximo:
+            return None
+        return self.precios[i]
+
+    def _primer_tramo(self, cantidad):
+        for minimo, maximo, precio in zip(self.minimos, self.maximos, self.precios):
+            if minimo <= cantidad and (maximo is None or cantidad <= maximo):
+                return precio
+        return None
+
+    def __getstate__(self):
+        return (self.minimos, self.maximos, self.precios)
+
+    def __setstate__(self, estado):
+        self.minimos, self.maximos, self.precios = estado
+        self.solapada = self._solapada()
+
+
+def validar_tramos(tramos, permitir_huecos=False):
+    """
+    Revisa una lista de (minimo, maximo) y devuelve los errores encontrados:
+    máximos menores que el mínimo, solapes y huecos entre tramos consecutivos.
+    """
+    errores = []
+    tramos = sorted(tramos, key=lambda t: t[0])
+    for minimo, maximo in tramos:
+        if maximo is not None and maximo < minimo:
+            errores.append(f"El tramo {minimo}-{maximo} tiene el máximo menor que el mínimo.")
+    for (min_a, max_a), (min_b, max_b) in zip(tramos, tramos[1:]):
+        rango_a = f"{min_a}-{max_a if max_a is not None else '∞'}"
+        rango_b = f"{min_b}-{max_b if max_b is not None else '∞'}"
+        if max_a is None or min_b <= max_a:
+            errores.append(f"Los tramos {rango_a} y {rango_b} se solapan.")
+        elif not permitir_huecos and min_b > max_a + 1:
+            errores.append(f"Hay un hueco entre los tramos {rango_a} y {rango_b}.")
+    return errores
+
+
+def _clave(version, producto_id):
+    return f"tarifas:v{version}:{producto_id}"
+
+
+def obtener_tablas(producto_ids):
+    """
+    Tablas de tarifas de varios productos: memoria del proceso, luego un
+    get_many al cache compartido y, para lo que falte, una sola consulta.
+    """
+    version = version_tarifas()
+    tablas = {}
+    faltantes = []
+    for producto_id in set(producto_ids):
+        tabla = tablas_locales.obtener((version, producto_id))
+        if tabla is None:
+            faltantes.append(producto_id)
+        else:
+            tablas[producto_id] = tabla
+
+    registrar_cache("tarifas_local", hits=len(tablas), misses=len(faltantes))
+
+    if faltantes:
+        en_cache = cache.get_many([_clave(version, pid) for pid in faltantes])
+        por_cargar = []
+        for producto_id in faltantes:
+            tabla = en_cache.get(_clave(version, producto_id))
+            if tabla is None:
+                por_cargar.append(producto_id)
+            else:
+                tablas[producto_id] = tabla
+        registrar_cache("tarifas", hits=len(faltantes) - len(por_cargar), misses=len(por_cargar))
+
+        if por_cargar:
+            tramos = {pid: [] for pid in por_cargar}
+            filas = Tarifa.objects.filter(producto_id__in=por_cargar).values_list(
+                "producto_id", "minimo", "maximo", "precio_unitario"
+            )
+            for producto_id, minimo, maximo, precio in filas:
+                tramos[producto_id].append((minimo, maximo, precio))
+            nuevas = {pid: TablaTarifas(t) for pid, t in tramos.items()}
+            cache.set_many({_clave(version, pid): tabla for pid, tabla in nuevas.items()}, timeout=TARIFAS_TTL)
+            tablas.update(nuevas)
+
+        for producto_id in faltantes:
+            tablas_locales.guardar((version, producto_id), tablas[producto_id])
+    return tablas
+
+
+def resolver_precios(lineas):
+    """
+    Precio unitario de cada (producto_id, cantidad), en el mismo orden.
+    None si ningún tramo cubre la cantidad.
+    """
+    tablas = obtener_tablas(producto_id for producto_id, _ in lineas)
+    return [tablas[producto_id].precio(cantidad) for producto_id, cantidad in lineas]
@@ -1,3 +1,924 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.throttling import ScopedRateThrottle
+
+from utils.email_service import FakeTransport
+
+from . import metricas
+from .cache import estadisticas_catalogo, version_catalogo
+from .codigos import AsignadorCodigos, PermutacionFeistel, verificar_clave
+from .idempotencia import clave_idempotencia, huella_peticion, reservar as reservar_idempotencia
+from .models import (
+    Categoria, CorreoSaliente, MetodoPago, Pedido, PedidoItem, Producto, ProductoSnapshot, Tarifa, VentaDiariaMetodoPago
+)
+from .outbox import calcular_espera, crear_executor, despachar_lote, reclamar_lote
+from .pedidos_io import COLUMNAS as COLUMNAS_PEDIDOS
+from .productos_io import exportar_productos, importar_productos
+from .reservas import RESERVAS_MAX_UNIDADES, liberar
+from .search import BACKENDS as BACKENDS_BUSQUEDA, obtener_backend
+from .snapshot import reconstruir_snapshots
+from .stock import completar_stock
+from .tarifas import TablaTarifas, validar_tramos
+from .ventas import dias_pendientes, reconstruir_ventas
+
+
+class RedisHashes:
+    """
+    Lo justo de redis-py para las métricas: hashes con HINCRBY y un
+    pipeline que ejecuta en orden. Devuelve bytes, como el cliente real.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self._cola = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def hincrby(self, clave, campo, n):
+        self._cola.append(lambda: self._sumar(clave, campo, int(n)))
+
+    def hincrbyfloat(self, clave, campo, n):
+        self._cola.append(lambda: self._sumar(clave, campo, float(n)))
+
+    def hgetall(self, clave):
+        self._cola.append(lambda: {k.encode(): str(v).encode() for k, v in self.hashes.get(clave, {}).items()})
+
+    def execute(self):
+        cola, self._cola = self._cola, []
+        return [orden() for orden in cola]
+
+    def _sumar(self, clave, campo, n):
+        campos = self.hashes.setdefault(clave, {})
+        campos[campo] = campos.get(campo, 0) + n
+        return campos[campo]
+
+
+def datos_pedido(metodo_pago, items, **extra):
+    return {
+        'nombre': 'Ana', 'apellido': 'Prueba', 'dni': '12345678', 'telefono': '999999999',
+        'correo': 'ana@example.com', 'metodo_pago_id': metodo_pago.pk,
+        'departamento': 'Lima', 'provincia': 'Lima', 'distrito': 'Centro', 'direccion': 'Av. 1',
+        'items': [{'producto_id': producto.pk, 'cantidad': cantidad} for producto, cantidad in items],
+        **extra,
+    }
+
+
+class PedidosConcurrentesTests(TransactionTestCase):
+    """
+    Pedidos simultáneos contra poco stock: nunca se vende más de lo que hay.
+    TransactionTestCase porque cada hilo usa su propia conexión y tiene que
+    ver los datos confirmados.
+    """
+    STOCK = 3
+    HILOS = 10
+
+    def setUp(self):
+        cache.clear()
+        self.metodo_pago = MetodoPago.objects.create(nombre='Yape')
+        self.producto = Producto.objects.create(nombre='Escaso', descripcion='-', cantidad=self.STOCK)
+        Tarifa.objects.create(producto=self.producto, minimo=1, precio_unitario=Decimal('10.00'))
+
+    def pedir(self, barrera, resultados):
+        cliente = Client()
+        datos = datos_pedido(self.metodo_pago, [(self.producto, 1)])
+        try:
+            barrera.wait()
+            for _ in range(200):
+                try:
+                    respuesta = cliente.post('/api/pedidos/', datos, content_type='application/json')
+                except OperationalError:
+                    # SQLite (en memoria, cache compartido) no espera al otro
+                    # escritor: "table is locked". Se reintenta como haría el
+                    # cliente; si el fallo fue después del commit, el reintento
+                    # es otro pedido y así lo cuentan las aserciones.
+                    time.sleep(0.005)
+                    continue
+                resultados.append(respuesta.status_code)
+                return
+            resultados.append('sin respuesta')
+        finally:
+            connection.close()
+
+    def test_no_sobrevende(self):
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        hilos = [threading.Thread(target=self.pedir, args=(barrera, resultados)) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.producto.refresh_from_db()
+        # La base manda: cada pedido confirmado descontó una unidad y, con
+        # más intentos que stock, se vendió todo y nada más.
+        self.assertEqual(Pedido.objects.count(), self.STOCK)
+        self.assertEqual(self.producto.cantidad, 0)
+        self.assertLessEqual(resultados.count(201), self.STOCK)
+        self.assertEqual(set(resultados) - {201, 400}, set())
+
+    def test_agota_el_stock_en_serie(self):
+        cliente = Client()
+        datos = datos_pedido(self.metodo_pago, [(self.producto, 1)])
+        estados = [cliente.post('/api/pedidos/', datos, content_type='application/json').status_code
+                   for _ in range(self.STOCK + 2)]
+        self.assertEqual(estados, [201] * self.STOCK + [400, 400])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 0)
+
+
+class StockEnCatalogoTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.metodo_pago = MetodoPago.objects.create(nombre='Yape')
+        self.producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=10)
+        Tarifa.objects.create(producto=self.producto, minimo=1, precio_unitario=Decimal('10.00'))
+
+    def test_pedido_no_invalida_el_catalogo(self):
+        cliente = Client()
+        detalle = f'/api/productos/{self.producto.pk}/'
+        respuesta = cliente.get(detalle)
+        etag = respuesta['ETag']
+        # El stock no va en la representación validada por el ETag.
+        self.assertNotIn('cantidad', respuesta.json())
+        self.assertNotIn('cantidad', cliente.get('/api/productos/').json()['results'][0])
+        self.assertEqual(cliente.get(f'{detalle}cantidad/').json(), {'cantidad': 10})
+        version = version_catalogo()
+
+        respuesta = cliente.post('/api/pedidos/', datos_pedido(self.metodo_pago, [(self.producto, 4)]),
+                                 content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+
+        self.assertEqual(version_catalogo(), version)
+        self.assertEqual(cliente.get(detalle, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(cliente.get(f'{detalle}cantidad/').json(), {'cantidad': 6})
+        self.assertEqual(cliente.get(f'/api/productos/stock/?ids={self.producto.pk}').json(),
+                         {'stock': {str(self.producto.pk): 6}})
+        self.assertNotIn('cantidad', cliente.get('/api/productos/').json()['results'][0])
+        self.assertEqual(estadisticas_catalogo()['hits'], 1)
+
+    def test_carga_previa_al_pedido_no_revive_el_stock(self):
+        # Una lectura leyó 10 de la base antes del pedido y completa el espejo
+        # después del commit: gana lo que fijó el pedido.
+        cache.clear()
+        respuesta = Client().post('/api/pedidos/', datos_pedido(self.metodo_pago, [(self.producto, 4)]),
+                                  content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        completar_stock({self.producto.pk: 10})
+        self.assertEqual(Client().get(f'/api/productos/{self.producto.pk}/cantidad/').json(), {'cantidad': 6})
+
+    def test_fields_sin_cantidad(self):
+        respuesta = Client().get(f'/api/productos/{self.producto.pk}/?fields=nombre')
+        self.assertEqual(respuesta.json(), {'nombre': 'Taza'})
+
+
+@override_settings(EMAIL_TRANSPORTE='fake', CORREOS_BACKOFF_BASE=30, CORREOS_MAX_INTENTOS=3, CORREOS_PLAZO_ENVIO=120)
+class BandejaSalidaTests(TestCase):
+    """
+    Bandeja de salida (apiApp.outbox) con FakeTransport en lugar de Resend.
+    """
+
+    def setUp(self):
+        cache.clear()
+        FakeTransport.reiniciar()
+        self.executor = crear_executor(2)
+        self.addCleanup(self.executor.shutdown)
+        self.metodo_pago = MetodoPago.objects.create(nombre='Yape')
+        self.producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=10)
+        Tarifa.objects.create(producto=self.producto, minimo=1, precio_unitario=Decimal('10.00'))
+
+    def crear_pedido(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/pedidos/', datos_pedido(self.metodo_pago, [(self.producto, 1)]),
+                                         content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        return CorreoSaliente.objects.get(pedido_id=respuesta.json()['id'])
+
+    def test_pedido_encola_y_se_despacha(self):
+        correo = self.crear_pedido()
+        self.assertEqual(correo.estado, CorreoSaliente.PENDIENTE)
+        self.assertEqual(FakeTransport.enviados, [])
+
+        self.assertEqual(despachar_lote(self.executor, 10), 1)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.ENVIADO)
+        self.assertEqual(correo.intentos, 1)
+        self.assertEqual([enviado['to'] for enviado in FakeTransport.enviados], ['ana@example.com'])
+        self.assertEqual(despachar_lote(self.executor, 10), 0)
+
+    def test_reintento_con_backoff(self):
+        correo = self.crear_pedido()
+        FakeTransport.fallar(1)
+        antes = timezone.now()
+        self.assertEqual(despachar_lote(self.executor, 10), 1)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoSaliente.PENDIENTE)
+        self.assertIn('Fallo simulado', correo.ultimo_error)
+        # Primer reintento: 30 s ± 20 %.
+        espera = (correo.proximo_intento - antes).total_seconds()
+        self.assertTrue(24 <= espera <= 37, espera)
+        # Aún no vence: no se reclama.
+        self.assertEqual(despachar_lote(self.executor, 10), 0)
+
+        CorreoSaliente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(despachar_lote(self.executor, 10), 1)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), (CorreoSaliente.ENVIADO, 2))
+
+    def test_agota_reintentos(self):
+        correo = self.crear_pedido()
+        FakeTransport.fallar(3)
+        for _ in range(3):
+            CorreoSaliente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+            despachar_lote(self.executor, 10)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), (CorreoSaliente.FALLIDO, 3))
+        CorreoSaliente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(despachar_lote(self.executor, 10), 0)
+
+    def test_espera_acotada(self):
+        for intentos, base in ((1, 30), (2, 60), (20, 3600)):
+            espera = calcular_espera(intentos).total_seconds()
+            self.assertTrue(base * 0.8 <= espera <= base * 1.2, (intentos, espera))
+
+    def test_reclamo(self):
+        correo = self.crear_pedido()
+        reclamados = reclamar_lote(10)
+        self.assertEqual([c.pk for c in reclamados], [correo.pk])
+        self.assertEqual(reclamados[0].estado, CorreoSaliente.ENVIANDO)
+        # Otro worker no lo toma mientras corre el plazo de envío.
+        self.assertEqual(reclamar_lote(10), [])
+        # Worker caído: vencido el plazo vuelve a reclamarse con otro reclamo.
+        CorreoSaliente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+        otro = reclamar_lote(10)
+        self.assertEqual([(c.pk, c.intentos) for c in otro], [(correo.pk, 2)])
+        self.assertNotEqual(otro[0].reclamo, reclamados[0].reclamo)
+
+    def test_reclamo_ajeno_no_se_marca_enviado(self):
+        correo = self.crear_pedido()
+        otro = uuid.uuid4()
+
+        def reclamar_y_perder(tamano):
+            # Vence el plazo durante el envío y otro worker lo reclama.
+            reclamados = reclamar_lote(tamano)
+            CorreoSaliente.objects.filter(pk=correo.pk).update(reclamo=otro)
+            return reclamados
+
+        with mock.patch('apiApp.outbox.reclamar_lote', reclamar_y_perder), \
+                self.assertLogs('apiApp.outbox', 'WARNING'):
+            self.assertEqual(despachar_lote(self.executor, 10), 1)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.reclamo), (CorreoSaliente.ENVIANDO, otro))
+
+    @override_settings(EMAIL_TRANSPORTE='resend')
+    def test_worker_vuelca_tiempos_de_resend(self):
+        self.crear_pedido()
+        redis = RedisHashes()
+        comando = 'apiApp.management.commands.despachar_correos'
+        with mock.patch.object(metricas, '_redis', return_value=redis), \
+                mock.patch.object(metricas, 'agrega_en_redis', return_value=True), \
+                mock.patch(f'{comando}.agrega_en_redis', return_value=True), \
+                mock.patch.object(metricas.registro, '_pid_volcador', None), \
+                mock.patch.object(metricas.registro, '_volcar_siempre'), \
+                mock.patch(f'{comando}.signal.signal'), \
+                mock.patch('resend.Emails.send', return_value={'id': 're_1'}):
+            call_command('despachar_correos', '--una-vez', stdout=StringIO())
+            # El worker volcó antes de terminar, sin esperar a /metrics.
+            serie = '["resend", "emails.send"]|total'
+            self.assertEqual(redis.hashes[metricas._clave('externo_duracion_segundos')][serie], 1)
+            datos = metricas.registro._datos()
+        self.assertEqual(datos['externo_duracion_segundos'][serie], '1')
+
+
+class VentasRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.metodo_pago = MetodoPago.objects.create(nombre='Yape')
+        self.producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=10)
+        Tarifa.objects.create(producto=self.producto, minimo=1, precio_unitario=Decimal('10.00'))
+
+    def crear_pedido(self, cantidad=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/pedidos/', datos_pedido(self.metodo_pago, [(self.producto, cantidad)]),
+                                         content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        return Pedido.objects.get(pk=respuesta.json()['id'])
+
+    def rollup(self):
+        return list(VentaDiariaMetodoPago.objects.values_list('unidades', 'pedidos'))
+
+    def test_reconstruir_no_cuenta_dos_veces(self):
+        pedido = self.crear_pedido(2)
+        self.assertTrue(pedido.acumulado)
+        self.assertEqual(self.rollup(), [(2, 1)])
+        hoy = timezone.localdate()
+        reconstruir_ventas(hoy, hoy)
+        self.assertEqual(self.rollup(), [(2, 1)])
+
+    def test_acumulacion_fallida_queda_pendiente(self):
+        with mock.patch('apiApp.ventas._sumar', side_effect=RuntimeError('base caída')):
+            pedido = self.crear_pedido()
+        self.assertFalse(Pedido.objects.get(pk=pedido.pk).acumulado)
+        self.assertEqual(dias_pendientes(), {timezone.localdate()})
+        reconstruir_ventas(timezone.localdate(), timezone.localdate())
+        self.assertEqual(dias_pendientes(), set())
+        self.assertEqual(self.rollup(), [(1, 1)])
+
+    def test_borrar_pedido_recalcula(self):
+        pedido = self.crear_pedido()
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.delete(f'/api/pedidos/{pedido.pk}/')
+        self.assertEqual(respuesta.status_code, 204)
+        self.assertEqual(self.rollup(), [])
+
+
+@override_settings(PRESUPUESTO_CONSULTAS_MODO='fallar')
+class PresupuestoConsultasTests(TestCase):
+    """
+    Cada vista con presupuesto responde dentro de él sin importar el tamaño
+    de la página: PresupuestoExcedido haría fallar la petición.
+    """
+    PRODUCTOS = 12
+    TAMANOS = (1, 5, 50)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.metodo_pago = MetodoPago.objects.create(nombre='Yape')
+        categorias = [Categoria.objects.create(nombre=f'Categoría {n}') for n in range(3)]
+        cls.productos = []
+        for n in range(cls.PRODUCTOS):
+            producto = Producto.objects.create(nombre=f'Producto {n}', descripcion='-', cantidad=100)
+            producto.categorias.set(categorias[:1 + n % 3])
+            Tarifa.objects.create(producto=producto, minimo=1, maximo=9, precio_unitario=Decimal('10.00'))
+            Tarifa.objects.create(producto=producto, minimo=10, precio_unitario=Decimal('8.00'))
+            cls.productos.append(producto)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+
+    def setUp(self):
+        cache.clear()
+        self.pedidos = [self.pedir(self.productos[n:n + 1 + n % 4]) for n in range(6)]
+
+    def pedir(self, productos):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/pedidos/', datos_pedido(self.metodo_pago, [(p, 2) for p in productos]),
+                                         content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json()
+
+    def get(self, url):
+        # Sin cache: cada petición recorre el camino completo hasta la base.
+        cache.clear()
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200, url)
+        return respuesta
+
+    def test_listados_por_tamano_de_pagina(self):
+        rutas = [
+            '/api/productos/', '/api/productos/?expand=producto', '/api/categorias/', '/api/tarifas/',
+            '/api/metodos-pago/', '/api/pedidos/', '/api/pedidos/?expand=producto', '/api/items-pedido/',
+            '/api/items-pedido/?expand=producto',
+        ]
+        for ruta in rutas:
+            for tamano in self.TAMANOS:
+                with self.subTest(ruta=ruta, tamano=tamano):
+                    self.get(f"{ruta}{'&' if '?' in ruta else '?'}page_size={tamano}")
+
+    @override_settings(CATALOGO_SNAPSHOT=True)
+    def test_catalogo_desde_snapshot(self):
+        reconstruir_snapshots([p.pk for p in self.productos])
+        for tamano in self.TAMANOS:
+            with self.subTest(tamano=tamano):
+                self.get(f'/api/productos/?page_size={tamano}')
+        self.get(f'/api/productos/{self.productos[0].pk}/')
+
+    def test_detalles(self):
+        producto = self.productos[0]
+        pedido = self.pedidos[-1]
+        for ruta in (
+            f'/api/productos/{producto.pk}/', f'/api/productos/{producto.pk}/cantidad/',
+            f'/api/tarifas/{producto.tarifas.first().pk}/', f'/api/categorias/{producto.categorias.first().pk}/',
+            f'/api/metodos-pago/{self.metodo_pago.pk}/', f'/api/pedidos/{pedido["id"]}/',
+            f'/api/pedidos/{pedido["id"]}/?expand=producto', f'/api/pedidos/codigo/{pedido["codigo"]}/',
+            f'/api/productos/stock/?ids={",".join(str(p.pk) for p in self.productos)}',
+        ):
+            with self.subTest(ruta=ruta):
+                self.get(ruta)
+
+    def test_pedido_grande(self):
+        self.pedir(self.productos)
+
+    def test_cotizar(self):
+        respuesta = self.client.post('/api/tarifas/cotizar/', {
+            'items': [{'producto_id': p.pk, 'cantidad': 3} for p in self.productos]
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+
+    def test_reservas(self):
+        items = {'items': [{'producto_id': p.pk, 'cantidad': 1} for p in self.productos[:5]]}
+        creada = self.client.post('/api/reservas/', items, content_type='application/json')
+        self.assertEqual(creada.status_code, 201, creada.content)
+        ruta = f"/api/reservas/{creada.json()['id']}/"
+        self.assertEqual(self.client.put(ruta, items, content_type='application/json').status_code, 200)
+        self.assertEqual(self.client.get(ruta).status_code, 200)
+        self.assertEqual(self.client.delete(ruta).status_code, 204)
+
+    def test_vistas_de_administracion(self):
+        self.client.force_login(self.admin)
+        rutas = [
+            '/admin/apiApp/producto/', '/admin/apiApp/pedido/', '/admin/apiApp/pedido/ventas/',
+            '/api/ventas/', '/api/ventas/productos/', '/api/ventas/categorias/',
+            '/api/pedidos/exportar/',
+        ]
+        for ruta in rutas:
+            with self.subTest(ruta=ruta):
+                self.get(ruta)
+
+
+class BenchApiTests(TestCase):
+    def test_no_corre_sobre_datos_reales(self):
+        with override_settings(DEBUG=False), self.assertRaisesMessage(CommandError, 'generar_datos_sinteticos'):
+            call_command('bench_api', '--repeticiones', '1')
+
+    def test_generador_no_escribe_sobre_datos_reales(self):
+        Producto.objects.create(nombre='Taza', descripcion='-', cantidad=10)
+        with override_settings(DEBUG=False), self.assertRaisesMessage(CommandError, 'generar_datos_sinteticos'):
+            call_command('generar_datos_sinteticos', '--productos', '5', '--pedidos', '0', stdout=StringIO())
+        self.assertEqual(Producto.objects.count(), 1)
+
+    def test_checkout_sin_correos(self):
+        # Base vacía: el generador la acepta aun sin DEBUG (el runner lo apaga).
+        call_command('generar_datos_sinteticos', '--productos', '50', '--pedidos', '5', '--imagenes', '0', stdout=StringIO())
+        pedidos = Pedido.objects.count()
+        with override_settings(DEBUG=False):
+            call_command('bench_api', '--escenarios', 'checkout_1', '--repeticiones', '3', '--calentamiento', '0',
+                         stdout=StringIO())
+        self.assertEqual(Pedido.objects.count(), pedidos + 3)
+        self.assertFalse(CorreoSaliente.objects.exists())
+
+
+class ReservasLimitesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=100)
+
+    def reservar(self, cantidad):
+        respuesta = self.client.post('/api/reservas/', {'items': [{'producto_id': self.producto.pk, 'cantidad': cantidad}]},
+                                     content_type='application/json')
+        if respuesta.status_code == 201:
+            # El registro local de reservas vive en el proceso, fuera de la transacción del test.
+            self.addCleanup(liberar, respuesta.json()['id'])
+        return respuesta
+
+    def test_maximo_de_unidades_por_producto(self):
+        self.assertEqual(self.reservar(RESERVAS_MAX_UNIDADES + 1).status_code, 400)
+        self.assertEqual(self.reservar(RESERVAS_MAX_UNIDADES).status_code, 201)
+
+    def test_carritos_nuevos_por_cliente(self):
+        ritmos = {'reservas': '100/min', 'reservas_carritos': '2/hour'}
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', ritmos):
+            respuestas = [self.reservar(1) for _ in range(3)]
+            self.assertEqual([r.status_code for r in respuestas], [201, 201, 429])
+            # Renovar un carrito existente no cuenta como carrito nuevo.
+            ruta = f"/api/reservas/{respuestas[0].json()['id']}/"
+            renovada = self.client.put(ruta, {'items': [{'producto_id': self.producto.pk, 'cantidad': 2}]},
+                                       content_type='application/json')
+            self.assertEqual(renovada.status_code, 200)
+
+
+class IdempotenciaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.metodo_pago = MetodoPago.objects.create(nombre='Yape')
+        self.producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=10)
+        Tarifa.objects.create(producto=self.producto, minimo=1, precio_unitario=Decimal('10.00'))
+        self.datos = datos_pedido(self.metodo_pago, [(self.producto, 2)])
+
+    def post(self, datos, clave='pedido-1'):
+        return self.client.post('/api/pedidos/', datos, content_type='application/json',
+                                **{'HTTP_IDEMPOTENCY_KEY': clave})
+
+    def test_reintento_repite_la_respuesta(self):
+        primera = self.post(self.datos)
+        self.assertEqual(primera.status_code, 201)
+        self.assertFalse(primera.has_header('Idempotent-Replayed'))
+
+        repetida = self.post(self.datos)
+        self.assertEqual(repetida.status_code, 201)
+        self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+        self.assertEqual(repetida.json(), primera.json())
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).cantidad, 8)
+
+    def test_misma_clave_otro_cuerpo(self):
+        self.assertEqual(self.post(self.datos).status_code, 201)
+        otra = self.post(datos_pedido(self.metodo_pago, [(self.producto, 3)]))
+        self.assertEqual(otra.status_code, 422)
+        self.assertEqual(Pedido.objects.count(), 1)
+
+    def test_en_curso(self):
+        # La primera petición con la clave aún no termina.
+        clave = clave_idempotencia('pedidos', 'pedido-1')
+        self.assertIsNone(reservar_idempotencia(clave, huella_peticion(self.datos)))
+        respuesta = self.post(self.datos)
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta['Retry-After'], '1')
+        self.assertEqual(Pedido.objects.count(), 0)
+
+    def test_error_libera_la_clave(self):
+        sin_stock = datos_pedido(self.metodo_pago, [(self.producto, 50)])
+        self.assertEqual(self.post(sin_stock).status_code, 400)
+        # El cliente corrige el pedido y reintenta con la misma clave.
+        respuesta = self.post(self.datos)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertFalse(respuesta.has_header('Idempotent-Replayed'))
+        self.assertEqual(Pedido.objects.count(), 1)
+
+
+class CodigosPedidoTests(TestCase):
+    def test_permutacion_es_biyectiva(self):
+        # 1000 no es potencia de 2: ejercita el cycle-walking.
+        for dominio in (1000, 1024):
+            permutacion = PermutacionFeistel(dominio, b'clave')
+            imagen = [permutacion.permutar(valor) for valor in range(dominio)]
+            self.assertEqual(sorted(imagen), list(range(dominio)))
+            self.assertNotEqual(imagen, list(range(dominio)))
+        # Otra clave, otra permutación.
+        una, otra = PermutacionFeistel(1000, b'clave'), PermutacionFeistel(1000, b'otra')
+        self.assertNotEqual([una.permutar(v) for v in range(20)], [otra.permutar(v) for v in range(20)])
+
+    def test_codigos_distintos_y_de_longitud_fija(self):
+        asignador = AsignadorCodigos('0123456789ABCDEF', 3, b'clave')
+        codigos = [asignador.codigo(numero) for numero in range(asignador.capacidad)]
+        self.assertEqual(len(set(codigos)), 16 ** 3)
+        self.assertTrue(all(len(codigo) == 3 for codigo in codigos))
+
+    def test_fuera_del_dominio(self):
+        permutacion = PermutacionFeistel(1000, b'clave')
+        for valor in (-1, 1000):
+            with self.assertRaises(ValueError):
+                permutacion.permutar(valor)
+        asignador = AsignadorCodigos('0123456789', 2, b'clave')
+        with self.assertRaises(OverflowError):
+            asignador.codigo(100)
+        with self.assertRaises(ValueError):
+            AsignadorCodigos('0120', 2, b'clave')
+
+    @override_settings(PEDIDO_CODIGO_CLAVE=None)
+    def test_clave_obligatoria_fuera_de_desarrollo(self):
+        # Fuera de desarrollo PEDIDO_CODIGO_CLAVE no toma SECRET_KEY.
+        with self.assertRaises(ImproperlyConfigured):
+            verificar_clave()
+
+
+class PaginacionProductosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Fechas repetidas: el id desempata el keyset.
+        for i, dias in enumerate((3, 1, 1, 2, 1, 3, 2)):
+            producto = Producto.objects.create(nombre=f'Producto {i}', descripcion='-', cantidad=1)
+            Producto.objects.filter(pk=producto.pk).update(fecha_ingreso=date(2025, 1, dias))
+        self.orden = list(Producto.objects.order_by('fecha_ingreso', 'id').values_list('id', flat=True))
+
+    def paginas(self, url, enlace='next'):
+        ids = []
+        while url:
+            datos = self.client.get(url).json()
+            ids.append([producto['id'] for producto in datos['results']])
+            url = datos[enlace]
+        return ids
+
+    def test_cursor_ida_y_vuelta(self):
+        paginas = self.paginas('/api/productos/?page_size=3')
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        # Ni repetidos ni huecos.
+        self.assertEqual(sum(paginas, []), self.orden)
+
+        # De la última página hacia atrás se recorren las mismas páginas.
+        url = '/api/productos/?page_size=3'
+        for _ in paginas[1:]:
+            url = self.client.get(url).json()['next']
+        previas = self.paginas(self.client.get(url).json()['previous'], 'previous')
+        self.assertEqual(previas, paginas[-2::-1])
+
+    def test_cursor_invalido(self):
+        bueno = self.client.get('/api/productos/?page_size=3').json()['next']
+        cursor = bueno.split('cursor=')[1].split('&')[0]
+
+        def codificar_cursor(datos):
+            return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip('=')
+
+        for alterado in ('%%%', cursor[:-3], codificar_cursor({'p': ['no-es-fecha', 1], 'r': 0}),
+                         codificar_cursor({'p': ['2025-01-01'], 'r': 0}), codificar_cursor([1, 2])):
+            with self.subTest(cursor=alterado):
+                respuesta = self.client.get('/api/productos/', {'cursor': alterado})
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertEqual(respuesta.json(), {'detail': 'Cursor inválido.'})
+
+    def test_busqueda_por_relevancia(self):
+        mas = Producto.objects.create(nombre='Taza de taza', descripcion='Taza grande', cantidad=1)
+        menos = Producto.objects.create(nombre='Plato', descripcion='Combina con la taza', cantidad=1)
+        medio = Producto.objects.create(nombre='Taza', descripcion='Cerámica', cantidad=1)
+        # -rango con cursor: una por página, sin saltos ni repetidos.
+        paginas = self.paginas('/api/productos/?search=taza&page_size=1')
+        self.assertEqual(sum(paginas, []), [mas.pk, medio.pk, menos.pk])
+
+
+@skipUnless(connection.vendor in BACKENDS_BUSQUEDA, 'Motor sin índice de texto completo.')
+class BusquedaTests(TestCase):
+    """
+    Corre contra el backend del motor de la suite: SqliteFts5Busqueda en
+    desarrollo, PostgresBusqueda con DATABASE_URL de Postgres.
+    """
+
+    def setUp(self):
+        self.backend = obtener_backend()
+        self.mochila = Producto.objects.create(nombre='Mochila escolar', descripcion='Con bolsillos', cantidad=1)
+        self.taza = Producto.objects.create(nombre='Taza', descripcion='Cerámica esmaltada', cantidad=1)
+
+    def buscar(self, texto):
+        return list(self.backend.buscar(Producto.objects.all(), texto).order_by('-rango', 'id')
+                    .values_list('id', flat=True))
+
+    def test_backend_del_motor(self):
+        self.assertIsInstance(self.backend, BACKENDS_BUSQUEDA[connection.vendor])
+
+    def test_coincidencias(self):
+        # Plurales, mayúsculas, tildes y prefijos; todos los términos deben estar.
+        self.assertEqual(self.buscar('mochilas'), [self.mochila.pk])
+        self.assertEqual(self.buscar('BOLSILLO'), [self.mochila.pk])
+        self.assertEqual(self.buscar('ceramica'), [self.taza.pk])
+        self.assertEqual(self.buscar('mochila bolsillos'), [self.mochila.pk])
+        self.assertEqual(self.buscar('mochila taza'), [])
+        # Sin términos no se consulta el índice.
+        self.assertFalse(self.backend.buscar(Producto.objects.all(), '!!').exists())
+
+    def test_relevancia(self):
+        tazon = Producto.objects.create(nombre='Taza de té', descripcion='Taza de porcelana', cantidad=1)
+        plato = Producto.objects.create(nombre='Plato hondo', descripcion='Hace juego con la taza azul', cantidad=1)
+        self.assertEqual(self.buscar('taza'), [tazon.pk, self.taza.pk, plato.pk])
+
+    def test_indice_sigue_al_producto(self):
+        self.mochila.nombre = 'Maleta de viaje'
+        self.mochila.save()
+        self.assertEqual(self.buscar('mochila'), [])
+        self.assertEqual(self.buscar('maleta'), [self.mochila.pk])
+
+        Producto.objects.filter(pk=self.taza.pk).update(descripcion='Vidrio templado')
+        self.assertEqual(self.buscar('ceramica'), [])
+        self.assertEqual(self.buscar('vidrio'), [self.taza.pk])
+
+        self.taza.delete()
+        self.assertEqual(self.buscar('taza'), [])
+
+
+class TarifasTests(TestCase):
+    TRAMOS = [(10, 49, Decimal('8.00')), (1, 9, Decimal('10.00')), (50, None, Decimal('6.00'))]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tramo_por_bisect(self):
+        tabla = TablaTarifas(self.TRAMOS)
+        self.assertFalse(tabla.solapada)
+        # Bordes de cada tramo: mínimo y máximo incluidos.
+        for cantidad, precio in ((0, None), (1, '10.00'), (9, '10.00'), (10, '8.00'), (49, '8.00'),
+                                 (50, '6.00'), (10 ** 6, '6.00')):
+            with self.subTest(cantidad=cantidad):
+                self.assertEqual(tabla.precio(cantidad), Decimal(precio) if precio else None)
+
+    def test_huecos_y_maximo_final(self):
+        tabla = TablaTarifas([(1, 5, Decimal('10.00')), (10, 20, Decimal('8.00'))])
+        self.assertEqual([tabla.precio(c) for c in (5, 6, 9, 10, 20, 21)],
+                         [Decimal('10.00'), None, None, Decimal('8.00'), Decimal('8.00'), None])
+        self.assertIsNone(TablaTarifas([]).precio(1))
+
+    def test_solapes_usan_el_primer_tramo(self):
+        tabla = TablaTarifas([(5, 9, Decimal('8.00')), (1, None, Decimal('10.00'))])
+        self.assertTrue(tabla.solapada)
+        self.assertEqual([tabla.precio(c) for c in (1, 6, 12)], [Decimal('10.00')] * 3)
+        self.assertEqual(validar_tramos([(1, None), (5, 9)]), ['Los tramos 1-∞ y 5-9 se solapan.'])
+        self.assertEqual(validar_tramos([(1, 5), (10, None)]), ['Hay un hueco entre los tramos 1-5 y 10-∞.'])
+        self.assertEqual(validar_tramos([(1, 5), (10, None)], permitir_huecos=True), [])
+
+    def test_cotizar(self):
+        producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=100)
+        Tarifa.objects.bulk_create(Tarifa(producto=producto, minimo=minimo, maximo=maximo, precio_unitario=precio)
+                                   for minimo, maximo, precio in self.TRAMOS)
+        respuesta = self.client.post('/api/tarifas/cotizar/', {'items': [
+            {'producto_id': producto.pk, 'cantidad': 10},
+            {'producto_id': producto.pk, 'cantidad': 50},
+            {'producto_id': producto.pk + 1000, 'cantidad': 1},
+        ]}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual([(linea['precio_unitario'], linea['subtotal']) for linea in datos['items']],
+                         [('8.00', '80.00'), ('6.00', '300.00'), (None, None)])
+        # El producto desconocido no suma y marca la cotización como incompleta.
+        self.assertEqual((datos['total'], datos['completo']), ('380.00', False))
+
+        respuesta = self.client.post('/api/tarifas/cotizar/', {'items': [{'producto_id': producto.pk, 'cantidad': 0}]},
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class ProductosIOTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.taza = Producto.objects.create(nombre='Taza', descripcion='Cerámica', cantidad=5)
+        self.taza.categorias.add(Categoria.objects.create(nombre='Cocina'))
+        Tarifa.objects.create(producto=self.taza, minimo=1, maximo=9, precio_unitario=Decimal('10.00'))
+        Tarifa.objects.create(producto=self.taza, minimo=10, precio_unitario=Decimal('8.00'))
+
+    def importar(self, texto, formato='csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return importar_productos(BytesIO(texto.encode()), formato)
+
+    def tramos(self, producto):
+        return list(producto.tarifas.order_by('minimo').values_list('minimo', 'maximo', 'precio_unitario'))
+
+    def test_crea_con_relaciones(self):
+        resultado = self.importar(
+            'nombre,descripcion,cantidad,categorias,tarifas\n'
+            'Plato,Hondo,7,Cocina|Mesa,1-5:4.50|6-:4.00\n'
+        )
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.errores), (1, 0, []))
+        plato = Producto.objects.get(nombre='Plato')
+        self.assertEqual((plato.descripcion, plato.cantidad), ('Hondo', 7))
+        self.assertEqual(sorted(plato.categorias.values_list('nombre', flat=True)), ['Cocina', 'Mesa'])
+        # La categoría existente se reutiliza.
+        self.assertEqual(Categoria.objects.filter(nombre='Cocina').count(), 1)
+        self.assertEqual(self.tramos(plato), [(1, 5, Decimal('4.50')), (6, None, Decimal('4.00'))])
+
+    def test_subconjunto_de_columnas(self):
+        resultado = self.importar(f'id,cantidad\n{self.taza.pk},42\n')
+        self.assertEqual((resultado.creados, resultado.actualizados), (0, 1))
+        self.taza.refresh_from_db()
+        # Lo que no trae el archivo queda como estaba.
+        self.assertEqual((self.taza.nombre, self.taza.descripcion, self.taza.cantidad), ('Taza', 'Cerámica', 42))
+        self.assertEqual(list(self.taza.categorias.values_list('nombre', flat=True)), ['Cocina'])
+        self.assertEqual(len(self.tramos(self.taza)), 2)
+        self.assertEqual(Client().get(f'/api/productos/{self.taza.pk}/cantidad/').json(), {'cantidad': 42})
+
+        self.importar(json.dumps({'id': self.taza.pk, 'nombre': 'Taza grande'}) + '\n', 'jsonl')
+        self.taza.refresh_from_db()
+        self.assertEqual((self.taza.nombre, self.taza.cantidad), ('Taza grande', 42))
+
+    def test_actualiza_existentes(self):
+        resultado = self.importar(
+            'id,nombre,descripcion,cantidad,categorias,tarifas\n'
+            f'{self.taza.pk},Taza roja,,3,,1-19:9.00|20-:7.00\n'
+        )
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.errores), (0, 1, []))
+        self.taza.refresh_from_db()
+        # Celda vacía: descripción sin cambios; categorías vacías: sin categorías.
+        self.assertEqual((self.taza.nombre, self.taza.descripcion, self.taza.cantidad), ('Taza roja', 'Cerámica', 3))
+        self.assertFalse(self.taza.categorias.exists())
+        # El tramo 10- que ya no viene se elimina; el 1- se actualiza.
+        self.assertEqual(self.tramos(self.taza), [(1, 19, Decimal('9.00')), (20, None, Decimal('7.00'))])
+
+    def test_reporte_de_errores(self):
+        resultado = self.importar(
+            'id,nombre,descripcion,cantidad,tarifas\n'
+            ',Vaso,Vidrio,2,1-5:3.00\n'
+            ',Jarra,,4,\n'
+            f'{self.taza.pk},,,muchas,\n'
+            '999999,Fantasma,-,1,\n'
+            ',Bowl,-,1,1-:5.00|3-9:4.00\n'
+            ',Cuchara,-,1,1-5:abc\n'
+        )
+        self.assertEqual((resultado.creados, resultado.actualizados), (1, 0))
+        self.assertEqual(resultado.errores, [
+            (3, 'Para crear un producto falta: descripcion.'),
+            (4, "cantidad debe ser un entero ('muchas')."),
+            (5, 'No existe el producto con id 999999.'),
+            (6, 'Los tramos 1-∞ y 3-9 se solapan.'),
+            (7, "Precio inválido 'abc'."),
+        ])
+        self.assertTrue(Producto.objects.filter(nombre='Vaso').exists())
+
+        resultado = self.importar('{"nombre": "Olla", "descripcion": "-", "cantidad": 1}\n\nno es json\n[1]\n', 'jsonl')
+        self.assertEqual(resultado.creados, 1)
+        self.assertEqual([linea for linea, _ in resultado.errores], [3, 4])
+
+    def test_exportar(self):
+        otro = Producto.objects.create(nombre='Vaso, alto', descripcion='-', cantidad=1)
+        lineas = list(exportar_productos('csv'))
+        self.assertEqual(lineas, [
+            'id,nombre,descripcion,cantidad,categorias,tarifas\r\n',
+            f'{self.taza.pk},Taza,Cerámica,5,Cocina,1-9:10.00|10-:8.00\r\n',
+            f'{otro.pk},"Vaso, alto",-,1,,\r\n',
+        ])
+        # Lo exportado se vuelve a importar sin cambios.
+        resultado = self.importar(''.join(lineas))
+        self.assertEqual((resultado.actualizados, resultado.errores), (2, []))
+        self.assertEqual(list(exportar_productos('csv')), lineas)
+
+        filas = [json.loads(linea) for linea in exportar_productos('jsonl', Producto.objects.filter(pk=self.taza.pk))]
+        self.assertEqual(filas, [{
+            'id': self.taza.pk, 'nombre': 'Taza', 'descripcion': 'Cerámica', 'cantidad': 5, 'categorias': ['Cocina'],
+            'tarifas': [{'minimo': 1, 'maximo': 9, 'precio_unitario': '10.00'},
+                        {'minimo': 10, 'maximo': None, 'precio_unitario': '8.00'}],
+        }])
+
+    def test_accion_del_admin(self):
+        otro = Producto.objects.create(nombre='Vaso', descripcion='-', cantidad=1)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        respuesta = self.client.post('/admin/apiApp/producto/', {
+            'action': 'exportar_jsonl', '_selected_action': [otro.pk],
+        })
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+        contenido = b''.join(respuesta.streaming_content).decode()
+        self.assertEqual([json.loads(linea)['id'] for linea in contenido.splitlines()], [otro.pk])
+
+
+class ExportacionPedidosTests(TestCase):
+    URL = '/api/pedidos/exportar/'
+
+    def setUp(self):
+        self.yape = MetodoPago.objects.create(nombre='Yape')
+        self.plin = MetodoPago.objects.create(nombre='Plin')
+        self.producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=10)
+        self.pedidos = []
+        for dia, metodo, provincia in ((3, self.yape, False), (1, self.plin, True), (2, self.yape, True)):
+            pedido = Pedido.objects.create(
+                nombre='Ana', apellido='Prueba', dni='12345678', telefono='999999999', correo='ana@example.com',
+                metodo_pago=metodo, envio_provincia=provincia, total=Decimal('20.00'),
+            )
+            Pedido.objects.filter(pk=pedido.pk).update(fecha=timezone.make_aware(datetime(2025, 3, dia, 23, 30)))
+            PedidoItem.objects.create(pedido=pedido, producto=self.producto, cantidad=dia,
+                                      precio_unitario=Decimal('10.00'))
+            self.pedidos.append(pedido)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def exportar(self, **parametros):
+        respuesta = self.client.get(self.URL, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return respuesta, b''.join(respuesta.streaming_content).decode()
+
+    def test_csv_por_fecha(self):
+        respuesta, contenido = self.exportar(desde='2025-03-02', hasta='2025-03-03')
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        lineas = contenido.splitlines()
+        self.assertEqual(lineas[0].split(','), COLUMNAS_PEDIDOS['pedidos'])
+        # Ambos extremos incluidos (23:30 hora local) y en orden de fecha.
+        self.assertEqual([linea.split(',')[1] for linea in lineas[1:]],
+                         [self.pedidos[2].codigo, self.pedidos[0].codigo])
+
+    def test_ndjson_items_filtrados(self):
+        respuesta, contenido = self.exportar(formato='ndjson', nivel='items', metodo_pago=self.yape.pk,
+                                             envio_provincia='true')
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+        filas = [json.loads(linea) for linea in contenido.splitlines()]
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['pedido__codigo'], self.pedidos[2].codigo)
+        self.assertEqual((filas[0]['cantidad'], filas[0]['subtotal']), (2, '20.00'))
+        self.assertTrue(filas[0]['pedido__fecha'].startswith('2025-03-02T23:30:00'))
+
+    def test_parametros_invalidos(self):
+        for parametros in ({'formato': 'xml'}, {'nivel': 'clientes'}, {'desde': '2025-13-01'},
+                           {'metodo_pago': 'yape'}, {'envio_provincia': 'quizas'}):
+            with self.subTest(**parametros):
+                self.assertEqual(self.client.get(self.URL, parametros).status_code, 400)
+
+    def test_solo_admin(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.URL).status_code, 403)
+
+
+class SnapshotSenalesTests(TestCase):
+    def modificar_catalogo(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            producto = Producto.objects.create(nombre='Taza', descripcion='-', cantidad=1)
+            producto.categorias.add(Categoria.objects.create(nombre='Cocina'))
+            Tarifa.objects.create(producto=producto, minimo=1, precio_unitario=Decimal('10.00'))
+        return producto, [getattr(callback, '__name__', None) for callback in callbacks]
+
+    @override_settings(CATALOGO_SNAPSHOT=False)
+    def test_sin_snapshot_no_se_programa(self):
+        _, callbacks = self.modificar_catalogo()
+        self.assertNotIn('_reconstruir_pendientes', callbacks)
+        self.assertFalse(ProductoSnapshot.objects.exists())
+
+    @override_settings(CATALOGO_SNAPSHOT=True)
+    def test_con_snapshot_se_reconstruye(self):
+        producto, callbacks = self.modificar_catalogo()
+        self.assertIn('_reconstruir_pendientes', callbacks)
+        documento = ProductoSnapshot.objects.get(pk=producto.pk).documento
+        self.assertEqual(([c['nombre'] for c in documento['categorias']], len(documento['tarifas'])), (['Cocina'], 1))
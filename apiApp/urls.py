@@ -1,11 +1,14 @@
 # apiApp/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ProductoViewSet, CategoriaViewSet, TarifaViewSet,
     ImagenProductoViewSet, VideoProductoViewSet,
-    MetodoPagoViewSet, PedidoViewSet, PedidoItemViewSet, HomePage
+    MetodoPagoViewSet, PedidoViewSet, PedidoItemViewSet, ReservaViewSet, VentasViewSet, HomePage,
+    stock_productos, metricas_prometheus
 )
+from . import views_async
 
 router = DefaultRouter()
 router.register(r'productos', ProductoViewSet)
@@ -14,8 +17,26 @@ router.register(r'tarifas', TarifaViewSet)
 router.register(r'metodos-pago', MetodoPagoViewSet)
 router.register(r'pedidos', PedidoViewSet)
 router.register(r'items-pedido', PedidoItemViewSet)
+router.register(r'reservas', ReservaViewSet, basename='reserva')
+router.register(r'ventas', VentasViewSet, basename='ventas')
+
+# Bajo ASGI las lecturas más frecuentes pasan antes por vistas async;
+# lo demás sigue en el router.
+rutas_async = [
+    path('productos/stock/', views_async.stock_productos),
+    path('productos/', views_async.producto_lista),
+    path('productos/<int:pk>/', views_async.producto_detalle),
+    path('productos/<int:pk>/cantidad/', views_async.producto_cantidad),
+    path('pedidos/codigo/<str:codigo>/', views_async.pedido_por_codigo),
+]
 
 urlpatterns = [
     path('', HomePage, name='home'),
+    path('metrics', metricas_prometheus, name='metricas'),
+    # Antes del router: si no, "stock" se tomaría como pk de productos/<pk>/.
+    path('api/productos/stock/', stock_productos, name='producto-stock'),
     path('api/', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.SERVIDOR == 'asgi':
+    urlpatterns.insert(1, path('api/', include(rutas_async)))
\ No newline at end of file
@@ -0,0 +1,265 @@
+# apiApp/ventas.py
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import (
+    Producto, Pedido, PedidoItem,
+    VentaDiariaProducto, VentaDiariaCategoria, VentaDiariaMetodoPago, VentaDiariaRegion
+)
+
+METRICAS = ["ingresos", "unidades", "pedidos"]
+# Dimensión de la API -> (modelo del rollup, campo agrupado)
+DIMENSIONES = {
+    "productos": (VentaDiariaProducto, "producto"),
+    "categorias": (VentaDiariaCategoria, "categoria"),
+    "metodos-pago": (VentaDiariaMetodoPago, "metodo_pago"),
+    "regiones": (VentaDiariaRegion, None),
+}
+DIAS_POR_DEFECTO = 30
+# Clave del advisory lock de Postgres que serializa acumulación y reconstrucción.
+BLOQUEO_ROLLUPS = 7_301_019
+
+
+# ---------------------------- ACUMULACIÓN ----------------------------
+def _sumar(modelo, claves, filas):
+    """
+    INSERT ... ON CONFLICT DO UPDATE que suma las métricas a la fila del día
+    (bulk_create con update_conflicts solo sabe reemplazarlas). La sintaxis
+    es la misma en Postgres y SQLite.
+    """
+    if not filas:
+        return
+    qn = connection.ops.quote_name
+    tabla = qn(modelo._meta.db_table)
+    columnas = [qn(modelo._meta.get_field(campo).column) for campo in ["fecha", *claves, *METRICAS]]
+    conflicto = ", ".join(qn(modelo._meta.get_field(campo).column) for campo in ["fecha", *claves])
+    fila_sql = f"({', '.join(['%s'] * len(columnas))})"
+    sumas = ", ".join(f"{qn(m)} = {tabla}.{qn(m)} + excluded.{qn(m)}" for m in METRICAS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES {', '.join([fila_sql] * len(filas))} "
+            f"ON CONFLICT ({conflicto}) DO UPDATE SET {sumas}",
+            [valor for fila in filas for valor in fila],
+        )
+
+
+def _bloquear_rollups():
+    # En SQLite la primera escritura de la transacción ya bloquea la base.
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [BLOQUEO_ROLLUPS])
+
+
+def acumular_pedido(pedido, items):
+    """
+    Suma un pedido recién confirmado a los rollups de su día. Se llama en
+    on_commit con los ítems ya en memoria; solo consulta las categorías. Un
+    pedido que ya contó una reconstrucción no se vuelve a sumar.
+    """
+    fecha = timezone.localdate(pedido.fecha)
+    por_producto = defaultdict(lambda: [Decimal("0"), 0])
+    for item in items:
+        por_producto[item.producto_id][0] += item.cantidad * item.precio_unitario
+        por_producto[item.producto_id][1] += item.cantidad
+    unidades = sum(item.cantidad for item in items)
+
+    por_categoria = defaultdict(lambda: [Decimal("0"), 0])
+    for producto_id, categoria_id in (
+        Producto.categorias.through.objects.filter(producto_id__in=list(por_producto))
+        .values_list("producto_id", "categoria_id")
+    ):
+        por_categoria[categoria_id][0] += por_producto[producto_id][0]
+        por_categoria[categoria_id][1] += por_producto[producto_id][1]
+
+    with transaction.atomic():
+        _bloquear_rollups()
+        if not Pedido.objects.filter(pk=pedido.pk, acumulado=False).update(acumulado=True):
+            return
+        _sumar(VentaDiariaProducto, ["producto"], [
+            (fecha, producto_id, ingresos, cantidad, 1)
+            for producto_id, (ingresos, cantidad) in sorted(por_producto.items())
+        ])
+        _sumar(VentaDiariaCategoria, ["categoria"], [
+            (fecha, categoria_id, ingresos, cantidad, 1)
+            for categoria_id, (ingresos, cantidad) in sorted(por_categoria.items())
+        ])
+        _sumar(VentaDiariaMetodoPago, ["metodo_pago"], [
+            (fecha, pedido.metodo_pago_id, pedido.total, unidades, 1)
+        ])
+        _sumar(VentaDiariaRegion, ["departamento", "provincia"], [
+            (fecha, pedido.departamento or "", pedido.provincia or "", pedido.total, unidades, 1)
+        ])
+
+
+def programar_acumulacion(pedido, items):
+    """
+    Registra la acumulación del pedido para después del commit. Si falla, el
+    pedido queda con acumulado=False y ``reconstruir_ventas --pendientes``
+    recalcula su día.
+    """
+    def acumular():
+        acumular_pedido(pedido, items)
+
+    # robust: un fallo se registra, no rompe la respuesta del pedido ya confirmado.
+    transaction.on_commit(acumular, robust=True)
+
+
+# ---------------------------- RECONSTRUCCIÓN ----------------------------
+def _inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def reconstruir_ventas(desde, hasta):
+    """
+    Recalcula desde cero los rollups de los días [desde, hasta] a partir de
+    Pedido y PedidoItem, en una transacción. Los pedidos del rango se marcan
+    como acumulados antes de leerlos: los que se confirmen después no entran
+    aquí y los suma acumular_pedido al liberarse el bloqueo.
+    """
+    rango = {"fecha__gte": _inicio_dia(desde), "fecha__lt": _inicio_dia(hasta + timedelta(days=1))}
+    dia = TruncDate("fecha", tzinfo=timezone.get_current_timezone())
+    dia_item = TruncDate("pedido__fecha", tzinfo=timezone.get_current_timezone())
+    subtotal = Sum(F("cantidad") * F("precio_unitario"))
+
+    with transaction.atomic():
+        _bloquear_rollups()
+        Pedido.objects.filter(**rango, acumulado=False).update(acumulado=True)
+        pedidos = Pedido.objects.filter(**rango, acumulado=True).annotate(dia=dia)
+        rango_items = {f"pedido__{campo}": valor for campo, valor in {**rango, "acumulado": True}.items()}
+        items = PedidoItem.objects.filter(**rango_items).annotate(dia=dia_item)
+        # Unidades por pedido para las dimensiones a nivel de pedido.
+        unidades_pedido = dict(
+            PedidoItem.objects.filter(**rango_items).values("pedido_id")
+            .annotate(n=Sum("cantidad")).values_list("pedido_id", "n")
+        )
+
+        productos = [
+            VentaDiariaProducto(fecha=f["dia"], producto_id=f["producto_id"],
+                                ingresos=f["ingresos"], unidades=f["unidades"], pedidos=f["pedidos"])
+            for f in items.values("dia", "producto_id").annotate(
+                ingresos=subtotal, unidades=Sum("cantidad"), pedidos=Count("pedido_id", distinct=True))
+        ]
+        categorias = [
+            VentaDiariaCategoria(fecha=f["dia"], categoria_id=f["producto__categorias"],
+                                 ingresos=f["ingresos"], unidades=f["unidades"], pedidos=f["pedidos"])
+            for f in items.filter(producto__categorias__isnull=False).values("dia", "producto__categorias").annotate(
+                ingresos=subtotal, unidades=Sum("cantidad"), pedidos=Count("pedido_id", distinct=True))
+        ]
+        metodos = defaultdict(lambda: [Decimal("0"), 0, 0])
+        regiones = defaultdict(lambda: [Decimal("0"), 0, 0])
+        for pedido_id, fecha, metodo_pago_id, departamento, provincia, total in pedidos.values_list(
+            "id", "dia", "metodo_pago_id", "departamento", "provincia", "total"
+        ):
+            for acumulado in (metodos[fecha, metodo_pago_id], regiones[fecha, departamento or "", provincia or ""]):
+                acumulado[0] += total
+                acumulado[1] += unidades_pedido.get(pedido_id, 0)
+                acumulado[2] += 1
+
+        for modelo in (VentaDiariaProducto, VentaDiariaCategoria, VentaDiariaMetodoPago, VentaDiariaRegion):
+            modelo.objects.filter(fecha__range=(desde, hasta)).delete()
+        VentaDiariaProducto.objects.bulk_create(productos, batch_size=1000)
+        VentaDiariaCategoria.objects.bulk_create(categorias, batch_size=1000)
+        VentaDiariaMetodoPago.objects.bulk_create([
+            VentaDiariaMetodoPago(fecha=fecha, metodo_pago_id=metodo_pago_id,
+                                  ingresos=ingresos, unidades=unidades, pedidos=n)
+            for (fecha, metodo_pago_id), (ingresos, unidades, n) in metodos.items()
+        ], batch_size=1000)
+        VentaDiariaRegion.objects.bulk_create([
+            VentaDiariaRegion(fecha=fecha, departamento=departamento, provincia=provincia,
+                              ingresos=ingresos, unidades=unidades, pedidos=n)
+            for (fecha, departamento, provincia), (ingresos, unidades, n) in regiones.items()
+        ], batch_size=1000)
+    return sum(n for _, _, n in metodos.values())
+
+
+def recalcular_dias(fechas):
+    # Tras editar o borrar pedidos a mano (admin, API) se recalculan sus días.
+    for fecha in sorted(set(fechas)):
+        reconstruir_ventas(fecha, fecha)
+
+
+def programar_recalculo(fechas):
+    # Días de los pedidos (sus fechas) a recalcular después del commit.
+    transaction.on_commit(partial(recalcular_dias, [timezone.localdate(fecha) for fecha in fechas]))
+
+
+def dias_pendientes():
+    # Días con pedidos confirmados cuya acumulación falló.
+    fechas = Pedido.objects.filter(acumulado=False).values_list("fecha", flat=True)
+    return {timezone.localdate(fecha) for fecha in fechas}
+
+
+# ---------------------------- CONSULTAS ----------------------------
+def rango_fechas(parametros):
+    """
+    (desde, hasta) de ?desde=&hasta= (AAAA-MM-DD, inclusive); por defecto
+    los últimos 30 días. ValueError si alguna fecha es inválida.
+    """
+    hasta = timezone.localdate()
+    desde = hasta - timedelta(days=DIAS_POR_DEFECTO - 1)
+    fechas = {"desde": desde, "hasta": hasta}
+    for nombre in fechas:
+        if parametros.get(nombre):
+            try:
+                fechas[nombre] = parse_date(parametros[nombre])
+            except ValueError:
+                fechas[nombre] = None
+            if fechas[nombre] is None:
+                raise ValueError(f"{nombre} debe tener el formato AAAA-MM-DD.")
+    if fechas["desde"] > fechas["hasta"]:
+        raise ValueError("desde no puede ser posterior a hasta.")
+    return fechas["desde"], fechas["hasta"]
+
+
+def _sumas():
+    return {metrica: Sum(metrica) for metrica in METRICAS}
+
+
+def resumen_ventas(desde, hasta):
+    """
+    Totales y serie diaria. Sale de la tabla por método de pago, donde cada
+    pedido cuenta exactamente una vez.
+    """
+    serie = list(
+        VentaDiariaMetodoPago.objects.filter(fecha__range=(desde, hasta))
+        .values("fecha").annotate(**_sumas()).order_by("fecha")
+    )
+    totales = {
+        "ingresos": sum((dia["ingresos"] for dia in serie), Decimal("0")),
+        "unidades": sum(dia["unidades"] for dia in serie),
+        "pedidos": sum(dia["pedidos"] for dia in serie),
+    }
+    return {"desde": desde, "hasta": hasta, "totales": totales, "serie": serie}
+
+
+def ranking_ventas(dimension, desde, hasta, orden="ingresos", limite=None):
+    """
+    Métricas del rango agrupadas por la dimensión, de mayor a menor según
+    ``orden``. Agrupa por id y busca los nombres solo de las filas devueltas.
+    """
+    modelo, campo = DIMENSIONES[dimension]
+    claves = [f"{campo}_id"] if campo else ["departamento", "provincia"]
+    filas = (
+        modelo.objects.filter(fecha__range=(desde, hasta))
+        .values(*claves).annotate(**_sumas()).order_by(f"-{orden}", *claves)
+    )
+    filas = list(filas[:limite] if limite else filas)
+    if campo:
+        relacionado = modelo._meta.get_field(campo).related_model
+        nombres = dict(
+            relacionado.objects.filter(pk__in=[fila[f"{campo}_id"] for fila in filas]).values_list("pk", "nombre")
+        )
+        filas = [
+            {"id": fila[f"{campo}_id"], "nombre": nombres.get(fila[f"{campo}_id"]),
+             **{metrica: fila[metrica] for metrica in METRICAS}}
+            for fila in filas
+        ]
+    return filas
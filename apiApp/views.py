@@ -1,11 +1,35 @@
 # apiApp/views.py
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from django.conf import settings
 from django.shortcuts import render
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
-from utils.email_service import enviar_correo_pedido
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_GET
+from django.db import transaction
+from django.db.models import Prefetch
+from utils.email_service import encolar_correo
+from .cache import estadisticas_catalogo
+from .consultas import presupuesto_consultas
+from .metricas import registro
+from .correos import render_confirmacion_pedido
+from .mixins import CatalogoCacheMixin, IdempotenciaMixin, RespuestaCondicionalMixin, SnapshotCatalogoMixin
+from .pagination import PedidoPagination, ProductoPagination
+from .pedidos_io import CONTENT_TYPES, FORMATOS as FORMATOS_EXPORTACION, exportar_pedidos, filtros_exportacion
+from .search import BusquedaProductoFilter
+from .reservas import StockInsuficiente, disponibles, liberar, nuevo_carrito, reserva, reservar
+from .stock import parsear_ids
+from .streaming import respuesta_streaming
+from .ventas import DIMENSIONES, METRICAS, programar_recalculo, rango_fechas, ranking_ventas, resumen_ventas
 from .models import (
     Producto, Categoria, Tarifa,
     ImagenProducto, VideoProducto,
@@ -14,41 +38,62 @@ from .models import (
 from .serializers import (
     ProductoSerializer, CategoriaSerializer, TarifaSerializer,
     ImagenProductoSerializer, VideoProductoSerializer,
-    MetodoPagoSerializer, PedidoSerializer, PedidoItemSerializer
+    MetodoPagoSerializer, PedidoSerializer, PedidoItemSerializer,
+    CotizacionSerializer, ReservaSerializer, VentaSerializer, VentaDiaSerializer, VentaRankingSerializer,
+    COSTO_ENVIO_PROVINCIA, prefetch_producto, se_serializa
 )
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
+    modelos_etag = (Categoria,)
+    cache_control = 'categorias'
+    presupuesto_consultas = {'list': 3, 'retrieve': 3}
 
 
-class ProductoViewSet(viewsets.ModelViewSet):
-    queryset = Producto.objects.prefetch_related(
-        'categorias', 'tarifas', 'imagenes', 'videos')
+class ProductoViewSet(RespuestaCondicionalMixin, CatalogoCacheMixin, SnapshotCatalogoMixin, viewsets.ModelViewSet):
+    queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['nombre', 'descripcion']
+    modelos_etag = (Producto, Categoria, Tarifa, ImagenProducto, VideoProducto)
+    cache_control = 'productos'
+    pagination_class = ProductoPagination
+    filter_backends = [BusquedaProductoFilter]
+    # Una consulta por relación prefetcheada, sin importar el tamaño de la página.
+    presupuesto_consultas = {'list': 8, 'retrieve': 8, 'cantidad': 2}
 
     def get_queryset(self):
-        if self.action == 'retrieve':
-            return Producto.objects.prefetch_related('categorias', 'tarifas', 'imagenes', 'videos').only(
-                'id', 'nombre', 'descripcion', 'cantidad', 'fecha_ingreso', 'categorias', 'tarifas', 'imagenes', 'videos'
-            )
-        return self.queryset
+        # Solo columnas y relaciones que se serializan (?fields=/?omit=);
+        # fecha_ingreso siempre, la lee la paginación por keyset.
+        columnas = [c for c in ('nombre', 'descripcion') if se_serializa(self.request, c)]
+        relaciones = [r for r in ('categorias', 'tarifas', 'imagenes', 'videos') if se_serializa(self.request, r)]
+        return super().get_queryset().only('id', 'fecha_ingreso', *columnas).prefetch_related(*relaciones)
 
     @action(detail=True, methods=['get'])
     def cantidad(self, request, pk=None):
-        try:
-            producto = Producto.objects.only('cantidad').get(id=pk)
-            return JsonResponse({"cantidad": producto.cantidad})
-        except Producto.DoesNotExist:
+        # Disponible para vender: el stock menos lo reservado en carritos.
+        cantidad = disponibles([int(pk)]).get(int(pk)) if pk.isdigit() else None
+        if cantidad is None:
             return JsonResponse({"error": "Producto no encontrado"}, status=404)
+        return JsonResponse({"cantidad": cantidad})
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(estadisticas_catalogo())
 
 
-class TarifaViewSet(viewsets.ModelViewSet):
+class TarifaViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Tarifa.objects.all()
     serializer_class = TarifaSerializer
+    modelos_etag = (Tarifa,)
+    cache_control = 'tarifas'
+    presupuesto_consultas = {'list': 3, 'retrieve': 3, 'cotizar': 2}
+
+    @action(detail=False, methods=['post'])
+    def cotizar(self, request):
+        serializer = CotizacionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.cotizar())
 
 
 class ImagenProductoViewSet(viewsets.ModelViewSet):
@@ -61,111 +106,288 @@ class VideoProductoViewSet(viewsets.ModelViewSet):
     serializer_class = VideoProductoSerializer
 
 
-class MetodoPagoViewSet(viewsets.ModelViewSet):
+class MetodoPagoViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
     queryset = MetodoPago.objects.all()
     serializer_class = MetodoPagoSerializer
+    modelos_etag = (MetodoPago,)
+    cache_control = 'metodos-pago'
+    presupuesto_consultas = {'list': 3, 'retrieve': 3}
+
 
+class ExportacionRenderer(JSONRenderer):
+    """
+    Acepta cualquier Accept (text/csv, application/x-ndjson) para que la
+    exportación no termine en 406; los errores se responden en JSON.
+    """
+    media_type = '*/*'
 
-class PedidoViewSet(viewsets.ModelViewSet):
-    queryset = Pedido.objects.select_related(
-        'metodo_pago').prefetch_related('items__producto').order_by('-fecha')
+
+class PedidoViewSet(IdempotenciaMixin, viewsets.ModelViewSet):
+    queryset = Pedido.objects.select_related('metodo_pago').order_by('-fecha')
     serializer_class = PedidoSerializer
+    pagination_class = PedidoPagination
+    # Idempotency-Key en POST: los reintentos del frontend no duplican el pedido.
+    idempotencia_ambito = 'pedidos'
+    # exportar solo cuenta lo previo al streaming: las filas se leen después
+    # de que la respuesta sale del middleware.
+    # Con ?expand=producto: pedidos, ítems y las cuatro relaciones del producto.
+    presupuesto_consultas = {
+        'list': 6, 'retrieve': 6, 'buscar_por_codigo': 6, 'create': 20, 'exportar': 2,
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not se_serializa(self.request, 'items_detalle'):
+            return queryset
+        if not se_serializa(self.request, 'items_detalle.producto'):
+            return queryset.prefetch_related('items')
+        return queryset.prefetch_related(
+            Prefetch('items', queryset=PedidoItem.objects.select_related('producto')),
+            *prefetch_producto(self.request, prefijo='items__producto__', ruta='items_detalle.producto')
+        )
 
     @action(detail=False, methods=['get'], url_path='codigo/(?P<codigo>[^/.]+)')
     def buscar_por_codigo(self, request, codigo=None):
         try:
-            pedido = Pedido.objects.select_related('metodo_pago').prefetch_related(
-                'items__producto').get(codigo=codigo)
+            pedido = self.get_queryset().get(codigo=codigo)
             serializer = self.get_serializer(pedido)
             return Response(serializer.data)
         except Pedido.DoesNotExist:
             return Response({"error": "Pedido no encontrado"}, status=status.HTTP_404_NOT_FOUND)
 
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        pedido = serializer.save()
-        items_html = ""
-        total_general = 0
-
-        for item in request.data.get("items", []):
-            producto = get_object_or_404(Producto, id=item["producto_id"])
-            cantidad = int(item["cantidad"])
-            tarifa = None
-            for t in producto.tarifas.all():
-                if (t.minimo is None or cantidad >= t.minimo) and (t.maximo is None or cantidad <= t.maximo):
-                    tarifa = t
-                    break
-            if not tarifa:
-                return Response(
-                    {"error": f"No hay tarifa válida para {producto.nombre} con cantidad {cantidad}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            precio_unitario = float(tarifa.precio_unitario)
-            subtotal = precio_unitario * cantidad
-            total_general += subtotal
-            primera_imagen = producto.imagenes.first()
-            imagen_url = primera_imagen.imagen.url if (
-                primera_imagen and primera_imagen.imagen) else "https://via.placeholder.com/50"
-            items_html += f"""
-            <tr>
-                <td style="padding:8px; border:1px solid #ddd; display:flex; align-items:center; gap:8px;">
-                    <img src="{imagen_url}" alt="{producto.nombre}" width="50" height="50" style="object-fit:cover; border-radius:4px;">
-                    <span>{producto.nombre}</span>
-                </td>
-                <td style="padding:8px; border:1px solid #ddd; text-align:center;">{cantidad}</td>
-                <td style="padding:8px; border:1px solid #ddd; text-align:right;">S/. {precio_unitario:.2f}</td>
-                <td style="padding:8px; border:1px solid #ddd; text-align:right;">S/. {subtotal:.2f}</td>
-            </tr>
-            """
-
-        envio = 0
-        if pedido.envio_provincia:
-            envio = 8
-            total_general += envio
-
-        mensaje_html = f"""
-        <div style="font-family: Arial, sans-serif; max-width:600px; margin:auto; border:1px solid #eee; padding:20px; border-radius:8px;">
-            <h2 style="color:#0f172a; text-align:center;">¡Gracias por tu pedido, {pedido.nombre}!</h2>
-            <p style="text-align:center;">Tu código de pedido es: <b>{pedido.codigo}</b></p>
-            <h3 style="margin-top:30px;">Resumen de pedido</h3>
-            <table style="width:100%; border-collapse:collapse; margin-top:10px;">
-                <thead>
-                    <tr style="background:#f1f5f9;">
-                        <th style="padding:8px; border:1px solid #ddd;">Producto</th>
-                        <th style="padding:8px; border:1px solid #ddd;">Cantidad</th>
-                        <th style="padding:8px; border:1px solid #ddd;">Precio Unit.</th>
-                        <th style="padding:8px; border:1px solid #ddd;">Subtotal</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {items_html}
-                </tbody>
-            </table>
-            <div style="margin-top:20px; text-align:right;">
-                {"<p>Envío a provincia: <b>S/. 8.00</b></p>" if envio else ""}
-                <h3>Total: S/. {total_general:.2f}</h3>
-            </div>
-            <p style="margin-top:30px; text-align:center; color:#555;">
-                Recibimos tu pedido y lo estamos preparando para enviarlo a tu domicilio.<br>
-                ¡Gracias por confiar en <b>Gobady Perú</b>!
-            </p>
-        </div>
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser],
+            renderer_classes=[JSONRenderer, ExportacionRenderer])
+    def exportar(self, request):
+        """
+        Exportación en streaming para finanzas: ?formato=csv|ndjson,
+        ?nivel=pedidos|items y filtros desde, hasta, metodo_pago y envio_provincia.
         """
+        formato = request.query_params.get('formato', 'csv')
+        nivel = request.query_params.get('nivel', 'pedidos')
+        if formato not in FORMATOS_EXPORTACION or nivel not in ('pedidos', 'items'):
+            return Response({"error": "formato debe ser csv o ndjson y nivel pedidos o items."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filtros = filtros_exportacion(request.query_params, nivel)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return respuesta_streaming(exportar_pedidos(formato, nivel, filtros), CONTENT_TYPES[formato], f"{nivel}.{formato}")
 
-        enviar_correo_pedido(
+    def perform_create(self, serializer):
+        # En perform_create y no en create: IdempotenciaMixin envuelve create.
+        with transaction.atomic():
+            pedido = serializer.save()
+            self.encolar_confirmacion(pedido, serializer.lineas)
+
+    # Los rollups de ventas se suman en el checkout; editar o borrar un
+    # pedido recalcula su día, como en el admin.
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            pedido = serializer.save()
+            programar_recalculo([pedido.fecha])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            programar_recalculo([instance.fecha])
+
+    def encolar_confirmacion(self, pedido, lineas):
+        envio = COSTO_ENVIO_PROVINCIA if pedido.envio_provincia else 0
+        mensaje_html = render_confirmacion_pedido(pedido, lineas, envio)
+
+        encolar_correo(
             cliente_email=pedido.correo,
             asunto="Confirmación de tu pedido en Gobady Perú",
-            mensaje_html=mensaje_html
+            mensaje_html=mensaje_html,
+            pedido=pedido
         )
 
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-
 
 class PedidoItemViewSet(viewsets.ModelViewSet):
     queryset = PedidoItem.objects.select_related('producto', 'pedido').all()
     serializer_class = PedidoItemSerializer
+    # Con ?expand=producto: ítems y las cuatro relaciones del producto.
+    presupuesto_consultas = {'list': 5, 'retrieve': 5}
+
+    # Editar o borrar un ítem recalcula el día de su pedido en los rollups.
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            item = serializer.save()
+            programar_recalculo([item.pedido.fecha])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            programar_recalculo([instance.pedido.fecha])
+
+    def get_queryset(self):
+        if not se_serializa(self.request, 'producto'):
+            return super().get_queryset()
+        return super().get_queryset().prefetch_related(
+            *prefetch_producto(self.request, prefijo='producto__', ruta='producto')
+        )
+
+
+class CarritosThrottle(ScopedRateThrottle):
+    scope_attr = 'throttle_scope_carritos'
+
+
+class ReservaViewSet(viewsets.ViewSet):
+    """
+    Reservas de stock de un carrito (apiApp.reservas). POST crea el carrito,
+    PUT reemplaza sus cantidades y renueva el vencimiento, DELETE lo suelta.
+    Si no alcanza el stock responde 409 al agregar, no al pagar.
+    """
+    lookup_value_regex = '[0-9a-f]{32}'
+    # Solo la primera carga de un producto al espejo de stock toca la base.
+    presupuesto_consultas = {'create': 1, 'update': 1, 'retrieve': 0, 'destroy': 0}
+    # Por IP: peticiones en general y carritos nuevos (cada uno retiene stock
+    # hasta RESERVAS_TTL), ver REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'reservas'
+    throttle_scope_carritos = 'reservas_carritos'
+
+    def get_throttles(self):
+        throttles = super().get_throttles()
+        if self.action == 'create':
+            throttles.append(CarritosThrottle())
+        return throttles
+
+    def respuesta(self, carrito, cantidades, vence, estado=status.HTTP_200_OK):
+        return Response({
+            "id": carrito,
+            "expira": datetime.fromtimestamp(vence, tz=timezone.utc),
+            "items": [
+                {"producto_id": producto_id, "cantidad": unidades}
+                for producto_id, unidades in sorted(cantidades.items()) if unidades
+            ],
+        }, status=estado)
+
+    def guardar(self, request, carrito, previas, estado):
+        serializer = ReservaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if estado == status.HTTP_201_CREATED and not any(serializer.validated_data['items'].values()):
+            return Response({"error": "La reserva debe tener al menos un producto."}, status=status.HTTP_400_BAD_REQUEST)
+        # Reemplazo completo: lo que ya no viene se suelta.
+        cantidades = {**dict.fromkeys(previas, 0), **serializer.validated_data['items']}
+        try:
+            vence = reservar(carrito, cantidades)
+        except StockInsuficiente as error:
+            if error.disponible is None:
+                return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {"error": str(error), "producto_id": error.producto_id, "disponible": error.disponible},
+                status=status.HTTP_409_CONFLICT
+            )
+        return self.respuesta(carrito, cantidades, vence, estado)
+
+    def create(self, request):
+        return self.guardar(request, nuevo_carrito(), {}, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        vigente = reserva(pk)
+        if vigente is None:
+            raise Http404
+        return self.respuesta(pk, *vigente)
+
+    def update(self, request, pk=None):
+        vigente = reserva(pk)
+        if vigente is None:
+            # Vencido pero aún no liberado por liberar_reservas: se suelta
+            # antes, si no sus unidades volverían a contar como propias.
+            liberar(pk)
+        return self.guardar(request, pk, vigente[0] if vigente else {}, status.HTTP_200_OK)
+
+    def destroy(self, request, pk=None):
+        liberar(pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class VentasViewSet(viewsets.ViewSet):
+    """
+    Reportes de ventas sobre los rollups diarios (apiApp.ventas). El costo
+    depende de los días consultados, no del historial de pedidos.
+    """
+    permission_classes = [IsAdminUser]
+    presupuesto_consultas = {'list': 3, 'ranking': 4}
+
+    def parametros(self, request):
+        desde, hasta = rango_fechas(request.query_params)
+        orden = request.query_params.get('orden', 'ingresos')
+        if orden not in METRICAS:
+            raise ValueError(f"orden debe ser uno de: {', '.join(METRICAS)}.")
+        try:
+            limite = int(request.query_params.get('limite', 10))
+        except ValueError:
+            raise ValueError("limite debe ser un entero.")
+        return desde, hasta, orden, max(1, min(limite, 100))
+
+    def list(self, request):
+        try:
+            desde, hasta = rango_fechas(request.query_params)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        resumen = resumen_ventas(desde, hasta)
+        return Response({
+            "desde": desde, "hasta": hasta,
+            "totales": VentaSerializer(resumen["totales"]).data,
+            "serie": VentaDiaSerializer(resumen["serie"], many=True).data,
+        })
+
+    @action(detail=False, url_path=f"(?P<dimension>{'|'.join(DIMENSIONES)})")
+    def ranking(self, request, dimension=None):
+        """
+        Top por producto, categoría, método de pago o región:
+        ?desde=&hasta=&orden=ingresos|unidades|pedidos&limite=10
+        """
+        try:
+            desde, hasta, orden, limite = self.parametros(request)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "desde": desde, "hasta": hasta, "orden": orden,
+            "resultados": VentaRankingSerializer(ranking_ventas(dimension, desde, hasta, orden, limite), many=True).data,
+        })
+
+
+def respuesta_stock(request, stock):
+    """
+    {"stock": {id: cantidad}} con ETag; si el cliente ya tiene esa versión
+    se responde 304 sin cuerpo.
+    """
+    cuerpo = json.dumps({"stock": {str(pid): stock[pid] for pid in sorted(stock)}}).encode()
+    etag = quote_etag(hashlib.blake2b(cuerpo, digest_size=8).hexdigest())
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        respuesta = HttpResponseNotModified()
+    else:
+        respuesta = HttpResponse(cuerpo, content_type="application/json")
+    respuesta["ETag"] = etag
+    respuesta["Cache-Control"] = "no-cache"
+    return respuesta
+
+
+@presupuesto_consultas(1)
+@require_GET
+def stock_productos(request):
+    try:
+        ids = parsear_ids(request.GET.get("ids", ""))
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return respuesta_stock(request, disponibles(ids))
+
+
+@presupuesto_consultas(0)
+@require_GET
+def metricas_prometheus(request):
+    """
+    Métricas del proceso en formato de texto de Prometheus.
+    """
+    token = settings.METRICAS_TOKEN
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(registro.exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 def HomePage(request):
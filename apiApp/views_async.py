@@ -0,0 +1,103 @@
+# apiApp/views_async.py
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .cache import aclave_catalogo, aleer_catalogo, aversiones_modelos
+from .consultas import presupuesto_consultas
+from .mixins import etag_catalogo, etag_coincide, parametros_cache, validadores
+from .models import Pedido
+from .serializers import PedidoSerializer
+from .reservas import adisponibles
+from .stock import parsear_ids
+from .views import ProductoViewSet, PedidoViewSet, respuesta_stock
+
+# Vistas DRF a las que se delega lo que no tiene camino async: escrituras,
+# API navegable y misses del cache del catálogo.
+producto_lista_sync = ProductoViewSet.as_view({'get': 'list', 'post': 'create'})
+producto_detalle_sync = ProductoViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+})
+pedido_codigo_sync = PedidoViewSet.as_view({'get': 'buscar_por_codigo'})
+
+
+def _json(data, status=200):
+    # Mismo renderer que DRF para que la respuesta sea idéntica byte a byte.
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def _lectura_json(request):
+    # Un navegador pide text/html y recibe la API navegable desde la vista DRF.
+    return request.method == "GET" and "text/html" not in request.headers.get("Accept", "")
+
+
+async def _catalogo(request, tipo, identificador):
+    """
+    Camino async de RespuestaCondicionalMixin + CatalogoCacheMixin: 304 o
+    payload cacheado; None si hay que ir a la vista DRF.
+    """
+    parametros = parametros_cache(request.GET)
+    versiones = await aversiones_modelos(ProductoViewSet.modelos_etag)
+    etag = etag_catalogo(versiones, request.path, parametros, "application/json")
+    if etag_coincide(request, etag):
+        return validadores(HttpResponseNotModified(), etag, ProductoViewSet.cache_control)
+    data = await aleer_catalogo(await aclave_catalogo(tipo, identificador))
+    if data is None:
+        return None
+    return validadores(_json(data), etag, ProductoViewSet.cache_control)
+
+
+@presupuesto_consultas(8)
+@csrf_exempt
+async def producto_lista(request):
+    if _lectura_json(request):
+        respuesta = await _catalogo(request, "lista", parametros_cache(request.GET))
+        if respuesta is not None:
+            return respuesta
+    return await sync_to_async(producto_lista_sync)(request)
+
+
+@presupuesto_consultas(8)
+@csrf_exempt
+async def producto_detalle(request, pk):
+    if _lectura_json(request):
+        respuesta = await _catalogo(request, "detalle", f"{pk}?{parametros_cache(request.GET)}")
+        if respuesta is not None:
+            return respuesta
+    return await sync_to_async(producto_detalle_sync)(request, pk=pk)
+
+
+@presupuesto_consultas(1)
+@require_GET
+async def producto_cantidad(request, pk):
+    cantidad = (await adisponibles([pk])).get(pk)
+    if cantidad is None:
+        return JsonResponse({"error": "Producto no encontrado"}, status=404)
+    return JsonResponse({"cantidad": cantidad})
+
+
+@presupuesto_consultas(1)
+@require_GET
+async def stock_productos(request):
+    try:
+        ids = parsear_ids(request.GET.get("ids", ""))
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return respuesta_stock(request, await adisponibles(ids))
+
+
+@presupuesto_consultas(6)
+async def pedido_por_codigo(request, codigo):
+    if not _lectura_json(request):
+        return await sync_to_async(pedido_codigo_sync)(request, codigo=codigo)
+    drf_request = Request(request)
+    queryset = PedidoViewSet(request=drf_request).get_queryset()
+    try:
+        pedido = await queryset.aget(codigo=codigo)
+    except Pedido.DoesNotExist:
+        return _json({"error": "Pedido no encontrado"}, status=404)
+    # Todo lo que lee el serializer ya viene precargado: no consulta la base.
+    return _json(PedidoSerializer(pedido, context={'request': drf_request}).data)
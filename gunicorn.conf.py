@@ -0,0 +1,16 @@
+# gunicorn.conf.py
+# SERVIDOR=wsgi (por defecto): workers síncronos sobre BackGobadyperu.wsgi.
+# SERVIDOR=asgi: workers uvicorn sobre BackGobadyperu.asgi; cada worker
+# atiende varias peticiones a la vez mientras esperan Redis o la base.
+import os
+
+servidor = os.getenv("SERVIDOR", "wsgi")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+
+if servidor == "asgi":
+    wsgi_app = "BackGobadyperu.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "BackGobadyperu.wsgi:application"
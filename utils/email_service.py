@@ -1,20 +1,100 @@
+import logging
+import threading
+
 import resend
 from django.conf import settings
 
+from apiApp.metricas import medir_externo
+
 resend.api_key = settings.RESEND_API_KEY
 
+logger = logging.getLogger(__name__)
+
+REMITENTE = "Gobady Perú <onboarding@resend.dev>"  # 👈 Puedes usar dominio verificado después
+
+
+class ResendTransport:
+    """
+    Envía el correo por la API de Resend. Lanza excepción si falla para que
+    el despachador decida si reintenta.
+    """
+
+    def enviar(self, destinatario, asunto, html):
+        with medir_externo("resend", "emails.send"):
+            response = resend.Emails.send({
+                "from": REMITENTE,
+                "to": destinatario,
+                "subject": asunto,
+                "html": html,
+            })
+        return response.get("id") if isinstance(response, dict) else response
+
+
+class FakeTransport:
+    """
+    Transporte local para desarrollo y tests: guarda los correos en memoria.
+    ``fallos`` hace fallar los siguientes N envíos para probar reintentos.
+    El estado es de la clase (obtener_transporte crea una instancia por
+    lote) y los hilos del despachador lo comparten: se toca bajo ``_lock``.
+    """
+    enviados = []
+    fallos = 0
+    _lock = threading.Lock()
+
+    def enviar(self, destinatario, asunto, html):
+        with FakeTransport._lock:
+            if FakeTransport.fallos > 0:
+                FakeTransport.fallos -= 1
+                raise ConnectionError("Fallo simulado del proveedor de correo")
+            FakeTransport.enviados.append({"to": destinatario, "subject": asunto, "html": html})
+            return f"fake-{len(FakeTransport.enviados)}"
+
+    @classmethod
+    def fallar(cls, veces):
+        with cls._lock:
+            cls.fallos = veces
+
+    @classmethod
+    def reiniciar(cls):
+        with cls._lock:
+            cls.enviados = []
+            cls.fallos = 0
+
+
+TRANSPORTES = {
+    "resend": ResendTransport,
+    "fake": FakeTransport,
+}
+
+
+def obtener_transporte():
+    return TRANSPORTES[settings.EMAIL_TRANSPORTE]()
+
+
+def encolar_correo(cliente_email, asunto, mensaje_html, pedido=None):
+    """
+    Deja el correo en la bandeja de salida. Llamar dentro de la transacción
+    del pedido para que ambos se confirmen o descarten juntos.
+    """
+    from apiApp.models import CorreoSaliente
+
+    if not settings.CORREOS_ENCOLAR:
+        # bench_api: el checkout se mide sin llenar la bandeja de salida.
+        return None
+    return CorreoSaliente.objects.create(
+        pedido=pedido,
+        destinatario=cliente_email,
+        asunto=asunto,
+        html=mensaje_html,
+    )
+
+
 def enviar_correo_pedido(cliente_email, asunto, mensaje_html):
     """
     Envía un correo al cliente con los datos de su pedido.
     """
     try:
-        response = resend.Emails.send({
-            "from": "Gobady Perú <onboarding@resend.dev>",  # 👈 Puedes usar dominio verificado después
-            "to": cliente_email,
-            "subject": asunto,
-            "html": mensaje_html,
-        })
-        return response
-    except Exception as e:
-        print("Error al enviar correo:", e)
+        return obtener_transporte().enviar(cliente_email, asunto, mensaje_html)
+    except Exception:
+        logger.exception("Error al enviar correo a %s", cliente_email)
         return None